@@ -0,0 +1,47 @@
+import assets
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QTableView, QHeaderView, QAbstractItemView, QLabel)
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QFont
+from models import ResultsTableModel
+from custom import FlagDelegate
+
+class AbnormalResultsDialog(QDialog):
+    """ All results outside their reference range, paged in while scrolling (keyset by date and ID, one indexed query per page) """
+
+    def __init__(self, db, worker, reference_ranges, parent=None):
+        """ Initialize AbnormalResultsDialog instance """
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.bounds = reference_ranges.bound_rows()
+
+        self.setWindowTitle("Abnormal Results")
+        self.setStyleSheet("background-color: #dcdadb; color: black;")
+        layout = QVBoxLayout()
+        legend = QLabel("▲ above reference range     ▼ below reference range")
+        legend.setFont(QFont("Roboto Regular", 11))
+        layout.addWidget(legend)
+
+        self.model = ResultsTableModel(self.request_page)
+        self.model.set_flag_rows(reference_ranges.flags)
+        table = QTableView()
+        table.setModel(self.model)
+        table.setStyleSheet(assets.stylesheet("results_table.qss"))
+        table.setFont(QFont("Roboto Regular", 12))
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        table.setItemDelegateForColumn(1, FlagDelegate(ResultsTableModel.FLAG_ROLE, table))
+        layout.addWidget(table)
+
+        self.setLayout(layout)
+        self.resize(800, 700)
+        self.model.reload()
+
+    def request_page(self, filters, after, limit, on_result, on_error):
+        """ Fetch next page of abnormal results on worker thread (used by ResultsTableModel, which is never filtered here) """
+        def on_page_failed(message):
+            on_error(message)
+            self.worker.on_error(message) # Reported by the window's default handler
+        self.worker.submit(self.db.select_out_of_range, self.bounds, after, limit, on_result=on_result, on_error=on_page_failed,
+                           key=("abnormal_page", id(self))) # Per dialog - another open list must not replace this page
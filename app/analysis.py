@@ -0,0 +1,18 @@
+import math
+
+def describe(statistics):
+    """ Turn stored per-test sums (count, sum, sum of squares, min, max, ...) into min, max, mean and
+        population standard deviation (the same as numpy.std), without touching individual results """
+    if not statistics or not statistics[0]:
+        return None
+    count, value_sum, value_sum_sq, min_value, max_value = statistics[:5]
+    mean = value_sum / count
+    variance = max(value_sum_sq / count - mean * mean, 0.0) # Rounding may push it slightly below zero
+    return {"count": count, "min": min_value, "max": max_value, "mean": mean, "std": math.sqrt(variance)}
+
+def summarize(values):
+    """ Sums (count, sum, sum of squares, min, max) of a NumPy array of results, in the form describe() takes.
+        Used when only part of the history is summarized (stored per-test sums cover all of it) """
+    if len(values) == 0:
+        return None
+    return (len(values), float(values.sum()), float((values * values).sum()), float(values.min()), float(values.max()))
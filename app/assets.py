@@ -0,0 +1,136 @@
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+import subprocess
+from xml.sax.saxutils import escape
+from PyQt6.QtCore import (QResource, QFile, QIODevice, Qt)
+from PyQt6.QtGui import (QImage, QPixmap, QFontDatabase)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_PATH = os.path.join(APP_DIR, "resources", "assets.rcc")
+FONT_FILE = "fonts/Roboto/Roboto-Regular.ttf"
+IMAGES = ["images/background.png", "images/axolotl.webp", "images/left-arrow.png", "images/right-arrow.png", "images/up-arrow.png", "images/down-arrow.png"]
+# Files packed into the bundle (paths relative to app/, the same path is used inside the bundle)
+ASSETS = [
+    "resources/styles/calendar_spinbox.qss",
+    "resources/styles/data_entry_section.qss",
+    "resources/styles/results_table.qss",
+    "resources/styles/selected_section.qss",
+    "resources/textfiles/instruction.txt",
+    "resources/textfiles/panels.txt",
+    "resources/textfiles/reference_ranges.txt",
+    "resources/textfiles/tests_names.txt",
+    "resources/textfiles/unit_conversions.txt",
+    "resources/textfiles/units_names.txt",
+    FONT_FILE,
+] + IMAGES
+# Arrows are shown as small icons - they are packed downscaled to this size (twice the largest displayed size, for HiDPI)
+ICON_SIZE = {"images/left-arrow.png": 60, "images/right-arrow.png": 60, "images/up-arrow.png": 40, "images/down-arrow.png": 40}
+
+bundle_loaded = False
+pixmaps = {} # Decoded images: {asset: QPixmap}
+plot_font = None
+
+def build(output=BUNDLE_PATH):
+    """ Pack all assets into one binary Qt resource file (compiled with rcc) """
+    rcc = shutil.which("pyside6-rcc") or shutil.which("rcc")
+    if rcc is None:
+        raise RuntimeError("Resource compiler not found (install PySide6 from requirements.txt or Qt's rcc)")
+    with tempfile.TemporaryDirectory() as staging:
+        for asset in ASSETS:
+            target = os.path.join(staging, asset)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if asset.endswith(".qss"):
+                # Style sheets refer to images by path relative to the repository - point them into the bundle instead
+                with open(os.path.join(APP_DIR, asset), "r", encoding="utf-8") as file:
+                    style = file.read().replace("url('app/images/", "url(':/images/")
+                with open(target, "w", encoding="utf-8") as file:
+                    file.write(style)
+            elif asset in ICON_SIZE:
+                size = ICON_SIZE[asset]
+                image = QImage(os.path.join(APP_DIR, asset)).scaled(
+                    size, size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+                if not image.save(target, "PNG"):
+                    raise RuntimeError(f"Cannot convert {asset}")
+            else:
+                shutil.copyfile(os.path.join(APP_DIR, asset), target)
+        qrc_path = os.path.join(staging, "assets.qrc")
+        with open(qrc_path, "w", encoding="utf-8") as file:
+            file.write("<RCC>\n  <qresource prefix=\"/\">\n")
+            for asset in ASSETS:
+                file.write(f"    <file>{escape(asset)}</file>\n")
+            file.write("  </qresource>\n</RCC>\n")
+        subprocess.run([rcc, "--binary", qrc_path, "-o", output], check=True)
+    return output
+
+def load(path=BUNDLE_PATH):
+    """ Register the bundle once (Qt memory-maps it). Without a built bundle, assets are read from loose files """
+    global bundle_loaded
+    if not bundle_loaded and os.path.exists(path):
+        bundle_loaded = QResource.registerResource(path)
+        if not bundle_loaded:
+            print(f"Cannot load asset bundle {path}, reading loose files instead")
+    return bundle_loaded
+
+def path(asset):
+    """ Path Qt classes can open (":/asset" inside the bundle, file path otherwise) """
+    return f":/{asset}" if bundle_loaded else os.path.join(APP_DIR, asset)
+
+def read_text(asset):
+    """ Content of text asset (style sheet, text file) """
+    if not bundle_loaded:
+        with open(os.path.join(APP_DIR, asset), "r", encoding="utf-8") as file:
+            return file.read()
+    file = QFile(path(asset))
+    if not file.open(QIODevice.OpenModeFlag.ReadOnly):
+        raise FileNotFoundError(f"Asset {asset} is not in the bundle")
+    try:
+        return bytes(file.readAll()).decode("utf-8")
+    finally:
+        file.close()
+
+def stylesheet(name):
+    """ Style sheet from resources/styles """
+    return read_text(f"resources/styles/{name}")
+
+def pixmap(asset):
+    """ Image decoded only once per session (needs QApplication) """
+    if asset not in pixmaps:
+        pixmaps[asset] = QPixmap(path(asset))
+        if pixmaps[asset].isNull():
+            print(f"Error: Unable to load the image {asset}")
+    return pixmaps[asset]
+
+def preload():
+    """ Register the bundle, decode all startup images and register the font with Qt (call once, after QApplication) """
+    load()
+    for asset in IMAGES:
+        pixmap(asset)
+    QFontDatabase.addApplicationFont(path(FONT_FILE))
+
+def matplotlib_font():
+    """ Roboto registered with matplotlib's font manager once, returned as FontProperties (imports matplotlib) """
+    global plot_font
+    if plot_font is None:
+        from matplotlib import font_manager
+        font_path = os.path.join(APP_DIR, FONT_FILE) # matplotlib needs a real file, it is parsed only here
+        font_manager.fontManager.addfont(font_path)
+        plot_font = font_manager.FontProperties(family=font_manager.get_font(font_path).family_name)
+    return plot_font
+
+def main():
+    """ Command line entry point: python3 app/assets.py (rebuild after changing any style, text file or image) """
+    parser = argparse.ArgumentParser(description="Pack styles, text files, images and fonts into one Qt resource bundle")
+    parser.add_argument("--output", default=BUNDLE_PATH, help="bundle file (app/resources/assets.rcc by default)")
+    args = parser.parse_args()
+    try:
+        output = build(args.output)
+    except Exception as e:
+        print(f"Building asset bundle failed: {e}")
+        sys.exit(1)
+    print(f"Asset bundle written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import datetime
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+HISTORY_FILE = os.path.join(os.path.dirname(APP_DIR), "benchmark_history.jsonl")
+
+def headless_env():
+    """ Environment running Qt without a display (offscreen platform) """
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    return env
+
+def measure_startup(runs=5):
+    """ Launch the app runs times and return {"first_paint_ms": [...], "wall_ms": [...], "phases": [...]}.
+        first_paint_ms is measured by the app itself, wall_ms includes interpreter start and shutdown """
+    samples = {"first_paint_ms": [], "wall_ms": [], "phases": []}
+    for _ in range(runs):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, os.path.join(APP_DIR, "main.py"), "--exit-after-paint"],
+            cwd=APP_DIR, env=headless_env(), capture_output=True, text=True, timeout=120)
+        wall_ms = (time.perf_counter() - started) * 1000
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            raise RuntimeError(f"App did not start: {completed.stdout}{completed.stderr}")
+        phases = json.loads(lines[-1])
+        samples["first_paint_ms"].append(phases["first paint"]["total_ms"])
+        samples["wall_ms"].append(wall_ms)
+        samples["phases"].append(phases)
+    return samples
+
+def startup_benchmark(args):
+    """ Time-to-first-paint regression check """
+    samples = measure_startup(args.runs)
+    median = statistics.median(samples["first_paint_ms"])
+    print(f"time to first paint: median {median:.1f} ms, min {min(samples['first_paint_ms']):.1f} ms, "
+          f"max {max(samples['first_paint_ms']):.1f} ms ({args.runs} runs)")
+    print(f"process wall time:   median {statistics.median(samples['wall_ms']):.1f} ms")
+    for phase in samples["phases"][0]:
+        print(f"  {phase:<24} median {statistics.median(run[phase]['ms'] for run in samples['phases']):8.1f} ms")
+
+    failed = False
+    if args.budget is not None and median > args.budget:
+        print(f"REGRESSION: {median:.1f} ms is over the budget of {args.budget:.1f} ms")
+        failed = True
+    if args.baseline and os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)["first_paint_ms"]
+        if median > baseline * (1 + args.tolerance):
+            print(f"REGRESSION: {median:.1f} ms is more than {args.tolerance:.0%} slower than baseline {baseline:.1f} ms")
+            failed = True
+    if args.baseline and (args.update_baseline or not os.path.exists(args.baseline)):
+        with open(args.baseline, "w") as file:
+            json.dump({"first_paint_ms": median}, file)
+        print(f"Baseline saved to {args.baseline}")
+    return 1 if failed else 0
+
+def time_call(function, *args, repeat=20):
+    """ Median milliseconds of repeated calls """
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        if hasattr(result, "__next__"):
+            for _ in result: # Generators do their work only when consumed
+                pass
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def storage_latencies(db, rows, repeat):
+    """ Latency of the app's query set on history of rows results (loaded under unique test names, removed afterwards) """
+    from storage import result_key
+    marker = f"Benchmark {os.getpid()}"
+    test_names = [f"{marker} {number}" for number in range(10)]
+    start = datetime.date(1901, 1, 1)
+    db.copy_results((test_names[number % 10], float(number % 97), "mg/dl", start + datetime.timedelta(days=number % 3650))
+                    for number in range(rows))
+    try:
+        history = sorted(db.iter_results(test_name=test_names[0]), key=result_key)
+        ids = sorted(row[0] for row in history)
+        middle = ids[len(ids) // 2]
+        middle_key = result_key(history[len(history) // 2]) # Keyset page from the middle costs the same as the first one
+        counter = iter(range(10 ** 9))
+        latencies = {
+            "insert": time_call(lambda: db.insert(test_names[1], 1.0, "mg/dl", "1901-06-01"), repeat=repeat),
+            "update": time_call(lambda: db.update(middle, test_names[0], float(next(counter) % 97), "mg/dl", "1901-06-02"), repeat=repeat),
+            "select_page": time_call(db.select_page, middle, 500, repeat=repeat),
+            "select_results": time_call(db.select_results, None, middle_key, 500, repeat=repeat),
+            "select_results_test": time_call(db.select_results, {"test_name": test_names[0]}, middle_key, 500, repeat=repeat),
+            "select_results_range": time_call(
+                db.select_results, {"test_name": test_names[0], "value_min": 10.0, "value_max": 20.0}, middle_key, 500, repeat=repeat),
+            "count_results_test": time_call(db.count_results, {"test_name": test_names[0]}, repeat=repeat),
+            "count_results_range": time_call(db.count_results, {"test_name": test_names[0], "value_min": 10.0, "value_max": 20.0}, repeat=repeat),
+            "select_by_ids": time_call(db.select_by_ids, ids[:50], repeat=repeat),
+            "select_test_history": time_call(db.select_test_history, test_names[0], repeat=repeat),
+            "select_many": time_call(db.select_many, test_names, repeat=repeat),
+            "select_result_days": time_call(db.select_result_days, 1901, 6, repeat=repeat),
+            "select_out_of_range": time_call(db.select_out_of_range, [(name, "mg/dl", 10.0, 80.0, None, None) for name in test_names], repeat=repeat),
+            "select_chosen_column": time_call(db.select_chosen_column, "test_name", repeat=repeat),
+            "iter_results": time_call(db.iter_results, test_names[2], repeat=repeat),
+        }
+        inserted = db.insert_many([(test_names[3], 1.0, "mg/dl", start)] * repeat)
+        latencies["delete"] = time_call(lambda: db.delete(inserted.pop()), repeat=repeat)
+    finally:
+        for test_name in test_names:
+            for result_id in [row[0] for row in db.iter_results(test_name=test_name)]:
+                db.delete(result_id)
+    return latencies
+
+def storage_benchmark(args):
+    """ Conformance of storage backends and side-by-side latency of the app's query set """
+    from storage import open_storage
+    from sqlite_database import SQLiteManager
+    from conformance import run_conformance
+    scratch = tempfile.TemporaryDirectory()
+    backends = {"sqlite": SQLiteManager(os.path.join(scratch.name, "benchmark.sqlite3"))}
+    if args.postgres:
+        backends["postgres"] = open_storage("postgres")
+    failed = False
+    latencies = {}
+    try:
+        for name, db in backends.items():
+            print(f"{name} conformance:")
+            failures = run_conformance(db)
+            failed = failed or bool(failures)
+            latencies[name] = storage_latencies(db, args.rows, args.repeat)
+    finally:
+        for db in backends.values():
+            db.close()
+        scratch.cleanup()
+    print(f"\nmedian latency in ms ({args.rows} rows, {args.repeat} calls each):")
+    print(f"  {'call':<22}" + "".join(f"{name:>12}" for name in latencies))
+    for call in next(iter(latencies.values())):
+        print(f"  {call:<22}" + "".join(f"{latencies[name][call]:12.3f}" for name in latencies))
+    return 1 if failed else 0
+
+def prepared_latencies(db, rows, repeat):
+    """ Latency of every registered statement sent as plain SQL and as EXECUTE of its prepared form, on one connection
+        (rows are loaded under a unique test name and removed afterwards) """
+    test_name = f"Benchmark {os.getpid()}"
+    start = datetime.date(1901, 1, 1)
+    ids = db.insert_many([(test_name, float(number % 97), "mg/dl", start + datetime.timedelta(days=number)) for number in range(rows)])
+    params = {
+        "insert_result": (test_name, 1.0, "mg/dl", start),
+        "update_result": (test_name, 2.0, "mg/dl", start, ids[0]),
+        "delete_result": (-1,), # Missing row - the statement still runs in full
+        "select_page": (ids[0], 50),
+        "select_by_ids": (ids[:20],),
+        "select_chosen_all": (test_name,),
+        "select_statistics": (test_name,),
+    }
+    latencies = {}
+    try:
+        with db.cursor() as cur:
+            def plain(sql, statement_params):
+                cur.execute(sql, statement_params)
+                if cur.description is not None:
+                    cur.fetchall()
+            def prepared(name, statement_params):
+                db.execute_prepared(cur, name, statement_params)
+                if cur.description is not None:
+                    cur.fetchall()
+            for name, statement_params in params.items():
+                sql = db.statements[name][1]
+                plain(sql, statement_params) # Warm up caches and prepare the statement, so only steady state is measured
+                prepared(name, statement_params)
+                latencies[name] = (time_call(plain, sql, statement_params, repeat=repeat),
+                                   time_call(prepared, name, statement_params, repeat=repeat))
+    finally:
+        with db.cursor() as cur:
+            cur.execute(f"DELETE FROM {db.table_name} WHERE test_name = %s;", (test_name,))
+    return latencies
+
+def prepared_benchmark(args):
+    """ Per-call latency saved by prepared statements of the PostgreSQL backend (SQLite reuses prepared statements
+        through the driver's statement cache already) """
+    from storage import open_storage
+    db = open_storage("postgres")
+    try:
+        latencies = prepared_latencies(db, args.rows, args.repeat)
+    finally:
+        db.close()
+    print(f"median latency in ms ({args.rows} rows, {args.repeat} calls each):")
+    print(f"  {'statement':<20}{'plain':>10}{'prepared':>10}{'saved':>10}")
+    for name, (plain, prepared) in latencies.items():
+        print(f"  {name:<20}{plain:10.3f}{prepared:10.3f}{plain - prepared:10.3f}")
+    return 0
+
+def git_revision():
+    """ Short hash of the checked out commit (+ when there are uncommitted changes), None outside a git checkout """
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=APP_DIR, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return revision + ("+" if dirty else "")
+
+def query_latencies(db, repeat):
+    """ Latency of the hot storage calls on synthetic history (see synthetic.py) """
+    from catalog import (load_panels, load_reference_ranges)
+    from synthetic import (busiest_test, START_DATE, END_DATE)
+    test_name = busiest_test()
+    middle = (START_DATE + (END_DATE - START_DATE) / 2, 0) # Keyset page from the middle of the history
+    panel = next(iter(load_panels().values()))
+    bounds = [(name, ranges[0][0], ranges[0][1], ranges[0][2], None, None) for name, ranges in load_reference_ranges().items() if ranges]
+    return {
+        "select_results": time_call(db.select_results, None, None, 500, repeat=repeat),
+        "select_results_middle": time_call(db.select_results, None, middle, 500, repeat=repeat),
+        "select_results_test": time_call(db.select_results, {"test_name": test_name}, middle, 500, repeat=repeat),
+        "select_results_range": time_call(db.select_results, {"test_name": test_name, "value_min": 5.0, "value_max": 6.0}, None, 500, repeat=repeat),
+        "count_results": time_call(db.count_results, repeat=repeat),
+        "count_results_test": time_call(db.count_results, {"test_name": test_name}, repeat=repeat),
+        "select_test_history": time_call(db.select_test_history, test_name, repeat=repeat),
+        "select_statistics": time_call(db.select_statistics, test_name, repeat=repeat),
+        "select_result_days": time_call(db.select_result_days, middle[0].year, middle[0].month, repeat=repeat),
+        "select_many_panel": time_call(lambda: db.select_many(panel, canonical=True), repeat=repeat),
+        "select_out_of_range": time_call(db.select_out_of_range, bounds, repeat=repeat),
+        "select_chosen_column": time_call(db.select_chosen_column, "test_name", repeat=repeat),
+    }
+
+def wait_until_idle(app, window, timeout=120):
+    """ Process events until every database call submitted by the window was delivered (and nothing new was submitted) """
+    from PyQt6.QtCore import QEventLoop
+    deadline = time.monotonic() + timeout
+    while window.worker.tasks:
+        if time.monotonic() > deadline:
+            raise RuntimeError("Window did not finish its database calls in time")
+        app.processEvents(QEventLoop.ProcessEventsFlag.WaitForMoreEvents) # Sleeps until a result is delivered
+    app.processEvents() # Paint what the results changed
+
+def time_action(app, window, action, repeat):
+    """ Median milliseconds from starting action(number) to the window showing its outcome """
+    samples = []
+    for number in range(repeat):
+        started = time.perf_counter()
+        action(number)
+        wait_until_idle(app, window)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def window_latencies(app, window, repeat):
+    """ Latency of the main window's hot paths end to end (database call on the worker thread included) and mean time
+        spent in its UI handlers (recorded by metrics.py) """
+    from metrics import metrics
+    from synthetic import (busiest_test, START_DATE)
+    test_names = [busiest_test()] + [name for name in window.db.select_chosen_column("test_name") if name != busiest_test()][:4]
+    model = window.results_model
+    calendar = window.result_date_input
+
+    def choose(number):
+        window.test_analysis_input.setCurrentText(test_names[number % len(test_names)])
+        window.choose_test()
+
+    def turn_calendar(number):
+        calendar.invalidate_result_days() # Every page is fetched, as after a change of results
+        month = START_DATE.month - 1 + number
+        calendar.setCurrentPage(START_DATE.year + month // 12, month % 12 + 1)
+
+    actions = {
+        "refresh_results_table": lambda number: window.refresh_results_table(),
+        "scroll_page": lambda number: model.fetchMore(),
+        "filter_results": lambda number: model.set_filters({"test_name": test_names[number % 2]}),
+        "choose_test": choose,
+        "calendar_page": turn_calendar,
+    }
+    for action in actions.values():
+        action(0) # Warm-up (plotting libraries are imported on the first analysis)
+        wait_until_idle(app, window)
+    metrics.reset()
+    metrics.enable()
+    try:
+        latencies = {name: time_action(app, window, action, repeat) for name, action in actions.items()}
+    finally:
+        metrics.enable(False)
+    model.set_filters({})
+    wait_until_idle(app, window)
+    for entry in metrics.snapshot():
+        if entry["kind"] == "ui" and entry["phase"] == "total":
+            latencies[f"handler {entry['name']}"] = entry["mean_ms"]
+    return latencies
+
+def open_window():
+    """ Main window on the offscreen platform, returned once its first data was loaded """
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QLocale
+    app = QApplication.instance() or QApplication([sys.argv[0]])
+    QLocale.setDefault(QLocale(QLocale.Language.English, QLocale.Country.UnitedStates))
+    import assets
+    assets.preload()
+    from interface import LabResultsApp
+    window = LabResultsApp()
+    painted = []
+    window.first_painted.connect(lambda: painted.append(True)) # Emitted after deferred startup work was submitted
+    window.show()
+    deadline = time.monotonic() + 60
+    while not painted and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    wait_until_idle(app, window)
+    window.instruction_box.close()
+    return app, window
+
+def compare_with_history(record, history_path, tolerance):
+    """ Print change of every timing against the latest earlier run of another commit with the same backend and size,
+        return names of timings which got slower by more than tolerance (and by over half a millisecond) """
+    previous = None
+    if os.path.exists(history_path):
+        with open(history_path, "r", encoding="utf-8") as file:
+            for line in file:
+                earlier = json.loads(line)
+                if ((earlier["backend"], earlier["rows"]) == (record["backend"], record["rows"])
+                        and earlier["revision"] != record["revision"]):
+                    previous = earlier
+    print(f"\n{record['backend']}, {record['rows']:,} rows (loaded at {record['load_rows_per_s']:,.0f} rows/s), median ms:")
+    if previous is None:
+        print("  (no earlier run of another commit to compare with)")
+    else:
+        print(f"  compared with {previous['revision']} from {previous['date']}")
+        print(f"  {'':<44}{'now':>10}{'before':>10}{'change':>9}")
+    regressions = []
+    for name, milliseconds in record["timings"].items():
+        before = previous["timings"].get(name) if previous else None
+        change = ""
+        if before:
+            change = f"{milliseconds / before - 1:+8.0%}"
+            if milliseconds > before * (1 + tolerance) and milliseconds - before > 0.5:
+                regressions.append(name)
+                change += "  REGRESSION"
+        print(f"  {name:<44}{milliseconds:10.3f}" + (f"{before:10.3f}{change}" if before else ""))
+    return regressions
+
+def suite_benchmark(args):
+    """ Load growing synthetic histories and time storage queries and the main window's hot paths at every size.
+        Results are appended to the history file and compared with the latest run of another commit """
+    from storage import get_database_manager
+    from synthetic import synthetic_results
+    scratch = tempfile.TemporaryDirectory()
+    if args.postgres:
+        os.environ["DB_BACKEND"] = "postgres"
+    else:
+        os.environ["DB_BACKEND"] = "sqlite"
+        os.environ["DB_PATH"] = os.path.join(scratch.name, "suite.sqlite3")
+    db = get_database_manager() # Shared with the window
+    if args.postgres and db.count_results():
+        raise RuntimeError("The database from .env is not empty - the suite needs a scratch database")
+    app = window = None
+    loaded = 0
+    regressions = []
+    try:
+        for number, rows in enumerate(sorted(args.rows)):
+            started = time.perf_counter()
+            db.copy_results(synthetic_results(rows - loaded, seed=args.seed + number)) # Every step spans the whole date range
+            load_rows_per_s = (rows - loaded) / max(time.perf_counter() - started, 1e-9)
+            loaded = rows
+            timings = query_latencies(db, args.repeat)
+            if not args.no_window:
+                if window is None:
+                    app, window = open_window()
+                window.refresh_analysis_options()
+                wait_until_idle(app, window)
+                timings.update(window_latencies(app, window, args.repeat))
+            record = {"revision": git_revision(), "date": datetime.datetime.now().isoformat(timespec="seconds"),
+                      "backend": db.backend, "rows": rows, "seed": args.seed, "repeat": args.repeat,
+                      "load_rows_per_s": round(load_rows_per_s), "timings": {name: round(ms, 3) for name, ms in timings.items()}}
+            regressions += [f"{name} ({rows:,} rows)" for name in compare_with_history(record, args.history, args.tolerance)]
+            with open(args.history, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record) + "\n")
+    finally:
+        if window is not None:
+            window.close()
+        if args.postgres:
+            with db.cursor() as cur:
+                cur.execute(f"DELETE FROM {db.table_name};")
+        db.close()
+        scratch.cleanup()
+    print(f"\nResults appended to {args.history}")
+    if regressions:
+        print(f"REGRESSION: {', '.join(regressions)} got more than {args.tolerance:.0%} slower")
+        return 1
+    return 0
+
+def main():
+    """ Command line entry point: python3 app/benchmark.py startup --runs 5 --budget 1500 / python3 app/benchmark.py storage
+        / python3 app/benchmark.py prepared / python3 app/benchmark.py suite --rows 1000 100000 1000000 """
+    parser = argparse.ArgumentParser(description="Performance benchmarks of Blood Test Tracker")
+    commands = parser.add_subparsers(dest="command", required=True)
+    startup = commands.add_parser("startup", help="time from launch to the first painted window (headless)")
+    startup.add_argument("--runs", type=int, default=5, help="number of launches (median is reported)")
+    startup.add_argument("--budget", type=float, help="fail if median time to first paint is over this many milliseconds")
+    startup.add_argument("--baseline", help="JSON file with baseline result to compare with (created if missing)")
+    startup.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against baseline (0.2 = 20%%)")
+    startup.add_argument("--update-baseline", action="store_true", help="overwrite baseline with this run")
+    startup.set_defaults(run=startup_benchmark)
+    storage = commands.add_parser("storage", help="conformance and latency of storage backends (SQLite in a scratch file)")
+    storage.add_argument("--postgres", action="store_true",
+                         help="also check PostgreSQL from .env - rows are removed afterwards, but use a scratch database")
+    storage.add_argument("--rows", type=int, default=20000, help="results loaded before measuring")
+    storage.add_argument("--repeat", type=int, default=20, help="calls per measured operation")
+    storage.set_defaults(run=storage_benchmark)
+    prepared = commands.add_parser("prepared", help="plain vs prepared hot statements on PostgreSQL from .env (use a scratch database)")
+    prepared.add_argument("--rows", type=int, default=1000, help="results loaded before measuring")
+    prepared.add_argument("--repeat", type=int, default=200, help="calls per measured statement")
+    prepared.set_defaults(run=prepared_benchmark)
+    suite = commands.add_parser("suite", help="storage queries and window hot paths on synthetic histories of growing size (headless)")
+    suite.add_argument("--rows", type=int, nargs="+", default=[1000, 10000, 100000], help="history sizes, e.g. 1000 100000 10000000")
+    suite.add_argument("--repeat", type=int, default=10, help="calls per measured operation")
+    suite.add_argument("--seed", type=int, default=0, help="seed of the synthetic history (same seed = same data)")
+    suite.add_argument("--postgres", action="store_true",
+                       help="use PostgreSQL from .env instead of a scratch SQLite file - must be an empty scratch database, emptied afterwards")
+    suite.add_argument("--no-window", action="store_true", help="time storage queries only")
+    suite.add_argument("--history", default=HISTORY_FILE, help="JSON Lines file results are appended to and compared with")
+    suite.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the previous commit (0.2 = 20%%)")
+    suite.set_defaults(run=suite_benchmark)
+    args = parser.parse_args()
+    try:
+        sys.exit(args.run(args))
+    except Exception as e:
+        print(f"Benchmark failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import assets
+
+def load_lines(file_name):
+    """ Read non-empty lines of text file from resources/textfiles (asset bundle when loaded, loose file otherwise) """
+    return [line.strip() for line in assets.read_text(f"resources/textfiles/{file_name}").splitlines() if line.strip()]
+
+def load_test_names():
+    """ Blood test names that can be entered (sorted) """
+    return sorted(load_lines("tests_names.txt"))
+
+def load_unit_names():
+    """ Units that can be entered (in the file's order) """
+    return load_lines("units_names.txt")
+
+def load_panels():
+    """ Groups of tests shown together on the dashboard: {panel name: [test names]} (in the file's order) """
+    panels = {}
+    current = None
+    for line in load_lines("panels.txt"):
+        if line.startswith("[") and line.endswith("]"):
+            current = panels.setdefault(line[1:-1], [])
+        elif current is not None:
+            current.append(line)
+    return panels
+
+def load_unit_conversions():
+    """ Units each test can be converted between: {test name: (canonical unit, {unit: factor})}.
+        Value in unit multiplied by factor gives value in canonical unit (listed first in the file, factor 1) """
+    conversions = {}
+    current = None
+    for line in load_lines("unit_conversions.txt"):
+        if line.startswith("[") and line.endswith("]"):
+            current = line[1:-1]
+        elif current in conversions:
+            unit, _, factor = line.rpartition("=")
+            conversions[current][1][unit.strip()] = float(factor)
+        elif current is not None:
+            conversions[current] = (line, {line: 1.0})
+    return conversions
+
+def parse_bound(text):
+    """ Number of reference range line, None for an empty (open) side """
+    return float(text) if text else None
+
+def load_reference_ranges():
+    """ Normal ranges of tests: {test name: [(unit, low, high, sex, age from, age to)]} (in the file's order).
+        low/high are None for open sides, sex (F/M) and ages (years, from inclusive, to exclusive) are None when not limited """
+    ranges = {}
+    current = None
+    for line in load_lines("reference_ranges.txt"):
+        if line.startswith("[") and line.endswith("]"):
+            current = ranges.setdefault(line[1:-1], [])
+        elif current is not None:
+            fields = [field.strip() for field in line.split("|")] + ["", ""]
+            unit, low, high, sex, ages = fields[:5]
+            age_from, _, age_to = ages.partition("-")
+            current.append((unit, parse_bound(low), parse_bound(high), sex.upper() or None,
+                            int(age_from) if age_from else None, int(age_to) if age_to else None))
+    return ranges
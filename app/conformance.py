@@ -0,0 +1,190 @@
+import io
+import csv
+import uuid
+import datetime
+from storage import (row_matches, result_key)
+
+class ConformanceError(AssertionError):
+    """ Storage backend behaves differently from what the app expects """
+
+def expect(condition, message):
+    """ Raise ConformanceError with message unless condition holds """
+    if not condition:
+        raise ConformanceError(message)
+
+def check_writes_and_history(db, test_name):
+    """ insert/update/delete keep histories and per-test statistics right """
+    db.insert(test_name, 5.5, "mg/dl", "1901-01-05")
+    db.insert(test_name, 2.0, "mg/dl", datetime.date(1901, 1, 2))
+    results, statistics = db.select_test_history(test_name)
+    expect([row[2] for row in results] == [datetime.date(1901, 1, 2), datetime.date(1901, 1, 5)], "history is not ordered by date")
+    expect(all(isinstance(row[0], float) for row in results), "result values are not returned as floats")
+    expect(statistics is not None and statistics[:5] == (2, 7.5, 34.25, 2.0, 5.5), f"wrong statistics after inserts: {statistics}")
+    expect(statistics[5:7] == (datetime.date(1901, 1, 2), datetime.date(1901, 1, 5)), "wrong first/last date in statistics")
+    version = statistics[7]
+
+    result_id = next(row[0] for row in db.iter_results(test_name=test_name) if row[2] == 2.0)
+    db.update(result_id, test_name, 9.0, "mg/dl", "1901-01-03")
+    statistics = db.select_statistics(test_name)
+    expect(statistics[:5] == (2, 14.5, 111.25, 5.5, 9.0), f"wrong statistics after update: {statistics}")
+    expect(statistics[7] != version, "data version did not change after update")
+
+    expect(db.delete(result_id) is True, "delete of existing row did not return True")
+    expect(db.delete(result_id) is False, "delete of missing row did not return False")
+    statistics = db.select_statistics(test_name)
+    expect(statistics[:5] == (1, 5.5, 30.25, 5.5, 5.5), f"extremes were not recomputed after delete: {statistics}")
+    expect(db.select_chosen_all(test_name) == [(5.5, "mg/dl", datetime.date(1901, 1, 5))], "select_chosen_all returned wrong rows")
+
+def check_bulk_loads(db, test_name):
+    """ insert_many returns IDs (or a count for bulk loads), copy_results returns number of rows """
+    rows = [(test_name, float(day), "g/l", datetime.date(1901, 2, day)) for day in range(1, 11)]
+    ids = db.insert_many(rows[:4], page_size=3)
+    expect(len(ids) == 4 and ids == sorted(ids), f"insert_many did not return ascending IDs: {ids}")
+    expect(db.insert_many(iter(rows[4:7]), page_size=2, bulk=True) == 3, "bulk insert_many did not return number of rows")
+    expect(db.copy_results(iter(rows[7:])) == 3, "copy_results did not return number of rows")
+    expect(db.select_statistics(test_name)[0] == 11, "statistics do not count bulk loaded rows")
+
+def check_paging(db, test_name):
+    """ Keyset pages and lookups by ID used by "Entries History" """
+    ids = [row[0] for row in db.iter_results(test_name=test_name, itersize=3)]
+    expect(ids == sorted(ids), "iter_results is not ordered by ID")
+    page = db.select_page(ids[0] - 1, 3)
+    expect(len(page) == 3 and [row[0] for row in page] == sorted(row[0] for row in page), "select_page is not ordered by ID")
+    expect(page[0][0] == ids[0] and all(row[0] > ids[0] - 1 for row in page), "select_page did not start after given ID")
+    rows = db.select_by_ids([ids[2], ids[0], -1])
+    expect([row[0] for row in rows] == [ids[0], ids[2]], "select_by_ids returned wrong rows")
+    expect(db.select_by_ids([]) == [], "select_by_ids of no IDs is not empty")
+    expect(len(rows[0]) == 5 and isinstance(rows[0][4], datetime.date), "rows are not (id, test_name, value, unit, date)")
+
+def check_filters_and_export(db, test_name):
+    """ Date filters, CSV export, dashboard batch query, calendar days and test names """
+    february = list(db.iter_results(test_name=test_name, date_from=datetime.date(1901, 2, 3), date_to=datetime.date(1901, 2, 5)))
+    expect([row[4].day for row in february] == [3, 4, 5], "date range filter returned wrong rows")
+    file = io.StringIO()
+    db.copy_results_out(file, {"test_name": test_name, "date_from": datetime.date(1901, 2, 3), "date_to": datetime.date(1901, 2, 5)})
+    lines = list(csv.reader(io.StringIO(file.getvalue())))
+    expect(lines[0] == ["id", "test_name", "result_value", "unit", "test_date"], f"wrong CSV header: {lines[0]}")
+    expect([line[4] for line in lines[1:]] == ["1901-02-03", "1901-02-04", "1901-02-05"], "wrong CSV rows")
+    expect(float(lines[1][2]) == 3.0, "CSV value is not a number")
+
+    rows, versions = db.select_many([test_name, f"{test_name} (missing)"], date_to=datetime.date(1901, 1, 31))
+    expect(rows == [(test_name, 5.5, "mg/dl", datetime.date(1901, 1, 5))], f"select_many returned wrong rows: {rows}")
+    expect(set(versions) == {test_name}, "select_many returned versions of missing tests")
+
+    days = db.select_result_days(1901, 2)
+    expect(all(days.get(day, 0) >= 1 for day in range(1, 11)), f"select_result_days missed days: {days}")
+    expect(days.get(5, 0) >= 1 and db.select_result_days(1901, 1).get(5, 0) >= 1, "select_result_days mixed up months")
+    expect(test_name in db.select_chosen_column("test_name"), "select_chosen_column does not list inserted test")
+    try:
+        db.select_chosen_column("test_name FROM results; --")
+        expect(False, "select_chosen_column accepted unknown column")
+    except ValueError:
+        pass
+    units = db.select_latest_units([test_name, f"{test_name} (missing)"])
+    expect(units == {test_name: "g/l"}, f"select_latest_units returned wrong units: {units}")
+
+def check_unit_conversions(db, test_name):
+    """ canonical=True reads values converted by the stored per-test conversion table """
+    db.store_unit_conversions({test_name: ("g/l", {"g/l": 1.0, "mg/dl": 0.01})})
+    try:
+        rows, _ = db.select_many([test_name], date_to=datetime.date(1901, 2, 1), canonical=True)
+        expect(rows == [(test_name, 0.055, "g/l", datetime.date(1901, 1, 5)), (test_name, 1.0, "g/l", datetime.date(1901, 2, 1))],
+               f"select_many did not convert units: {rows}")
+        rows = list(db.iter_results(test_name=test_name, date_to=datetime.date(1901, 1, 31), canonical=True))
+        expect([row[2:] for row in rows] == [(0.055, "g/l", datetime.date(1901, 1, 5))], f"iter_results did not convert units: {rows}")
+        expect(db.select_many([test_name], date_to=datetime.date(1901, 1, 31))[0][0][1:3] == (5.5, "mg/dl"),
+               "stored values were changed by conversion")
+    finally:
+        db.store_unit_conversions({test_name: (None, {})})
+    rows, _ = db.select_many([test_name], date_to=datetime.date(1901, 1, 31), canonical=True)
+    expect(rows[0][1:3] == (5.5, "mg/dl"), "removed conversions are still applied")
+
+def check_out_of_range(db, test_name):
+    """ Results outside reference ranges, paged by (test_date, id) """
+    bounds = [(test_name, "g/l", 2.0, 8.0, None, None), (test_name, "g/l", 0.0, 5.0, datetime.date(1901, 2, 9), None),
+              (test_name, "mg/dl", None, 5.0, datetime.date(1900, 1, 1), datetime.date(1901, 1, 6)),
+              (f"{test_name} (missing)", "g/l", 0.0, 1.0, None, None)]
+    rows = db.select_out_of_range(bounds)
+    rows = [row for row in rows if row[1] == test_name] # Real results may be out of range too
+    expect([(row[2], row[3]) for row in rows] == [(5.5, "mg/dl"), (1.0, "g/l"), (9.0, "g/l"), (10.0, "g/l")],
+           f"select_out_of_range returned wrong rows: {rows}")
+    expect(rows[0][4] == datetime.date(1901, 1, 5), "select_out_of_range does not return dates")
+    page = db.select_out_of_range(bounds[:3], after=(rows[0][4], rows[0][0]), limit=2)
+    expect([row[0] for row in page] == [row[0] for row in rows[1:3]], f"select_out_of_range did not page by date: {page}")
+    expect(db.select_out_of_range([]) == [], "select_out_of_range without bounds is not empty")
+
+def check_keyset_pages(db, test_name):
+    """ Filtered keyset pages ordered by (test_date, id), their counts and the in-memory filter used for notified rows """
+    same_day = db.insert_many([(test_name, 7.5, "mg/dl", datetime.date(1901, 2, 4))] * 3) # Ties broken by ID
+    expected = sorted((row for row in db.iter_results(test_name=test_name)), key=result_key)
+    pages, after = [], None
+    while True:
+        page = db.select_results({"test_name": test_name}, after, 4)
+        pages.append(page)
+        if len(page) < 4:
+            break
+        after = result_key(page[-1])
+    rows = [row for page in pages for row in page]
+    expect(rows == expected, f"select_results pages are not ordered by (test_date, id): {[row[0] for row in rows]}")
+    expect(list(db.iter_pages({"test_name": test_name}, page_size=2)) == expected, "iter_pages returned wrong rows")
+    expect(db.count_results({"test_name": test_name}) == len(expected), "count_results of one test is wrong")
+    expect(db.count_results() >= len(expected), "count_results of all results is too low")
+
+    filters = {"test_name": test_name, "unit": "g/l", "date_from": datetime.date(1901, 2, 3),
+               "date_to": datetime.date(1901, 2, 8), "value_min": 4.0, "value_max": 6.0}
+    rows = db.select_results(filters)
+    expect([(row[2], row[4].day) for row in rows] == [(4.0, 4), (5.0, 5), (6.0, 6)], f"select_results filters returned wrong rows: {rows}")
+    expect(db.count_results(filters) == 3, "count_results with filters is wrong")
+    expect([row for row in expected if row_matches(filters, row)] == rows, "row_matches differs from select_results filters")
+    expect(db.select_results(filters, after=result_key(rows[-1])) == [], "select_results did not start after given key")
+    for result_id in same_day:
+        db.delete(result_id)
+
+def check_test_names(db, test_name):
+    """ Keyset pages of several tests at once (as searched in "Entries History") and their counts """
+    other_name = f"{test_name} B"
+    db.insert_many([(test_name if day % 3 else other_name, float(day), "mg/dl", datetime.date(1901, 3, day // 2 + 1)) for day in range(12)])
+    try:
+        names = [test_name, other_name]
+        expected = sorted((row for name in names for row in db.iter_results(test_name=name)), key=result_key)
+        rows, after = [], None
+        while True:
+            page = db.select_results({"test_names": names}, after, 5)
+            rows += page
+            if len(page) < 5:
+                break
+            after = result_key(page[-1])
+        expect(rows == expected, f"select_results pages of several tests are wrong: {[row[0] for row in rows]}")
+        expect(db.count_results({"test_names": names}) == len(expected), "count_results of several tests is wrong")
+        filters = {"test_names": names, "value_min": 3.0, "value_max": 8.0, "date_from": datetime.date(1901, 3, 3)}
+        rows = db.select_results(filters)
+        expect(rows == [row for row in expected if row_matches(filters, row)], f"select_results of several tests with filters is wrong: {rows}")
+        expect(db.count_results(filters) == len(rows), "count_results of several tests with filters is wrong")
+        expect(db.select_results({"test_names": []}) == [] and db.count_results({"test_names": []}) == 0, "empty test_names matched results")
+    finally:
+        for row in list(db.iter_results(test_name=other_name)):
+            db.delete(row[0])
+
+CHECKS = [check_writes_and_history, check_bulk_loads, check_paging, check_filters_and_export, check_unit_conversions,
+          check_out_of_range, check_keyset_pages, check_test_names]
+
+def run_conformance(db, report=print):
+    """ Run the app's query set against storage backend and return names of failed checks.
+        Rows are written under a unique test name in year 1901 and removed afterwards, but use a scratch database anyway """
+    test_name = f"Conformance {uuid.uuid4().hex[:8]}"
+    failed = []
+    try:
+        for check in CHECKS:
+            try:
+                check(db, test_name)
+                report(f"  ok      {check.__name__}")
+            except Exception as e:
+                report(f"  FAILED  {check.__name__}: {e}")
+                failed.append(check.__name__)
+    finally:
+        for row in list(db.iter_results(test_name=test_name)):
+            db.delete(row[0])
+    if db.select_statistics(test_name) is not None:
+        report("  FAILED  cleanup: statistics of deleted test were not removed")
+        failed.append("cleanup")
+    return failed
@@ -1,22 +1,22 @@
-import os
-from PyQt6.QtWidgets import (QCalendarWidget, QToolButton, QSpinBox)
-from PyQt6.QtCore import (QDate, Qt, QSize)
-from PyQt6.QtGui import (QTextCharFormat, QColor, QFont, QIcon)
+import assets
+from PyQt6.QtWidgets import (QCalendarWidget, QToolButton, QSpinBox, QLabel, QStyledItemDelegate)
+from PyQt6.QtCore import (QDate, Qt, QSize, QPointF)
+from PyQt6.QtGui import (QTextCharFormat, QColor, QFont, QIcon, QPainter)
 
 class CustomCalendarWidget(QCalendarWidget):
-    """ Custom Qt's Calendar Widget """
-    def __init__(self):
-        """ Initialize CustomCalendarWidget instance"""
+    """ Custom Qt's Calendar Widget. Days of the shown month are painted directly in paintCell (no per-date formats to reset
+        on month change) and days which already have results are marked with a dot """
+    def __init__(self, request_result_days=None):
+        """ Initialize CustomCalendarWidget instance.
+            request_result_days(year, month, on_result) fetches {day of month: number of results} asynchronously """
         super().__init__() # Inherit from QCalendarWidget
-        self.current_dir = os.path.dirname(os.path.abspath(__file__))
-        self.left_arrow_dir = os.path.join(self.current_dir, "images/left-arrow.png")
-        self.right_arrow_dir = os.path.join(self.current_dir, "images/right-arrow.png")
-        self.up_arrow_dir = os.path.join(self.current_dir, "images/up-arrow.png")
-        self.down_arrow_dir = os.path.join(self.current_dir, "images/down-arrow.png")
+        self.request_result_days = request_result_days
+        self.result_days = {} # Cached per shown month: {(year, month): {day: number of results}}
+        self.result_days_generation = 0 # Increased when cache is dropped - answers to older requests are ignored
 
         self.setStyleSheet("selection-background-color: #35a854; color: white; background-color:#dcdadb; border-radius: 10px; padding: 10px;")
-        font = QFont("Roboto Regular", 11)
-        self.setFont(font)
+        self.cell_font = QFont("Roboto Regular", 11)
+        self.setFont(self.cell_font)
 
         # Header formatting (for day names Monday-Sunday)
         self.days = QTextCharFormat()
@@ -30,47 +30,73 @@ class CustomCalendarWidget(QCalendarWidget):
         self.setVerticalHeaderFormat(QCalendarWidget.VerticalHeaderFormat.NoVerticalHeader)  
         self.setMaximumDate(QDate.currentDate()) # Disable selecting date set in the future
 
-        # Initialize weekday and weekend formatting (to visually differentiate)
-        self.weekday_formatting = QTextCharFormat()
-        self.weekday_formatting.setBackground(QColor("#2b5eb0"))
-        self.weekday_formatting.setFont(font)
-        self.weekday_formatting.setForeground(QColor("white"))
-        self.weekend_formatting = QTextCharFormat()
-        self.weekend_formatting.setBackground(QColor("#dcdadb"))
-        self.weekend_formatting.setFont(font)
-        self.weekend_formatting.setForeground(QColor("red"))
-        self.update_month_view_format() # Apply formatting
+        # Weekday and weekend colors (to visually differentiate), days with results get a marker
+        self.weekday_background = QColor("#2b5eb0")
+        self.weekday_foreground = QColor("white")
+        self.weekend_background = QColor("#dcdadb")
+        self.weekend_foreground = QColor("red")
+        self.selected_background = QColor("#35a854")
+        self.disabled_background = QColor("#ecebeb") # Days outside minimumDate-maximumDate (cannot be selected)
+        self.disabled_foreground = QColor("#a0a0a0")
 
-        # Manage formatting when user changes month view
-        self.currentPageChanged.connect(self.update_month_view_format)
+        # Fetch marked days when user changes month view
+        self.currentPageChanged.connect(self.load_result_days)
 
         # Customize navigation bar and year selection
         self.customize_navigation_bar()
         self.customize_year_selection()
 
-    def update_month_view_format(self):
-        """ Update the weekday and weekend formatting only for the days of the current month """
-        self.clear_date_formats() # Clean previous formatting (different month = different set of days = different formatting)
-        current_month = self.monthShown()
-        current_year = self.yearShown()
-
-        # Apply formatting for each VALID DATE in the current month
-        for day in range(1, 32): 
-            date = QDate(current_year, current_month, day)
-            if date.isValid() and date.month() == current_month:
-                # Set formatting for valid days (different for week days and weekend days)
-                if date.dayOfWeek() == 6 or date.dayOfWeek() == 7:
-                    self.setDateTextFormat(date, self.weekend_formatting)
-                else:
-                    self.setDateTextFormat(date, self.weekday_formatting)
-
-    def clear_date_formats(self):
-        """ Clear all date formats """
-        for day in range(1, 32):
-            for month in range(1, 13):
-                date = QDate(self.yearShown(), month, day)
-                if date.isValid():
-                    self.setDateTextFormat(date, QTextCharFormat())
+    def paintCell(self, painter, rect, date):
+        """ Paint one day - only days of the shown month are styled (days which cannot be selected greyed out),
+            the rest is left to Qt """
+        if date.month() != self.monthShown() or date.year() != self.yearShown():
+            super().paintCell(painter, rect, date)
+            return
+        weekend = date.dayOfWeek() in (6, 7)
+        if date < self.minimumDate() or date > self.maximumDate():
+            background, foreground = self.disabled_background, self.disabled_foreground
+        elif date == self.selectedDate():
+            background, foreground = self.selected_background, QColor("white")
+        elif weekend:
+            background, foreground = self.weekend_background, self.weekend_foreground
+        else:
+            background, foreground = self.weekday_background, self.weekday_foreground
+        painter.save()
+        painter.fillRect(rect, background)
+        painter.setPen(foreground)
+        painter.setFont(self.cell_font)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, str(date.day()))
+        if date.day() in self.result_days.get((date.year(), date.month()), ()):
+            # Dot under the day number (in its color) - there are already results from that day
+            radius = max(2.0, rect.height() / 12)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            painter.setPen(Qt.PenStyle.NoPen)
+            painter.setBrush(foreground)
+            painter.drawEllipse(QPointF(rect.center().x() + 0.5, rect.bottom() - radius - 2), radius, radius)
+        painter.restore()
+
+    def load_result_days(self, year=None, month=None):
+        """ Fetch days of the shown month having results (one aggregate query per month, cached until results change) """
+        year = year or self.yearShown()
+        month = month or self.monthShown()
+        if self.request_result_days is None or (year, month) in self.result_days:
+            return
+        generation = self.result_days_generation
+        self.request_result_days(year, month, lambda days: self.set_result_days(generation, year, month, days))
+
+    def set_result_days(self, generation, year, month, days):
+        """ Cache fetched days and repaint them if their month is shown """
+        if generation != self.result_days_generation:
+            return # Results changed since the request was sent
+        self.result_days[(year, month)] = days
+        if (year, month) == (self.yearShown(), self.monthShown()):
+            self.updateCells()
+
+    def invalidate_result_days(self):
+        """ Forget cached months (results were changed) and fetch the shown one again """
+        self.result_days_generation += 1
+        self.result_days.clear()
+        self.load_result_days()
 
     def customize_navigation_bar(self):
         """ Customize the navigation bar (mainly the month and year navigation buttons) """
@@ -82,12 +108,12 @@ class CustomCalendarWidget(QCalendarWidget):
             button.setStyleSheet("color: white; background-color: #2b5eb0; border-radius: 5px; padding: 2px;")
             # Left arrow button
             if button.objectName() == "qt_calendar_prevmonth":
-                button.setIcon(QIcon(self.left_arrow_dir))
+                button.setIcon(QIcon(assets.pixmap("images/left-arrow.png")))
                 button.setIconSize(QSize(30, 20))  
                 button.setStyleSheet("margin-left: 100px;")  
             # Right arrow button
             elif button.objectName() == "qt_calendar_nextmonth":
-                button.setIcon(QIcon(self.right_arrow_dir))
+                button.setIcon(QIcon(assets.pixmap("images/right-arrow.png")))
                 button.setIconSize(QSize(30, 20)) 
                 button.setStyleSheet("margin-right: 100px;")
 
@@ -107,11 +133,56 @@ class CustomCalendarWidget(QCalendarWidget):
 
     def customize_year_selection(self):
         """ Customize the year selection spinner """
-        stylesheet_file = os.path.join(self.current_dir, "resources/styles/calendar_spinbox.qss")
-        with open(stylesheet_file, "r") as file:
-            stylesheet = file.read()
+        stylesheet = assets.stylesheet("calendar_spinbox.qss")
         # Find the year spinbox and apply the custom stylesheet
         year_spinbox = self.findChild(QSpinBox)
         if year_spinbox:
             year_spinbox.setFont(QFont("Roboto", 12))
-            year_spinbox.setStyleSheet(stylesheet)
\ No newline at end of file
+            year_spinbox.setStyleSheet(stylesheet)
+class ScaledImageLabel(QLabel):
+    """ Label showing a pixmap scaled to the label's size (keeping aspect ratio) """
+    def __init__(self, pixmap):
+        """ Initialize ScaledImageLabel instance """
+        super().__init__()
+        self.original_pixmap = pixmap
+        self.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.setMinimumSize(1, 1) # Allow shrinking below the pixmap's size
+        self.setStyleSheet("background-color: transparent;")
+
+    def resizeEvent(self, event):
+        """ Rescale the pixmap when the label is resized """
+        if not self.original_pixmap.isNull():
+            self.setPixmap(self.original_pixmap.scaled(
+                self.size(), Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation))
+        super().resizeEvent(event)
+
+
+class FlagDelegate(QStyledItemDelegate):
+    """ Paints result value with an arrow marking results above (red) or below (blue) reference range.
+        Flags are read from the item (flag_role), they are computed in batches beforehand - never while painting """
+    MARKERS = {1: ("\u25b2", QColor("#c0392b")), -1: ("\u25bc", QColor("#2b5eb0"))}
+
+    def __init__(self, flag_role, parent=None):
+        """ Initialize FlagDelegate instance """
+        super().__init__(parent)
+        self.flag_role = flag_role
+
+    def initStyleOption(self, option, index):
+        """ Elide text of flagged cells early, so it leaves room for the arrow """
+        super().initStyleOption(option, index)
+        marker = self.MARKERS.get(index.data(self.flag_role))
+        if marker is not None and option.text:
+            width = option.rect.width() - option.fontMetrics.horizontalAdvance(marker[0]) - 14
+            option.text = option.fontMetrics.elidedText(option.text, Qt.TextElideMode.ElideRight, max(width, 0))
+
+    def paint(self, painter, option, index):
+        """ Default cell painting plus the arrow at its right edge """
+        super().paint(painter, option, index)
+        marker = self.MARKERS.get(index.data(self.flag_role))
+        if marker is None:
+            return
+        symbol, color = marker
+        painter.save()
+        painter.setPen(color)
+        painter.drawText(option.rect.adjusted(0, 0, -6, 0), Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, symbol)
+        painter.restore()
@@ -0,0 +1,128 @@
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QGridLayout, QComboBox, QLabel, QScrollArea, QWidget)
+from PyQt6.QtCore import (Qt, pyqtSignal)
+from PyQt6.QtGui import (QPixmap, QFont)
+from catalog import load_panels
+from render import (render_trend, group_series, UNIT_SEPARATOR)
+
+def fetch_panel(db, test_names):
+    """ Fetch histories of all panel's tests with one batched query, in canonical units (runs on worker thread) """
+    rows, versions = db.select_many(test_names, canonical=True)
+    return group_series(rows, versions)
+
+class DashboardDialog(QDialog):
+    """ Small multiples of all tests from one panel (e.g. CBC, lipid panel). Charts are rendered offscreen
+        in a process pool and filled in one by one as they are ready, rendered images are cached by data version """
+    rendered = pyqtSignal(object, object, object) # (generation, test_name, data_version), PNG bytes (None on failure), error message
+    TILE_WIDTH = 360
+    TILE_HEIGHT = 240
+    COLUMNS = 3
+
+    def __init__(self, db, worker, executor, image_cache, parent=None):
+        """ Initialize DashboardDialog instance (image_cache is shared between openings: {test_name: (data_version, pixmap)}) """
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.executor = executor
+        self.image_cache = image_cache
+        self.panels = load_panels()
+        self.generation = 0 # Increased with every panel switch - late images of previous panel are not shown
+        self.futures = []
+        self.tiles = {}
+        self.rendered.connect(self.on_rendered)
+
+        self.setWindowTitle("Dashboard")
+        self.setStyleSheet("background-color: #dcdadb; color: black;")
+        layout = QVBoxLayout()
+        self.panel_input = QComboBox()
+        self.panel_input.setFont(QFont("Roboto Regular", 12))
+        self.panel_input.setStyleSheet("background-color: #9e2a47; color: #dcdadb; padding: 5px;")
+        self.panel_input.addItems(list(self.panels))
+        self.panel_input.currentTextChanged.connect(self.show_panel)
+        layout.addWidget(self.panel_input)
+
+        self.grid = QGridLayout()
+        grid_widget = QWidget()
+        grid_widget.setLayout(self.grid)
+        scroll_area = QScrollArea()
+        scroll_area.setWidgetResizable(True)
+        scroll_area.setWidget(grid_widget)
+        layout.addWidget(scroll_area)
+        self.setLayout(layout)
+        self.resize(self.TILE_WIDTH * self.COLUMNS + 80, self.TILE_HEIGHT * 3 + 100)
+        self.show_panel(self.panel_input.currentText())
+
+    def show_panel(self, panel_name):
+        """ Lay out empty tiles and fetch data of all panel's tests at once """
+        self.generation += 1
+        for future in self.futures:
+            future.cancel() # Charts of previous panel which did not start rendering yet
+        self.futures = []
+        while self.grid.count():
+            self.grid.takeAt(0).widget().deleteLater()
+        self.tiles = {}
+        test_names = self.panels.get(panel_name, [])
+        for position, test_name in enumerate(test_names):
+            tile = QLabel(f"{test_name}\nLoading...")
+            tile.setAlignment(Qt.AlignmentFlag.AlignCenter)
+            tile.setFixedSize(self.TILE_WIDTH, self.TILE_HEIGHT)
+            tile.setWordWrap(True)
+            self.grid.addWidget(tile, position // self.COLUMNS, position % self.COLUMNS)
+            self.tiles[test_name] = tile
+        generation = self.generation
+        self.worker.submit(
+            fetch_panel, self.db, test_names,
+            on_result=lambda series: self.render_panel(generation, series),
+            key=("dashboard_panel", id(self))) # Per dialog - another open dashboard must not replace this fetch
+
+    def render_panel(self, generation, series):
+        """ Show cached charts right away and send the rest to the process pool """
+        for test_name, tile in self.tiles.items():
+            if test_name not in series:
+                tile.setText(f"{test_name}\nNo results")
+                continue
+            x, values, unit, data_version = series[test_name]
+            if UNIT_SEPARATOR in unit:
+                # Values in units without known conversion are not comparable - same rule as reports and "Analysis"
+                tile.setText(f"{test_name}\nMultiple units without known conversion ({unit}) - not plotted")
+                continue
+            cached_version, pixmap = self.image_cache.get(test_name, (None, None))
+            if pixmap is not None and cached_version == data_version:
+                tile.setPixmap(pixmap)
+                continue
+            future = self.executor.submit(render_trend, test_name, x, values, unit, self.TILE_WIDTH, self.TILE_HEIGHT)
+            future.add_done_callback(
+                lambda future, target=(generation, test_name, data_version): self.emit_rendered(target, future))
+            self.futures.append(future)
+
+    def emit_rendered(self, target, future):
+        """ Hand rendered image over to GUI thread (called on executor's thread) """
+        if future.cancelled():
+            return
+        image, error = None, None
+        try:
+            image = future.result()
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        try:
+            self.rendered.emit(target, image, error)
+        except RuntimeError:
+            pass # Dialog was already closed
+
+    def on_rendered(self, target, image, error):
+        """ Cache rendered chart and show it if its panel is still displayed (or why it could not be rendered) """
+        generation, test_name, data_version = target
+        if image is None:
+            if generation == self.generation and test_name in self.tiles:
+                self.tiles[test_name].setText(f"{test_name}\nCannot render chart: {error}")
+            return
+        pixmap = QPixmap()
+        pixmap.loadFromData(image, "PNG")
+        self.image_cache[test_name] = (data_version, pixmap)
+        if generation == self.generation and test_name in self.tiles:
+            self.tiles[test_name].setPixmap(pixmap)
+
+    def closeEvent(self, event):
+        """ Do not render charts nobody will see """
+        for future in self.futures:
+            future.cancel()
+        super().closeEvent(event)
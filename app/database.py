@@ -1,13 +1,140 @@
 import os
+import re
+import io
+import csv
+import time
+import datetime
+import weakref
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
 import psycopg2
-from PyQt6.QtWidgets import QMessageBox
+from psycopg2 import extensions, pool
+from psycopg2.extras import execute_values
+from storage import (StorageBackend, batched, conversion_rows, checked_column, merge_test_pages)
+from metrics import metrics
 
 load_dotenv()
 
-class DatabaseManager():
-    """ Connects to app's database and enables basic operations on table storing blood test results
-        (insert, update, delete, select) """
+CHANGES_CHANNEL = "results_changed" # Channel notified by the trigger installed by migration 7 (migrations.change_notifications)
+
+# Hot statements of the GUI, prepared once per pooled connection: name -> (parameter types, SQL with %s placeholders)
+STATEMENTS = {
+    "insert_result": ("text, float8, text, date", """
+        INSERT INTO {table} (test_name, result_value, unit, test_date) VALUES (%s, %s, %s, %s)"""),
+    "update_result": ("text, float8, text, date, integer", """
+        UPDATE {table} SET test_name = %s, result_value = %s, unit = %s, test_date = %s WHERE id = %s"""),
+    "delete_result": ("integer", "DELETE FROM {table} WHERE id = %s"),
+    "select_page": ("integer, bigint", "SELECT id, test_name, result_value, unit, test_date FROM {table} WHERE id > %s ORDER BY id LIMIT %s"),
+    "select_by_ids": ("integer[]", "SELECT id, test_name, result_value, unit, test_date FROM {table} WHERE id = ANY(%s) ORDER BY id"),
+    "select_chosen_all": ("text", "SELECT result_value, unit, test_date FROM {table} WHERE test_name = %s ORDER BY test_date"),
+    "select_statistics": ("text", """
+        SELECT result_count, value_sum, value_sum_sq, min_value, max_value, first_date, last_date, data_version
+        FROM results_schema.test_statistics WHERE test_name = %s"""),
+}
+
+def numbered_placeholders(sql):
+    """ Turn %s placeholders into $1, $2, ... used by PREPARE """
+    numbers = iter(range(1, sql.count("%s") + 1))
+    return re.sub(r"%s", lambda match: f"${next(numbers)}", sql)
+
+class TimedCursor(extensions.cursor):
+    """ Cursor recording execute and fetch time of the running storage call when metrics are enabled (see metrics.py) """
+    def execute(self, query, vars=None):
+        """ Execute one statement """
+        if not metrics.enabled:
+            return super().execute(query, vars)
+        return metrics.phase("execute", super().execute, query, vars)
+
+    def copy_expert(self, sql, file, size=8192):
+        """ Run COPY FROM STDIN / TO STDOUT streaming rows from/to file """
+        if not metrics.enabled:
+            return super().copy_expert(sql, file, size)
+        return metrics.phase("execute", super().copy_expert, sql, file, size)
+
+    def fetchone(self):
+        """ Fetch next row """
+        if not metrics.enabled:
+            return super().fetchone()
+        return metrics.phase("fetch", super().fetchone)
+
+    def fetchmany(self, size=None):
+        """ Fetch next rows (cursor's arraysize by default) """
+        size = self.arraysize if size is None else size
+        if not metrics.enabled:
+            return super().fetchmany(size)
+        return metrics.phase("fetch", super().fetchmany, size, rows=True)
+
+    def fetchall(self):
+        """ Fetch remaining rows """
+        if not metrics.enabled:
+            return super().fetchall()
+        return metrics.phase("fetch", super().fetchall, rows=True)
+
+class ChangeListener():
+    """ Dedicated (not pooled) connection LISTENing for changes made to the results table """
+    def __init__(self, connection_kwargs):
+        """ Open the connection and subscribe to the changes channel """
+        self.conn = psycopg2.connect(**connection_kwargs)
+        self.conn.set_isolation_level(extensions.ISOLATION_LEVEL_AUTOCOMMIT) # Notifications are delivered outside transactions
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {CHANGES_CHANNEL};")
+
+    def fileno(self):
+        """ Socket descriptor which becomes readable when a notification arrives """
+        return self.conn.fileno()
+
+    def poll(self):
+        """ Consume pending notifications and return the last operation per row ID ({id: "INSERT"/"UPDATE"/"DELETE"}).
+            Bulk loads are reported as {0: "RELOAD"} """
+        self.conn.poll()
+        changes = {}
+        while self.conn.notifies:
+            notify = self.conn.notifies.pop(0)
+            operation, _, result_id = notify.payload.partition(":")
+            changes[int(result_id)] = operation
+        return changes
+
+    def close(self):
+        """ Close the listening connection """
+        if not self.conn.closed:
+            self.conn.close()
+
+class CopyStream():
+    """ File-like object feeding COPY FROM STDIN with CSV lines produced lazily from an iterator of rows,
+        so the whole input never has to be kept in memory """
+    def __init__(self, rows):
+        """ Initialize CopyStream instance """
+        self.rows = iter(rows)
+        self.remainder = ""
+        self.row_count = 0
+
+    def read(self, size=-1):
+        """ Return next chunk of CSV text (empty string at the end) """
+        out = io.StringIO()
+        out.write(self.remainder)
+        writer = csv.writer(out, lineterminator="\n")
+        while size < 0 or out.tell() < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            writer.writerow(row)
+            self.row_count += 1
+        data = out.getvalue()
+        if size < 0:
+            self.remainder = ""
+            return data
+        data, self.remainder = data[:size], data[size:]
+        return data
+
+    readline = read
+
+class DatabaseManager(StorageBackend):
+    """ Connects to app's PostgreSQL database and enables basic operations on table storing blood test results
+        (insert, update, delete, select). Connections are kept in a bounded pool and reused between calls.
+        Methods raise on errors and are safe to call from worker threads - reporting is left to the caller """
+    backend = "postgres"
+
     def __init__(self):
         """ Initialize DatabaseManager instance based on .env file content """
         self.dbname = os.getenv("DB_NAME", "tracker")
@@ -15,142 +142,382 @@ class DatabaseManager():
         self.password = os.getenv("DB_PASSWORD")
         self.host = os.getenv("DB_HOST", "localhost") # Default to localhost
         self.port = os.getenv("DB_PORT", "5432") # Default to 5432
-        self.table_name = "results_schema.results" 
+        self.pool_min = int(os.getenv("DB_POOL_MIN", "1")) # Connections opened up front
+        self.pool_max = int(os.getenv("DB_POOL_MAX", "5")) # Upper bound of simultaneously opened connections
+        self.ping_after = float(os.getenv("DB_POOL_PING_AFTER", "30")) # Seconds of idleness after which a connection is checked
+        self.table_name = "results_schema.results"
+        self.canonical_view = "results_schema.canonical_results" # Values converted to canonical units (migration 4)
 
         # Validate required environment variables
         if not all([self.dbname, self.user, self.password]):
             raise ValueError("Missing required environment variables (DB_NAME, DB_USER, or DB_PASSWORD)!")
 
+        self.pool = None # Created lazily on first use
+        self.pool_lock = threading.Lock()
+        self.pool_slots = threading.BoundedSemaphore(self.pool_max) # Makes callers wait instead of failing when pool is exhausted
+        self.last_used = {} # Connection id -> time it was returned to the pool
+        self.statements = {name: (types, sql.format(table=self.table_name)) for name, (types, sql) in STATEMENTS.items()}
+        self.prepared = weakref.WeakKeyDictionary() # Connection -> names of statements prepared in its session
+
     def connect_to_db(self):
-        """ Establish connection to the database """
+        """ Create the connection pool (if not created yet) and return it """
+        with self.pool_lock:
+            if self.pool is None:
+                self.pool = pool.ThreadedConnectionPool(self.pool_min, self.pool_max, **self.connection_kwargs())
+            return self.pool
+
+    def connection_kwargs(self):
+        """ Connection parameters read from .env file """
+        return dict(dbname=self.dbname, user=self.user, password=self.password, host=self.host, port=self.port)
+
+    def listen_changes(self):
+        """ Start listening for changes of results table (see ChangeListener) - None when the notifying trigger is missing
+            (database not upgraded yet): LISTEN would succeed, but no notification would ever arrive """
+        with self.cursor() as cur:
+            cur.execute("""
+            SELECT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'results_changed' AND tgrelid = to_regclass('results_schema.results'));
+            """)
+            if not cur.fetchone()[0]:
+                return None
+        return ChangeListener(self.connection_kwargs())
+
+    def is_healthy(self, conn):
+        """ Check if pooled connection can still be used (ping it only if it was idle for a while) """
+        if conn.closed:
+            return False
+        if conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        last_used = self.last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < self.ping_after:
+            return True # Freshly opened or recently used
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def acquire(self):
+        """ Take a healthy connection from the pool, reconnecting if the pooled one is broken """
+        db_pool = self.connect_to_db()
+        self.pool_slots.acquire()
         try:
-            conn = psycopg2.connect(
-                dbname=self.dbname,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port)
+            conn = db_pool.getconn()
+            if not self.is_healthy(conn):
+                # Drop the broken connection, the pool opens a fresh one in its place
+                self.last_used.pop(id(conn), None)
+                db_pool.putconn(conn, close=True)
+                conn = db_pool.getconn()
             return conn
-        except Exception as e:
-            QMessageBox.critical(None, "Connection Error", str(e))
-            return None
-        
-    def insert(self, test_name, result_value, unit, result_date):
-        """ Insert data into the results table in the database """
-        conn = self.connect_to_db()
-        if not conn:
-            return
+        except Exception:
+            self.pool_slots.release()
+            raise
+
+    def release(self, conn, broken=False):
+        """ Return connection to the pool (closing it if it is broken) """
         try:
-            cur = conn.cursor()
-            sql = f"""
-            INSERT INTO {self.table_name} (test_name, result_value, unit, test_date)
-            VALUES (%s, %s, %s, %s);
-            """
-            cur.execute(sql, (test_name, result_value, unit, result_date))
-            conn.commit()
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
+            if broken or conn.closed:
+                self.last_used.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+            else:
+                self.last_used[id(conn)] = time.monotonic()
+                self.pool.putconn(conn)
         finally:
-            conn.close()
+            self.pool_slots.release()
 
-    def delete(self, result_id):
-        """ Delete data from the specified table in the database by ID """
-        conn = self.connect_to_db()
-        if not conn:
-            return
+    @contextmanager
+    def cursor(self, name=None):
+        """ Context manager lending a cursor from a pooled connection (named = server-side cursor).
+            Commits on success, rolls back on error and returns the connection to the pool """
+        conn = metrics.phase("connect", self.acquire) if metrics.enabled else self.acquire()
+        broken = False
         try:
-            cur = conn.cursor()
-            sql = f"DELETE FROM {self.table_name} WHERE id = %s;"
-            cur.execute(sql, (result_id,))
+            with conn.cursor(name=name, cursor_factory=TimedCursor) as cur:
+                yield cur
             conn.commit()
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True # Connection was lost - do not give it back to other callers
+            raise
+        except BaseException:
+            conn.rollback() # Also when a streaming generator is closed before it was exhausted
+            raise
         finally:
-            conn.close()
+            self.release(conn, broken)
+
+    @contextmanager
+    def bulk_cursor(self):
+        """ Cursor for bulk loads. Per-row change notifications are suppressed in its transaction
+            and listeners get a single RELOAD notification instead """
+        with self.cursor() as cur:
+            cur.execute("SET LOCAL tracker.bulk_load = 'on';")
+            yield cur
+            cur.execute(f"NOTIFY {CHANGES_CHANNEL}, 'RELOAD:0';") # Delivered on commit
+
+    def execute_prepared(self, cur, name, params):
+        """ Run registered statement on cursor's connection - PREPAREd on its first use in the session (the server parses
+            and plans it once), only EXECUTEd with parameters afterwards """
+        prepared = self.prepared.get(cur.connection)
+        if prepared is None:
+            # Connection is new to this manager - ask the server, so a statement is never prepared twice
+            cur.execute("SELECT name FROM pg_prepared_statements;")
+            prepared = self.prepared[cur.connection] = {row[0] for row in cur.fetchall()}
+        if name not in prepared:
+            types, sql = self.statements[name]
+            cur.execute(f"PREPARE {name} ({types}) AS {numbered_placeholders(sql)};")
+            prepared.add(name) # Prepared statements outlive transactions, also rolled back ones
+        cur.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))});", params)
+
+    def close(self):
+        """ Close all pooled connections (when the app is being closed) """
+        with self.pool_lock:
+            if self.pool is not None:
+                self.pool.closeall()
+                self.pool = None
+                self.last_used.clear()
+
+    def insert(self, test_name, result_value, unit, result_date):
+        """ Insert data into the results table in the database """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "insert_result", (test_name, result_value, unit, result_date))
+
+    def copy_results(self, rows):
+        """ Load (test_name, result_value, unit, test_date) rows with COPY FROM STDIN in one transaction.
+            Rows are consumed lazily, return number of loaded rows """
+        stream = CopyStream(rows)
+        with self.bulk_cursor() as cur:
+            sql = f"COPY {self.table_name} (test_name, result_value, unit, test_date) FROM STDIN WITH (FORMAT csv);"
+            cur.copy_expert(sql, stream)
+        return stream.row_count
+
+    def insert_many(self, rows, page_size=1000, bulk=False):
+        """ Insert (test_name, result_value, unit, test_date) rows with multi-row INSERTs in one transaction.
+            Return IDs of inserted rows (or only their number for bulk loads, which are not notified row by row) """
+        sql = f"INSERT INTO {self.table_name} (test_name, result_value, unit, test_date) VALUES %s RETURNING id;"
+        if bulk:
+            count = 0
+            with self.bulk_cursor() as cur:
+                for batch in batched(rows, page_size):
+                    execute_values(cur, sql, batch, page_size=page_size)
+                    count += len(batch)
+            return count
+        ids = []
+        with self.cursor() as cur:
+            for batch in batched(rows, page_size):
+                ids.extend(row[0] for row in execute_values(cur, sql, batch, page_size=page_size, fetch=True))
+        return ids
+
+    def delete(self, result_id):
+        """ Delete data from the specified table in the database by ID, return True if the row existed """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "delete_result", (result_id,))
+            return cur.rowcount > 0
 
-    def get_result_id(self, test_name, result_value, unit, test_date):
-        """ Get the result ID from the database based on the row data """
-        conn = self.connect_to_db()
-        if not conn:
-            return None
-        try:
-            cur = conn.cursor()
-            sql = f"""
-            SELECT id FROM {self.table_name} 
-            WHERE test_name = %s AND result_value = %s AND unit = %s AND test_date = %s
-            LIMIT 1;
-            """
-            cur.execute(sql, (test_name, result_value, unit, test_date))
-            result = cur.fetchone()
-            return result[0] if result else None
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
-            return None
-        finally:
-            conn.close()
-        
     def update(self, result_id, test_name, result_value, unit, result_date):
         """ Update data in the results table """
-        conn = self.connect_to_db()
-        if not conn:
-            return
-        try:
-            cur = conn.cursor()
-            sql = f"""
-            UPDATE {self.table_name}
-            SET test_name = %s, result_value = %s, unit = %s, test_date = %s
-            WHERE id = %s;
-            """
-            cur.execute(sql, (test_name, result_value, unit, result_date, result_id))
-            conn.commit()
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
-        finally:
-            conn.close()
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "update_result", (test_name, result_value, unit, result_date, result_id))
+
+    def select_page(self, after_id, limit):
+        """ Select next page of results (ordered by ID), starting after given ID """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "select_page", (after_id, limit))
+            return cur.fetchall()
+
+    def select_by_ids(self, result_ids):
+        """ Select rows with given IDs (used to fetch only the rows that changed) """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "select_by_ids", (list(result_ids),))
+            return cur.fetchall()
+
+    def results_filter(self, test_name=None, date_from=None, date_to=None, unit=None, value_min=None, value_max=None, after=None,
+                       test_names=None):
+        """ Build WHERE clause and its parameters for optional filters (see FILTERS in storage.py)
+            and keyset position after (test_date, id) """
+        conditions, params = [], []
+        if test_name:
+            conditions.append("test_name = %s")
+            params.append(test_name)
+        if test_names is not None and len(test_names) == 1:
+            conditions.append("test_name = %s") # Keeps (test_name, test_date, id) index order for pages
+            params.append(test_names[0])
+        elif test_names is not None:
+            conditions.append("test_name = ANY(%s)")
+            params.append(test_names)
+        if unit:
+            conditions.append("unit = %s")
+            params.append(unit)
+        if date_from:
+            conditions.append("test_date >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("test_date <= %s")
+            params.append(date_to)
+        if value_min is not None:
+            conditions.append("result_value >= %s")
+            params.append(value_min)
+        if value_max is not None:
+            conditions.append("result_value <= %s")
+            params.append(value_max)
+        if after is not None:
+            conditions.append("(test_date, id) > (%s, %s)") # Row comparison - a range scan of (test_date, id) indexes
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def results_source(self, canonical=False):
+        """ Table with stored values or view with values converted to canonical units """
+        return self.canonical_view if canonical else self.table_name
+
+    def iter_results(self, test_name=None, date_from=None, date_to=None, itersize=10000, canonical=False):
+        """ Stream (id, test_name, result_value, unit, test_date) rows through a server-side cursor,
+            fetching itersize rows per round trip - memory use does not depend on the table size """
+        where, params = self.results_filter(test_name, date_from, date_to)
+        with self.cursor(name="results_stream") as cur:
+            cur.itersize = itersize
+            cur.execute(f"SELECT id, test_name, result_value, unit, test_date FROM {self.results_source(canonical)} {where} ORDER BY id;", params)
+            for row in cur:
+                yield row
+
+    def select_results(self, filters=None, after=None, limit=500, canonical=False):
+        """ Select next page of filtered results ordered by (test_date, id) - served by (test_date, id)
+            or (test_name, test_date, id) index (migration 6), however deep the page is """
+        source = self.results_source(canonical)
+        test_names = (filters or {}).get("test_names")
+        with self.cursor() as cur:
+            if test_names and len(test_names) > 1 and not filters.get("test_name") and merge_test_pages(test_names, *self.count_tests(cur, test_names)):
+                # Page of every (rare) test is read in index order and the pages are merged - their rows are never sorted
+                parts, params = [], []
+                for test_name in test_names:
+                    where, name_params = self.results_filter(after=after, **dict(filters, test_names=None, test_name=test_name))
+                    parts.append(f"(SELECT id, test_name, result_value, unit, test_date FROM {source} {where} ORDER BY test_date, id LIMIT %s)")
+                    params += name_params + [limit]
+                sql = " UNION ALL ".join(parts)
+            else:
+                where, params = self.results_filter(after=after, **(filters or {}))
+                sql = f"SELECT id, test_name, result_value, unit, test_date FROM {source} {where}"
+            cur.execute(f"{sql} ORDER BY test_date, id LIMIT %s;", params + [limit])
+            return cur.fetchall()
+
+    def count_tests(self, cur, test_names):
+        """ Number of results of test_names and of all tests: (matching, total) """
+        cur.execute("""
+            SELECT COALESCE(SUM(result_count) FILTER (WHERE test_name = ANY(%s)), 0)::bigint, COALESCE(SUM(result_count), 0)::bigint
+            FROM results_schema.test_statistics;
+            """, (test_names,))
+        return cur.fetchone()
+
+    def count_results(self, filters=None, canonical=False):
+        """ Number of filtered results - read from test_statistics when only test names are filtered,
+            counted with an index scan otherwise """
+        filters = {key: value for key, value in (filters or {}).items() if value is not None and value != ""}
+        where, params = self.results_filter(**filters)
+        with self.cursor() as cur:
+            if set(filters) <= {"test_name", "test_names"}:
+                cur.execute(f"SELECT COALESCE(SUM(result_count), 0)::bigint FROM results_schema.test_statistics {where};", params)
+            else:
+                cur.execute(f"SELECT COUNT(*) FROM {self.results_source(canonical)} {where};", params)
+            return cur.fetchone()[0]
+
+    def copy_results_out(self, file, filters=None, canonical=False):
+        """ Write filtered results ordered by (test_date, id) as CSV (with header) to file using COPY TO STDOUT """
+        where, params = self.results_filter(**(filters or {}))
+        with self.cursor() as cur:
+            query = cur.mogrify(f"SELECT id, test_name, result_value, unit, test_date FROM {self.results_source(canonical)} {where} ORDER BY test_date, id", params)
+            cur.copy_expert(f"COPY ({query.decode()}) TO STDOUT WITH (FORMAT csv, HEADER);", file)
 
-    def select_all(self):
-        """ Select all results table content """
-        conn = self.connect_to_db()
-        if not conn:
-            return
-        try:
-            cur = conn.cursor()
-            sql = f"SELECT test_name, result_value, unit, test_date FROM {self.table_name} ORDER BY id;"
-            cur.execute(sql)
-            results = cur.fetchall()
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
-        finally:
-            conn.close()
-        return results
-    
     def select_chosen_all(self, test_name):
         """ Select all avaiable data for one specified test_name of results table """
-        conn = self.connect_to_db()
-        if not conn:
-            return
-        try:
-            cur = conn.cursor()
-            sql = f"SELECT result_value, unit, test_date FROM {self.table_name} WHERE test_name = %s ORDER BY test_date"
-            cur.execute(sql, (test_name,))
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "select_chosen_all", (test_name,))
+            return cur.fetchall()
+
+    def select_statistics(self, test_name):
+        """ Select summary of one test: (count, sum, sum of squares, min, max, first date, last date, data version) or None """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "select_statistics", (test_name,))
+            return cur.fetchone()
+
+    def select_test_history(self, test_name):
+        """ Select all results of one test together with its summary (in one transaction) """
+        with self.cursor() as cur:
+            self.execute_prepared(cur, "select_chosen_all", (test_name,))
             results = cur.fetchall()
-        except Exception as e:
-            QMessageBox.critical(None, "Error", str(e))
-        finally:
-            conn.close()
-        return results
-    
+            self.execute_prepared(cur, "select_statistics", (test_name,))
+            statistics = cur.fetchone()
+        return results, statistics
+
+    def select_many(self, test_names, date_from=None, date_to=None, canonical=False):
+        """ Select histories of several tests in one query: rows (test_name, result_value, unit, test_date)
+            ordered by test and date, plus {test_name: data_version} """
+        where, params = self.results_filter(date_from=date_from, date_to=date_to)
+        where = f"{where} AND test_name = ANY(%s)" if where else "WHERE test_name = ANY(%s)"
+        with self.cursor() as cur:
+            sql = f"SELECT test_name, result_value, unit, test_date FROM {self.results_source(canonical)} {where} ORDER BY test_name, test_date;"
+            cur.execute(sql, params + [list(test_names)])
+            results = cur.fetchall()
+            cur.execute("SELECT test_name, data_version FROM results_schema.test_statistics WHERE test_name = ANY(%s);", (list(test_names),))
+            versions = dict(cur.fetchall())
+        return results, versions
+
+    def select_data_versions(self):
+        """ Data version of every test with results: {test_name: data_version} """
+        with self.cursor() as cur:
+            cur.execute("SELECT test_name, data_version FROM results_schema.test_statistics;")
+            return dict(cur.fetchall())
+
+    def store_unit_conversions(self, conversions):
+        """ Replace stored unit conversions of the given tests (read by canonical_results view) """
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM results_schema.unit_conversions WHERE test_name = ANY(%s);", (list(conversions),))
+            execute_values(
+                cur, "INSERT INTO results_schema.unit_conversions (test_name, unit, canonical_unit, factor) VALUES %s",
+                conversion_rows(conversions))
+
+    def select_latest_units(self, test_names):
+        """ Unit of the most recent result of each test: {test_name: unit} (tests without results are left out) """
+        with self.cursor() as cur:
+            sql = f"""
+            SELECT DISTINCT ON (test_name) test_name, unit FROM {self.table_name}
+            WHERE test_name = ANY(%s) ORDER BY test_name, test_date DESC, id DESC;
+            """
+            cur.execute(sql, (list(test_names),))
+            return dict(cur.fetchall())
+
+    def select_out_of_range(self, bounds, after=None, limit=1000):
+        """ Next page of results outside their reference range - bounds are joined as arrays,
+            each bound is looked up through the (test_name, unit, result_value) index """
+        columns = list(zip(*bounds)) or [[]] * 6
+        keyset = "AND (r.test_date, r.id) > (%s, %s)" if after is not None else ""
+        with self.cursor() as cur:
+            sql = f"""
+            SELECT r.id, r.test_name, r.result_value, r.unit, r.test_date
+            FROM unnest(%s::text[], %s::text[], %s::float8[], %s::float8[], %s::date[], %s::date[])
+                AS b(test_name, unit, low, high, date_from, date_to)
+            JOIN {self.table_name} AS r ON r.test_name = b.test_name AND r.unit = b.unit
+            WHERE (r.result_value < b.low OR r.result_value > b.high) {keyset}
+              AND (b.date_from IS NULL OR r.test_date >= b.date_from) AND (b.date_to IS NULL OR r.test_date < b.date_to)
+            GROUP BY r.id ORDER BY r.test_date, r.id LIMIT %s;
+            """
+            cur.execute(sql, [list(column) for column in columns] + list(after or []) + [limit])
+            return cur.fetchall()
+
+    def select_result_days(self, year, month):
+        """ Count results per day of one month in a single aggregate query: {day of month: number of results} """
+        first_day = datetime.date(year, month, 1)
+        next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+        with self.cursor() as cur:
+            sql = f"""
+            SELECT EXTRACT(DAY FROM test_date)::int, COUNT(*) FROM {self.table_name}
+            WHERE test_date >= %s AND test_date < %s GROUP BY 1;
+            """
+            cur.execute(sql, (first_day, next_month))
+            return dict(cur.fetchall())
+
     def select_chosen_column(self, column_name):
-        """ Select only values from specified column of results table """
-        conn = self.connect_to_db()
-        if not conn:
-            return
-        try:
-            cur = conn.cursor()
+        """ Select only values from specified column of results table (only known columns, see checked_column) """
+        column_name = checked_column(column_name)
+        with self.cursor() as cur:
             cur.execute(f"SELECT {column_name} FROM {self.table_name}")
             results = sorted(set([res[0] for res in cur]))
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
-        finally:
-            conn.close()
-        return results
\ No newline at end of file
+        return results
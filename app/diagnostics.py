@@ -0,0 +1,98 @@
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QCheckBox, QPushButton, QLabel, QTableWidget, QTableWidgetItem, QHeaderView,
+    QFileDialog, QMessageBox)
+from PyQt6.QtCore import (Qt, QTimer)
+from PyQt6.QtGui import QFont
+from metrics import metrics
+
+class DiagnosticsDialog(QDialog):
+    """ Hidden dialog (Ctrl+Shift+D) showing recorded metrics: calls of storage methods split into phases (waiting for
+        a worker thread, connecting, executing, fetching, waiting for the GUI thread) and main UI handlers.
+        Recording can be switched on here or started with --metrics, recorded data can be exported as JSON or Prometheus text """
+    HEADERS = ["Kind", "Name", "Phase", "Calls", "Errors", "Rows", "Total ms", "Mean ms", "p95 ms", "Max ms"]
+
+    def __init__(self, parent=None):
+        """ Initialize DiagnosticsDialog instance """
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics")
+        self.setStyleSheet("background-color: #dcdadb; color: black;")
+        layout = QVBoxLayout()
+
+        controls = QHBoxLayout()
+        self.record_input = QCheckBox("Record")
+        self.record_input.setChecked(metrics.enabled)
+        self.record_input.toggled.connect(metrics.enable)
+        controls.addWidget(self.record_input)
+        self.summary_label = QLabel()
+        controls.addWidget(self.summary_label, 1)
+        for text, slot in (("Reset", self.reset), ("Export JSON", self.export_json), ("Export Prometheus", self.export_prometheus)):
+            button = QPushButton(text)
+            button.clicked.connect(slot)
+            controls.addWidget(button)
+        layout.addLayout(controls)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setFont(QFont("Roboto Regular", 10))
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+        self.resize(900, 500)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        self.timer.setInterval(1000) # Refreshed only while the dialog is visible
+
+    def showEvent(self, event):
+        """ Start refreshing when shown """
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start()
+
+    def hideEvent(self, event):
+        """ Stop refreshing when hidden """
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def refresh(self):
+        """ Show current snapshot of recorded series (largest total time first) """
+        snapshot = metrics.snapshot()
+        self.record_input.setChecked(metrics.enabled)
+        self.summary_label.setText(f"{len(snapshot)} series, {sum(entry['count'] for entry in snapshot):,} calls"
+                                   if snapshot else "Nothing recorded yet" if metrics.enabled else "Recording is off")
+        self.table.setRowCount(len(snapshot))
+        for row, entry in enumerate(snapshot):
+            cells = [entry["kind"], entry["name"], entry["phase"], f"{entry['count']:,}", f"{entry['errors']:,}",
+                     f"{entry['rows']:,}", f"{entry['total_ms']:.1f}", f"{entry['mean_ms']:.2f}", f"{entry['p95_ms']:g}",
+                     f"{entry['max_ms']:.2f}"]
+            for column, text in enumerate(cells):
+                item = QTableWidgetItem(text)
+                if column >= 3:
+                    item.setTextAlignment(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+                self.table.setItem(row, column, item)
+
+    def reset(self):
+        """ Forget recorded series """
+        metrics.reset()
+        self.refresh()
+
+    def export_json(self):
+        """ Save recorded series as JSON """
+        self.export("metrics.json", "JSON Files (*.json)", prometheus=False)
+
+    def export_prometheus(self):
+        """ Save recorded series in Prometheus text exposition format """
+        self.export("metrics.prom", "Prometheus Text (*.prom *.txt)", prometheus=True)
+
+    def export(self, default_name, file_filter, prometheus):
+        """ Ask for file name and write recorded series into it """
+        path, _ = QFileDialog.getSaveFileName(self, "Export Metrics", default_name, file_filter)
+        if not path:
+            return
+        try:
+            metrics.write(path, prometheus)
+        except OSError as e:
+            QMessageBox.critical(self, "Export Failed", f"Could not save metrics: {e}")
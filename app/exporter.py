@@ -0,0 +1,107 @@
+import os
+import sys
+import json
+import argparse
+import datetime
+from storage import (open_storage, FILTERS)
+
+COLUMNS = ("id", "test_name", "result_value", "unit", "test_date")
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet", ".arrow": "arrow", ".feather": "arrow"}
+
+def detect_format(path):
+    """ Guess file format from its extension """
+    file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Unknown file format of {path} (use one of: {', '.join(sorted(set(FORMATS.values())))})")
+    return file_format
+
+def export_csv(db, path, filters, canonical, itersize):
+    """ CSV is produced by the database server itself (COPY TO STDOUT, keyset pages on SQLite) """
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        db.copy_results_out(file, filters, canonical)
+
+def export_jsonl(db, path, filters, canonical, itersize):
+    """ One JSON object per line """
+    with open(path, "w", encoding="utf-8") as file:
+        for row in db.iter_pages(filters, itersize, canonical):
+            record = dict(zip(COLUMNS, row))
+            record["test_date"] = record["test_date"].isoformat()
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def arrow_chunks(db, filters, canonical, itersize):
+    """ Yield pyarrow tables of at most itersize rows """
+    import pyarrow as pa # Optional dependency, needed only for columnar formats
+    schema = pa.schema([
+        ("id", pa.int64()), ("test_name", pa.string()), ("result_value", pa.float64()),
+        ("unit", pa.string()), ("test_date", pa.date32())])
+    columns = [[] for _ in COLUMNS]
+    for row in db.iter_pages(filters, itersize, canonical):
+        for column, value in zip(columns, row):
+            column.append(value)
+        if len(columns[0]) == itersize:
+            yield pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+            columns = [[] for _ in COLUMNS]
+    # Always yield the last (possibly empty) chunk, so writers know the schema even for empty exports
+    yield pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+
+def export_parquet(db, path, filters, canonical, itersize):
+    """ Parquet file written one row group per chunk """
+    import pyarrow.parquet as pq
+    writer = None
+    try:
+        for table in arrow_chunks(db, filters, canonical, itersize):
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+def export_arrow(db, path, filters, canonical, itersize):
+    """ Arrow IPC (Feather v2) file written one record batch per chunk """
+    import pyarrow as pa
+    writer = None
+    try:
+        for table in arrow_chunks(db, filters, canonical, itersize):
+            if writer is None:
+                writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+EXPORTERS = {"csv": export_csv, "jsonl": export_jsonl, "parquet": export_parquet, "arrow": export_arrow}
+
+def export_results(path, db=None, file_format=None, filters=None, itersize=10000, canonical=False):
+    """ Stream results (optionally filtered, see FILTERS in storage.py) ordered by date into CSV, JSON Lines, Parquet
+        or Arrow file. Rows are fetched in keyset pages of itersize rows, so memory use and the latency of every round trip
+        stay constant regardless of the table size. With canonical=True values are converted to each test's canonical unit
+        by the database """
+    db = db or open_storage()
+    file_format = file_format or detect_format(path)
+    EXPORTERS[file_format](db, path, filters, canonical, itersize)
+
+def main():
+    """ Command line entry point: python3 app/exporter.py results.parquet --test "Ferritin" --from 2020-01-01 """
+    parser = argparse.ArgumentParser(description="Export blood test results")
+    parser.add_argument("path", help="output file (.csv, .jsonl, .parquet, .arrow)")
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="file format (guessed from extension by default)")
+    parser.add_argument("--test", dest="test_name", help="export only results of this test")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, help="first test date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, help="last test date (YYYY-MM-DD)")
+    parser.add_argument("--unit", help="export only results entered in this unit")
+    parser.add_argument("--min", dest="value_min", type=float, help="lowest result value")
+    parser.add_argument("--max", dest="value_max", type=float, help="highest result value")
+    parser.add_argument("--itersize", type=int, default=10000, help="rows fetched per round trip (keyset page size)")
+    parser.add_argument("--canonical", action="store_true", help="convert values to each test's canonical unit (see unit_conversions.txt)")
+    args = parser.parse_args()
+    try:
+        filters = {key: getattr(args, key, None) for key in FILTERS}
+        export_results(args.path, file_format=args.format, filters=filters, itersize=args.itersize, canonical=args.canonical)
+    except Exception as e:
+        print(f"Export failed: {e}")
+        sys.exit(1)
+    print(f"Results exported to {args.path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import os
+import sys
+import csv
+import json
+import math
+import time
+import argparse
+import datetime
+from catalog import (load_test_names, load_unit_names)
+from storage import open_storage
+
+FIELDS = ("test_name", "result_value", "unit", "test_date")
+FORMATS = {".csv": "csv", ".tsv": "tsv", ".txt": "tsv", ".jsonl": "jsonl", ".ndjson": "jsonl", ".json": "json"}
+
+class ImportProgress():
+    """ Counts loaded rows and reports progress (by default on stderr) every report_every rows """
+    def __init__(self, report_every=10000, callback=None):
+        """ Initialize ImportProgress instance """
+        self.report_every = report_every
+        self.callback = callback or self.print_progress
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def advance(self):
+        """ Count one more row """
+        self.rows += 1
+        if self.rows % self.report_every == 0:
+            self.callback(self.rows, self.rows_per_second())
+
+    def elapsed(self):
+        """ Seconds since the import started """
+        return time.perf_counter() - self.started
+
+    def rows_per_second(self):
+        """ Current throughput """
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def print_progress(self, rows, rows_per_second):
+        """ Default progress report """
+        print(f"{rows} rows loaded ({rows_per_second:.0f} rows/s)", file=sys.stderr)
+
+def detect_format(path):
+    """ Guess file format from its extension """
+    file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+    if file_format is None:
+        raise ValueError(f"Unknown file format of {path} (use one of: {', '.join(sorted(set(FORMATS.values())))})")
+    return file_format
+
+def read_records(file, file_format):
+    """ Stream (line number, record dict) pairs from opened file """
+    if file_format in ("csv", "tsv"):
+        reader = csv.DictReader(file, delimiter="\t" if file_format == "tsv" else ",")
+        missing = set(FIELDS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+        for record in reader:
+            yield reader.line_num, record
+    elif file_format == "jsonl":
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                yield line_number, json.loads(line)
+    else:
+        # Plain JSON array has to be parsed at once - use JSON Lines for very large exports
+        for position, record in enumerate(json.load(file), start=1):
+            yield position, record
+
+def validate_record(record, test_names, unit_names):
+    """ Return (test_name, result_value, unit, test_date) row or raise ValueError describing the problem """
+    test_name = str(record.get("test_name") or "").strip()
+    if test_name not in test_names:
+        raise ValueError(f"unknown test name '{test_name}'")
+    unit = str(record.get("unit") or "").strip()
+    if unit not in unit_names:
+        raise ValueError(f"unknown unit '{unit}'")
+    try:
+        result_value = float(str(record.get("result_value")).strip())
+    except ValueError:
+        raise ValueError(f"result value '{record.get('result_value')}' is not a number")
+    if not math.isfinite(result_value):
+        raise ValueError(f"result value '{record.get('result_value')}' is not a finite number") # float() accepts nan and inf
+    try:
+        test_date = datetime.date.fromisoformat(str(record.get("test_date")).strip()[:10])
+    except ValueError:
+        raise ValueError(f"test date '{record.get('test_date')}' is not in YYYY-MM-DD format")
+    return test_name, result_value, unit, test_date
+
+def validated_rows(records, rejected, progress, strict=False):
+    """ Yield valid rows, collecting (line number, reason) of invalid ones in rejected """
+    test_names = set(load_test_names())
+    unit_names = set(load_unit_names())
+    for line_number, record in records:
+        try:
+            row = validate_record(record, test_names, unit_names)
+        except ValueError as e:
+            if strict:
+                raise ValueError(f"Line {line_number}: {e}")
+            rejected.append((line_number, str(e)))
+            continue
+        progress.advance()
+        yield row
+
+def import_results(path, db=None, file_format=None, method="copy", strict=False, progress=None):
+    """ Stream results from CSV/TSV/JSON Lines/JSON file into the database in a single transaction.
+        Invalid rows are skipped and reported (strict mode aborts the whole import instead).
+        Return summary dict: rows, rejected, seconds, rows_per_second """
+    db = db or open_storage()
+    file_format = file_format or detect_format(path)
+    progress = progress or ImportProgress()
+    rejected = []
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        rows = validated_rows(read_records(file, file_format), rejected, progress, strict)
+        if method == "copy":
+            db.copy_results(rows)
+        else:
+            db.insert_many(rows, page_size=5000, bulk=True)
+    seconds = progress.elapsed()
+    return {
+        "rows": progress.rows,
+        "rejected": rejected,
+        "seconds": seconds,
+        "rows_per_second": progress.rows / seconds if seconds > 0 else 0.0}
+
+def main():
+    """ Command line entry point: python3 app/importer.py results.csv """
+    parser = argparse.ArgumentParser(description="Import historical blood test results")
+    parser.add_argument("path", help="CSV, TSV, JSON Lines or JSON file with columns: " + ", ".join(FIELDS))
+    parser.add_argument("--format", choices=sorted(set(FORMATS.values())), help="file format (guessed from extension by default)")
+    parser.add_argument("--method", choices=["copy", "values"], default="copy", help="COPY FROM STDIN or batched multi-row INSERTs")
+    parser.add_argument("--strict", action="store_true", help="abort the whole import on first invalid row")
+    args = parser.parse_args()
+    try:
+        summary = import_results(args.path, file_format=args.format, method=args.method, strict=args.strict)
+    except Exception as e:
+        print(f"Import failed, nothing was loaded: {e}")
+        sys.exit(1)
+    for line_number, reason in summary["rejected"]:
+        print(f"Skipped line {line_number}: {reason}")
+    print(f"Imported {summary['rows']} rows in {summary['seconds']:.2f} s ({summary['rows_per_second']:.0f} rows/s), "
+          f"skipped {len(summary['rejected'])} invalid rows.")
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,91 @@
 import os
-from database import DatabaseManager 
-from custom import CustomCalendarWidget
+import math
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from storage import get_database_manager
+import assets
+from catalog import (load_test_names, load_unit_names)
+from custom import (CustomCalendarWidget, ScaledImageLabel, FlagDelegate)
+from models import ResultsTableModel
+from search import (NameIndex, PERIODS, parse_number)
+from workers import DatabaseWorker
+from exporter import export_results
+from migrations import pending_migrations
+from analysis import (describe, summarize)
+from startup import (profiler, FirstPaintWatcher)
+from metrics import timed
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton, QMessageBox, 
-    QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView, QMenu, QComboBox)
-from PyQt6.QtCore import (QDate, Qt, QTimer)
-from PyQt6.QtGui import (QPalette, QFont, QPixmap, QBrush, QImage)
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib import (pyplot as plt, font_manager)
-import pandas as pd
-import numpy as np
+    QTableWidget, QTableWidgetItem, QTableView, QHeaderView, QAbstractItemView, QMenu, QComboBox, QFileDialog, QStackedWidget)
+from PyQt6.QtCore import (QDate, Qt, QTimer, QSocketNotifier, pyqtSignal)
+from PyQt6.QtGui import (QPalette, QFont, QBrush, QKeySequence, QShortcut)
+# matplotlib and NumPy (plotting, dashboard) are imported on first analysis action - they are the slowest part of startup
+
+def load_reference_ranges():
+    """ Resolve reference ranges for the patient from .env (runs on worker thread - imports NumPy) """
+    from reference import ReferenceRanges
+    return ReferenceRanges()
+
+def fetch_all_pages(db, filters):
+    """ All rows passing filters ordered by (test_date, id), read in keyset pages (runs on worker thread) """
+    return list(db.iter_pages(filters))
 
 class LabResultsApp(QWidget): 
     """ GUI application class enables: viewing, managing, and analyzing laboratory results.
         It is built on top of PyQt's QWidget and serves as the main interface for the application """
+    first_painted = pyqtSignal() # Window was painted for the first time
 
     def __init__(self):
         """ Initialize the LabResultsApp instance """
         super().__init__() # Inheriting from QWidget
         self.current_dir = os.path.dirname(os.path.abspath(__file__)) # Store current directory path
+        self.db = get_database_manager() # One storage backend (selected in .env) for the whole session
+        self.render_executor = None # Process pool rendering dashboard charts, started on first use
+        self.dashboard_images = {} # Rendered dashboard charts kept between openings
+        self.unit_converter = None # Loaded on first analysis of a test entered in more than one unit
+        self.reference_ranges = None # Resolved on worker thread after startup, results are flagged once it is ready
+        self.worker = DatabaseWorker(self.db.pool_max, on_error=self.show_database_error, parent=self) # Keeps database calls off the GUI thread
+        self.trend_plot = None # Plotting area is created on first analysis action
+        self.diagnostics = None # Hidden diagnostics dialog, created when first opened (Ctrl+Shift+D)
+        self.listener = None
+        self.timer = None
+        self.data_versions = None # {test_name: data_version} seen by the last check (polling without change notifications)
+        self.pending_changes = {} # Notified changes waiting to be fetched ({id: operation})
+        self.changes_in_flight = False
         self.set_insert_mode()
         self.load_data()  
+        self.name_index = NameIndex(self.test_names_list) # Test names searched in "Entries History", extended by names found in database
         self.init_ui()
         self.set_default_image()
-        self.show_instruction()
-        self.set_autorefresh()
+        profiler.mark("window built")
+        # Database, instruction and everything else waits until the window is on screen
+        self.first_paint_watcher = FirstPaintWatcher(self, self.on_first_paint)
+
+    def on_first_paint(self):
+        """ Start deferred startup work once the window was painted """
+        profiler.mark("first paint")
+        QTimer.singleShot(0, self.start_database)
+        QTimer.singleShot(0, self.show_instruction)
+        QTimer.singleShot(0, self.first_painted.emit)
+
+    def start_database(self):
+        """ Connect change listener on worker thread, then fetch the first data """
+        self.worker.submit(self.db.listen_changes, on_result=self.set_change_listener, on_error=self.on_listener_failed)
+
+    def load_first_data(self):
+        """ Fetch the first page of "Entries History", tests to analyze and check database schema version """
+        self.refresh_results_table()
+        self.refresh_analysis_options()
+        self.worker.submit(pending_migrations, self.db, on_result=self.warn_pending_migrations)
+        self.worker.submit(load_reference_ranges, on_result=self.set_reference_ranges)
+
+    def set_reference_ranges(self, reference_ranges):
+        """ Flag loaded results (in one pass) and those fetched later, mark the shown test again """
+        self.reference_ranges = reference_ranges
+        self.results_model.set_flag_rows(reference_ranges.flags)
+        if self.chosen_table.rowCount():
+            self.refresh_chosen_table()
 
     def set_insert_mode(self):
         """ Control insert vs update modes """
@@ -33,82 +93,236 @@ class LabResultsApp(QWidget):
 
     def load_data(self):
         """ Load options to choose from, while inserting/updating results """
-        test_names_file = os.path.join(self.current_dir, f"resources/textfiles/tests_names.txt")
-        units_names_file = os.path.join(self.current_dir, f"resources/textfiles/units_names.txt")
-        
         # Import blood test options
         try:
-            with open(test_names_file, "r") as file:
-                self.test_names_list = sorted([line.strip() for line in file.readlines()])
+            self.test_names_list = load_test_names()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load test names: {str(e)}")
         
         # Import units options
         try:
-            with open(units_names_file, "r") as file:
-                self.units_names_list = [line.strip() for line in file.readlines()]
+            self.units_names_list = load_unit_names()
         except Exception as e:
             QMessageBox.critical(self, "Error", f"Failed to load units names: {str(e)}")
 
     def set_default_image(self):
-        """ Display the image when app is being launched """
-        image_path = os.path.join(self.current_dir, "images", "axolotl.webp")
-        # Load the image into a QPixmap
-        pixmap = QPixmap(image_path)
-        if pixmap.isNull():
-            print("Error: Unable to load the image")
-            return
-        
-        # Convert QPixmap to QImage, then to NumPy array 
-        image = pixmap.toImage().convertToFormat(QImage.Format.Format_RGB888)
-        width, height = image.width(), image.height()
-        ptr = image.bits()
-        ptr.setsize(width * height * 3)
-        img_data = np.array(ptr).reshape((height, width, 3))  # 3 values (R,G,B) per one pixel
-        
-        # Set up the plot
-        self.figure.set_facecolor("#dcdadb")
-        self.figure.tight_layout()  
-        font = self.set_plot_font()  
-        ax = self.figure.add_subplot(111)
-
-        # Display the image in the plot
-        ax.imshow(img_data)  
-        ax.axis("off")  
-        ax.set_title("Your blood test history will be plotted here - pick one above to analyze", font=font, fontsize=14)
-
-        # Draw the canvas
-        self.canvas.draw()
+        """ Display the image when app is being launched (plain Qt pixmap, no plotting needed) """
+        self.plot_stack.setCurrentIndex(0)
 
     def set_plot_font(self):
-        """ Upload font from files """
-        font_path = os.path.join(self.current_dir, "fonts/Roboto/Roboto-Regular.ttf")
-        font = font_manager.FontProperties(fname=font_path)
-        return font
+        """ Font for plots (registered with matplotlib only once per session) """
+        return assets.matplotlib_font()
 
     def show_instruction(self):
-        """ Display instruction box """
-        instruction_file = os.path.join(self.current_dir, f"resources/textfiles/instruction.txt")
-        with open(instruction_file, "r") as file:
-            text = file.read()
-        QMessageBox.information(self, "Instruction", str(text))
+        """ Display instruction box (non-modal - the app can be used while it is open) """
+        text = assets.read_text("resources/textfiles/instruction.txt")
+        self.instruction_box = QMessageBox(QMessageBox.Icon.Information, "Instruction", str(text), QMessageBox.StandardButton.Ok, self)
+        self.instruction_box.setWindowModality(Qt.WindowModality.NonModal)
+        self.instruction_box.show()
           
-    def set_autorefresh(self):
-        """ Execute refresh_results_table() each 5 seconds """
+    def warn_pending_migrations(self, pending):
+        """ Ask user to upgrade database schema if it is older than the app expects """
+        if pending:
+            QMessageBox.warning(self, "Database Upgrade Needed",
+                "Your database needs to be upgraded (" + ", ".join(pending) + ").\n\n"
+                "Close the app and run: python3 app/migrations.py")
+
+    def set_change_listener(self, listener):
+        """ Apply database changes as soon as they are notified (LISTEN/NOTIFY) """
+        if listener is None:
+            if self.db.shared:
+                self.set_autorefresh(self.load_first_data) # No notifying trigger yet - other clients' changes are polled
+            else:
+                self.load_first_data() # Embedded database has no other clients - own changes are applied right after they are made
+            return
+        self.listener = listener
+        # Wake up only when the listening socket has data - idle app does not query database at all
+        self.notifier = QSocketNotifier(self.listener.fileno(), QSocketNotifier.Type.Read, self)
+        self.notifier.activated.connect(self.apply_database_changes)
+        self.load_first_data() # Subscribed before the first fetch, so no change is missed in between
+
+    def on_listener_failed(self, message):
+        """ Change notifications are unavailable - fall back to polling """
+        self.set_autorefresh(self.load_first_data)
+        self.show_database_error(f"Change notifications are unavailable: {message}\n\n"
+                                 "Changes made by other clients will be checked for every 5 seconds instead.")
+
+    def set_autorefresh(self, on_ready):
+        """ Check data versions of tests each 5 seconds (used only when change notifications are unavailable) - only rows
+            of tests written since the previous check are fetched again. on_ready runs once the first versions are known """
+        def on_versions_failed(message):
+            # Without data versions the table is reloaded as a whole - the database is older than migration 3,
+            # which the pending migrations warning already asks to apply
+            self.start_autorefresh(self.refresh_results_table, on_ready)
+        def on_versions(versions):
+            self.data_versions = versions
+            self.start_autorefresh(self.check_data_versions, on_ready)
+        self.worker.submit(self.db.select_data_versions, on_result=on_versions, on_error=on_versions_failed)
+
+    def start_autorefresh(self, check, on_ready):
+        """ Run check each 5 seconds, then the deferred work """
         self.timer = QTimer(self)
-        self.timer.timeout.connect(self.refresh_results_table)
+        self.timer.timeout.connect(check)
         self.timer.start(5000)  # 5000 milliseconds = 5 seconds
-
+        on_ready()
+
+    def check_data_versions(self):
+        """ Fetch data versions of all tests (one row per test) to find out what changed since the last check """
+        self.worker.submit(self.db.select_data_versions, on_result=self.apply_data_versions, key="data_versions")
+
+    def apply_data_versions(self, versions):
+        """ Update "Entries History" in place for tests whose data version changed - nothing is touched when none did """
+        changed = {test_name for test_name in set(versions) | set(self.data_versions)
+                   if versions.get(test_name) != self.data_versions.get(test_name)}
+        if set(versions) != set(self.data_versions):
+            self.refresh_analysis_options() # A test appeared or disappeared
+        self.data_versions = versions
+        if not changed:
+            return
+        self.refresh_results_count()
+        self.result_date_input.invalidate_result_days()
+        model = self.results_model
+        if model.filters.get("test_names") is not None:
+            changed &= set(model.filters["test_names"])
+        if model.filters.get("test_name"):
+            changed &= {model.filters["test_name"]}
+        if not changed or not model.rowCount():
+            return # Nothing shown can be affected (rows past the loaded ones are fetched while scrolling)
+        filters = dict(model.filters, test_name=None, test_names=sorted(changed))
+        if not model.exhausted:
+            last_date = datetime.date.fromordinal(model.dates[-1])
+            filters["date_to"] = min(filters.get("date_to") or last_date, last_date)
+        shown_filters = dict(model.filters)
+        self.worker.submit(
+            fetch_all_pages, self.db, filters,
+            on_result=lambda rows: self.apply_changed_tests(shown_filters, changed, rows), key="changed_tests")
+
+    @timed("ui", rows=lambda args, result: len(args[3]))
+    def apply_changed_tests(self, filters, test_names, rows):
+        """ Apply current rows of changed tests to "Entries History" table (unless it was filtered differently meanwhile) """
+        if self.results_model.filters == filters:
+            self.results_model.sync_tests(test_names, rows)
+
+    def apply_database_changes(self):
+        """ Fetch only inserted/updated rows and drop deleted ones from "Entries History" section's table """
+        try:
+            changes = self.listener.poll()
+        except Exception as e:
+            # Listening connection was lost - switch to polling
+            self.notifier.setEnabled(False)
+            self.listener.close()
+            self.listener = None
+            self.set_autorefresh(self.refresh_results_table) # Changes notified meanwhile were lost - reloaded once
+            self.show_database_error(f"Change notifications stopped: {e}\n\n"
+                                     "Changes made by other clients will be checked for every 5 seconds instead.")
+            return
+        if changes.pop(0, None) == "RELOAD":
+            # Bulk load finished - reloading is cheaper than fetching every row by ID
+            self.pending_changes.clear()
+            self.refresh_results_table()
+            self.refresh_analysis_options()
+        if not changes:
+            return
+        self.pending_changes.update(changes)
+        if not self.changes_in_flight:
+            self.fetch_pending_changes()
+
+    def fetch_pending_changes(self):
+        """ Fetch rows for all changes collected so far (changes notified meanwhile are fetched in the next round) """
+        changes, self.pending_changes = self.pending_changes, {}
+        changed_ids = [result_id for result_id, operation in changes.items() if operation != "DELETE"]
+        self.changes_in_flight = True
+        self.worker.submit(
+            self.db.select_by_ids, changed_ids,
+            on_result=lambda rows: self.apply_changed_rows(changes, rows),
+            on_error=self.on_changes_failed)
+
+    @timed("ui", rows=lambda args, result: len(args[2]))
+    def apply_changed_rows(self, changes, rows):
+        """ Apply fetched rows to "Entries History" table """
+        fetched_ids = {row[0] for row in rows}
+        # Rows updated and deleted in the meantime are not fetched - treat them as deleted
+        deleted_ids = set(changes) - fetched_ids
+        self.results_model.upsert_rows(rows)
+        self.results_model.remove_ids(deleted_ids)
+        self.refresh_results_count()
+        self.result_date_input.invalidate_result_days()
+        self.changes_in_flight = False
+        if self.pending_changes:
+            self.fetch_pending_changes()
+
+    def on_changes_failed(self, message):
+        """ Fetching changed rows failed - reload the table to get back in sync """
+        self.changes_in_flight = False
+        self.show_database_error(message)
+        self.refresh_results_table()
+
+    @timed("ui")
     def refresh_results_table(self):
-        """ Fetch ALL results from database and display in "Entries History" section's table widget """
-        db = DatabaseManager()
-        results = db.select_all()
-        self.results_table.setRowCount(len(results))
-        for row_id, (test_name, result_value, unit, test_date) in enumerate(results):
-            self.results_table.setItem(row_id, 0, QTableWidgetItem(test_name))
-            self.results_table.setItem(row_id, 1, QTableWidgetItem(str(result_value)))
-            self.results_table.setItem(row_id, 2, QTableWidgetItem(unit))
-            self.results_table.setItem(row_id, 3, QTableWidgetItem(test_date.strftime("%Y-%m-%d")))
+        """ Reload "Entries History" section's table from its first page (further pages are fetched while scrolling) """
+        self.results_model.reload()
+        self.refresh_results_count()
+        self.result_date_input.invalidate_result_days() # Marked days in the calendar may have changed too
+
+    def refresh_results_count(self):
+        """ Show number of results matching "Entries History" filters next to its title (counted on worker thread) """
+        self.worker.submit(self.db.count_results, self.results_model.filters, on_result=self.set_results_count, key="results_count")
+
+    @timed("ui")
+    def apply_search(self):
+        """ Filter "Entries History" by typed test name (matched in memory by NameIndex), period and value range.
+            While all rows of the previous search are loaded, a narrower one (e.g. one more typed letter) is applied in memory """
+        text = self.search_input.text()
+        days = self.period_input.currentData()
+        self.results_model.set_filters({
+            "test_names": self.name_index.match(text) if text.strip() else None,
+            "date_from": datetime.date.today() - datetime.timedelta(days=days) if days else None,
+            "value_min": parse_number(self.value_min_input.text()),
+            "value_max": parse_number(self.value_max_input.text())})
+        if self.results_model.exhausted and not self.results_model.fetching:
+            self.worker.cancel("results_count") # Count of the previous search would overwrite this one
+            self.set_results_count(self.results_model.rowCount())
+        else:
+            self.refresh_results_count()
+
+    def set_results_count(self, count):
+        """ Put number of results into "Entries History" title """
+        self.label_results.setText(f"Entries History ({count:,})")
+
+    def sync_results_table(self):
+        """ Bring "Entries History" up to date after own change (notifications do it when listener is active) """
+        if self.listener is None:
+            self.refresh_results_table()
+
+    def request_results_page(self, filters, after, limit, on_result, on_error):
+        """ Fetch keyset page of "Entries History" rows on worker thread (used by ResultsTableModel) """
+        def on_page(rows):
+            profiler.mark("first results page") # Recorded only once
+            on_result(rows)
+        def on_page_failed(message):
+            on_error(message)
+            self.show_database_error(message)
+        self.worker.submit(self.db.select_results, filters, after, limit, on_result=on_page, on_error=on_page_failed, key="results_page")
+
+    def request_result_days(self, year, month, on_result):
+        """ Fetch {day: number of results} of one month on worker thread (used by the calendar to mark days with results) """
+        self.worker.submit(self.db.select_result_days, year, month, on_result=on_result, key="calendar_days")
+
+    def show_database_error(self, message):
+        """ Report failed database call (called on GUI thread) """
+        QMessageBox.critical(self, "Error", message)
+
+    def closeEvent(self, event):
+        """ Release database connections when the window is closed """
+        if self.timer is not None:
+            self.timer.stop()
+        if self.listener is not None:
+            self.listener.close()
+        self.worker.wait_for_done()
+        if self.render_executor is not None:
+            self.render_executor.shutdown(wait=False, cancel_futures=True)
+        self.db.close()
+        super().closeEvent(event)
 
     def set_font(self):
         """ Set widget's to use particular font as a default """
@@ -118,7 +332,7 @@ class LabResultsApp(QWidget):
     def set_background(self):
         """ Set background image """
         palette = QPalette()
-        pixmap = QPixmap(os.path.join(self.current_dir, "images/background.png"))
+        pixmap = assets.pixmap("images/background.png") # Decoded once, at startup
         brush = QBrush(pixmap)
         palette = self.palette()
         palette.setBrush(QPalette.ColorRole.Window, brush)
@@ -133,56 +347,88 @@ class LabResultsApp(QWidget):
         screen_height = screen_geometry.height()
         self.resize(int(screen_width * 0.8), int(screen_height * 0.8)) # Resize to 80% of user's screen width/height
 
-    def load_stylesheet(self, file_path):
-        """ Load QSS file and return its content """
-        with open(file_path, "r") as file:
-            return file.read()
+    def load_stylesheet(self, file_name):
+        """ Return content of QSS file from resources/styles (read from the asset bundle) """
+        return assets.stylesheet(file_name)
     
     def add_or_update_result(self):
         """ Handler for adding new result or updating existing one in the database """
-        db = DatabaseManager()
         test_name = self.test_name_input.currentText() # Store the currently selected test name 
         unit = self.unit_input.currentText() # Store the currently selected unit name
         try:
             result_value = float(self.result_value_input.text()) # Store the entered value
+            if not math.isfinite(result_value):
+                raise ValueError(self.result_value_input.text()) # float() accepts nan and inf
             result_date = self.result_date_input.selectedDate().toString("yyyy-MM-dd") # Store the selected date
 
-            # Updating mode
-            if self.editing_id is not None: 
-                # Update in database
-                db.update(self.editing_id, test_name, result_value, unit, result_date)
-                QMessageBox.information(self, "Success", "Result updated successfully!")
-                # Change the view to enable next entries
-                self.editing_id = None
-                self.clear_input_fields()
-                self.refresh_results_table()
-            
-            # Adding new data mode
-            else: 
-                # Insert into database
-                db.insert(test_name, result_value, unit, result_date)
-                QMessageBox.information(self, "Success", "Result added successfully!")
-                # Change the view to enable next entries
-                self.clear_input_fields()
-                self.refresh_results_table()
-            
-            # Update list of tests in the right panel that can be analyzed 
-            current_selection = self.test_analysis_input.currentText()
-            self.test_analysis_input.clear()  # Clear the existing list
-            new_test_names = self.get_accessible_values()
-            self.test_analysis_input.addItems(new_test_names)
-            # Keeping test name picked before for analysis shown (not refreshing)
-            if current_selection in new_test_names:
-                self.test_analysis_input.setCurrentText(current_selection)
-
         except ValueError:
             QMessageBox.critical(self, "Input Error", "Please enter a valid number (with decimal point) for result value!")
-   
-    def get_accessible_values(self, column_name="test_name"):
-        """ Fetch all values from chosen column from database table """
-        db = DatabaseManager()
-        results = db.select_chosen_column(column_name)
-        return results
+            return
+
+        # Updating mode
+        if self.editing_id is not None: 
+            # Update in database
+            self.worker.submit(
+                self.db.update, self.editing_id, test_name, result_value, unit, result_date,
+                on_result=lambda _: self.on_result_saved("Result updated successfully!"), on_error=self.on_result_failed)
+        
+        # Adding new data mode
+        else: 
+            # Insert into database
+            self.worker.submit(
+                self.db.insert, test_name, result_value, unit, result_date,
+                on_result=lambda _: self.on_result_saved("Result added successfully!"), on_error=self.on_result_failed)
+
+    def on_result_saved(self, message):
+        """ Refresh views after result was inserted/updated """
+        self.clear_input_fields() # Change the view to enable next entries (only once the result is stored)
+        self.sync_results_table()
+        self.refresh_analysis_options() # Update list of tests in the right panel that can be analyzed 
+        QMessageBox.information(self, "Success", message)
+
+    def on_result_failed(self, message):
+        """ Report failed insert/update - typed value and edit mode are kept, so saving can be retried """
+        QMessageBox.critical(self, "Error", f"Result was not saved: {message}")
+
+    def open_panel_entry(self):
+        """ Show grid for entering all results of one lab panel from one date """
+        from panel_entry import PanelEntryDialog
+        panel_entry = PanelEntryDialog(self.db, self.worker, self.units_names_list, self)
+        panel_entry.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        panel_entry.saved.connect(self.on_panel_saved)
+        panel_entry.show()
+
+    def on_panel_saved(self, ids, test_names):
+        """ Update views once for a whole saved panel - only the new rows are fetched """
+        if self.listener is None:
+            # Notifications of the inserts are coalesced into one fetch when listener is active
+            self.worker.submit(self.db.select_by_ids, ids, on_result=self.results_model.upsert_rows, on_error=self.on_changes_failed)
+            self.refresh_results_count()
+            self.result_date_input.invalidate_result_days()
+        self.merge_analysis_options(test_names)
+
+    def merge_analysis_options(self, test_names):
+        """ Add test names to the list of tests to analyze without fetching the whole list again """
+        current_names = [self.test_analysis_input.itemText(index) for index in range(self.test_analysis_input.count())]
+        if not set(test_names) <= set(current_names):
+            self.set_analysis_options(sorted(set(current_names) | set(test_names)))
+
+    def refresh_analysis_options(self):
+        """ Fetch names of tests present in database and offer them for analysis """
+        self.worker.submit(self.db.select_chosen_column, "test_name", on_result=self.set_analysis_options, key="analysis_options")
+
+    def set_analysis_options(self, new_test_names):
+        """ Replace list of tests to analyze, keeping test name picked before for analysis shown (not refreshing) """
+        current_selection = self.test_analysis_input.currentText()
+        self.test_analysis_input.clear()  # Clear the existing list
+        self.test_analysis_input.addItems(new_test_names)
+        if current_selection in new_test_names:
+            self.test_analysis_input.setCurrentText(current_selection)
+        indexed = len(self.name_index.names)
+        for test_name in new_test_names:
+            self.name_index.add(test_name)
+        if len(self.name_index.names) > indexed and self.search_input.text().strip():
+            self.apply_search() # Newly found names may match typed text
 
     def show_context_menu(self, pos):
         """ Show context menu for deleting or updating selected row """
@@ -190,52 +436,77 @@ class LabResultsApp(QWidget):
         context_menu.setStyleSheet("background-color: #2b5eb0")
         delete_action = context_menu.addAction("Delete Result")
         update_action = context_menu.addAction("Change result")
+        export_action = context_menu.addAction("Export results...")
+        abnormal_action = context_menu.addAction("Show abnormal results")
         action = context_menu.exec(self.results_table.mapToGlobal(pos))
         if action == delete_action:
             self.delete_result()
         if action == update_action:
             self.prepare_update_result()
+        if action == export_action:
+            self.export_results()
+        if action == abnormal_action:
+            self.open_abnormal_results()
+
+    def open_abnormal_results(self):
+        """ Show all results outside their reference range in a separate window """
+        if self.reference_ranges is None:
+            QMessageBox.warning(self, "Not Ready", "Reference ranges are still being loaded, please try again in a moment.")
+            return
+        from abnormal_results import AbnormalResultsDialog
+        abnormal_results = AbnormalResultsDialog(self.db, self.worker, self.reference_ranges, self)
+        abnormal_results.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        abnormal_results.show()
+
+    def export_results(self):
+        """ Let user pick a file and stream results matching "Entries History" filters into it (on worker thread) """
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export results", "results.csv",
+            "CSV (*.csv);;JSON Lines (*.jsonl);;Parquet (*.parquet);;Arrow (*.arrow)")
+        if not path:
+            return
+        self.worker.submit(
+            export_results, path, self.db, filters=dict(self.results_model.filters),
+            on_result=lambda _: QMessageBox.information(self, "Success", f"Results exported to {path}"))
 
     def delete_result(self):
         """ Delete the selected result from the database """
-        db = DatabaseManager()
-        selected_row = self.results_table.currentRow()
+        selected_row = self.results_table.currentIndex().row()
         if selected_row != -1:  # If a row is selected
-            test_name = self.results_table.item(selected_row, 0).text()
-            result_value = self.results_table.item(selected_row, 1).text()
-            unit = self.results_table.item(selected_row, 2).text()
-            test_date = self.results_table.item(selected_row, 3).text()
+            test_name, result_value, unit, test_date = self.results_model.row_data(selected_row)
             reply = QMessageBox.question(self, "Confirm Deletion", 
                 f"Are you sure you want to delete the result:\n\nTest: {test_name}\nValue: {result_value} {unit}\nDate: {test_date}",
                 QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No)
             if reply == QMessageBox.StandardButton.Yes:
-                result_id = db.get_result_id(test_name, result_value, unit, test_date)
-                if result_id:
-                    db.delete(result_id)  # Delete from database
-                    self.results_table.removeRow(selected_row)  # Remove from "Entries History" table view
-                    QMessageBox.information(self, "Success", "Result deleted successfully!")
-                else:
-                    QMessageBox.critical(self, "Error", "Failed to find the result in database.")
+                result_id = self.results_model.result_id(selected_row) # Primary key is kept in the model
+                self.worker.submit(
+                    self.db.delete, result_id,
+                    on_result=lambda deleted: self.on_result_deleted(result_id, deleted))
         else:
             QMessageBox.warning(self, "No Selection", "Please select a result to delete.")
 
+    def on_result_deleted(self, result_id, deleted):
+        """ Remove deleted result from "Entries History" table view """
+        if deleted:
+            self.results_model.remove_ids([result_id])
+            self.refresh_results_count()
+            QMessageBox.information(self, "Success", "Result deleted successfully!")
+        else:
+            QMessageBox.critical(self, "Error", "Failed to find the result in database.")
+
     def prepare_update_result(self):
         """ Load the selected result into input fields to allow updating """
-        db = DatabaseManager()
-        selected_row = self.results_table.currentRow()
+        selected_row = self.results_table.currentIndex().row()
         if selected_row != -1: 
             # Extract the data from the selected row
-            test_name = self.results_table.item(selected_row, 0).text()
-            result_value = self.results_table.item(selected_row, 1).text()
-            unit = self.results_table.item(selected_row, 2).text()
-            test_date = self.results_table.item(selected_row, 3).text()
+            test_name, result_value, unit, test_date = self.results_model.row_data(selected_row)
             # Populate fields with selected data for editing
             self.test_name_input.setCurrentText(test_name)
             self.result_value_input.setText(result_value)
             self.unit_input.setCurrentText(unit)
             self.result_date_input.setSelectedDate(QDate.fromString(test_date, "yyyy-MM-dd"))
-            # Retrieve and store the result ID for updating (it sets the logic to update mode)
-            self.editing_id = db.get_result_id(test_name, result_value, unit, test_date)
+            # Store the result ID for updating (it sets the logic to update mode)
+            self.editing_id = self.results_model.result_id(selected_row)
         else:
             QMessageBox.warning(self, "No Selection", "Please select a result to update.")
    
@@ -249,16 +520,55 @@ class LabResultsApp(QWidget):
         self.set_insert_mode()
 
     def refresh_chosen_table(self):
-        """ Fetch results from database for SELECTED test and display in "Analysis" section's table widget """
-        db = DatabaseManager()
+        """ Fetch results from database for SELECTED test (on worker thread, stale requests are dropped) """
         test_name = self.test_analysis_input.currentText()
-        results = db.select_chosen_all(test_name) if test_name else []
+        self.worker.submit(
+            self.db.select_test_history, test_name,
+            on_result=lambda history: self.show_chosen_results(test_name, *history), key="chosen_test")
+
+    @timed("ui", rows=lambda args, result: len(args[2]))
+    def show_chosen_results(self, test_name, results, statistics):
+        """ Display results of SELECTED test in "Analysis" section's table widget, its statistics and plot """
         self.chosen_table.setRowCount(len(results))
+        flags = self.flag_history(test_name, results)
         for row_id, (result_value, unit, test_date) in enumerate(results):
-            self.chosen_table.setItem(row_id, 0, QTableWidgetItem(str(result_value)))
+            value_item = QTableWidgetItem(str(result_value))
+            value_item.setData(ResultsTableModel.FLAG_ROLE, int(flags[row_id]) if flags is not None else 0)
+            self.chosen_table.setItem(row_id, 0, value_item)
             self.chosen_table.setItem(row_id, 1, QTableWidgetItem(unit))
             self.chosen_table.setItem(row_id, 2, QTableWidgetItem(test_date.strftime("%Y-%m-%d")))
+        data_version = statistics[-1] if statistics else None
+        units = {unit for _, unit, _ in results}
+        if len(units) > 1:
+            # Stored summary adds up values in different units - summarize values converted to one unit instead
+            try:
+                values, unit = self.convert_units(test_name, results)
+            except ValueError as e:
+                self.update_statistics(None)
+                QMessageBox.warning(self, "Inconsistent Units", f"{e}. Cannot plot data.")
+                return
+            self.update_statistics(summarize(values))
+        else:
+            values, unit = [result_value for result_value, _, _ in results], next(iter(units), "")
+            self.update_statistics(statistics) # Show stats for selected test
+        self.plot_data(test_name, [test_date for _, _, test_date in results], values, unit or "", data_version) # Plot history for selected test
+
+    def flag_history(self, test_name, results):
+        """ Out-of-range flags of one test's results (None until reference ranges are loaded) """
+        if self.reference_ranges is None:
+            return None
+        return self.reference_ranges.flag_history(
+            test_name, [result_value for result_value, _, _ in results], [unit for _, unit, _ in results],
+            [test_date for _, _, test_date in results])
+
+    def convert_units(self, test_name, results):
+        """ Values of a mixed-unit history converted to the test's canonical unit: (NumPy array, unit) """
+        if self.unit_converter is None:
+            from units import UnitConverter # Imports NumPy
+            self.unit_converter = UnitConverter()
+        return self.unit_converter.convert(test_name, [result_value for result_value, _, _ in results], [unit for _, unit, _ in results])
     
+    @timed("ui")
     def choose_test(self):
         """ Initialize actions for selecting test in "Analysis" section """
         test_name = self.test_analysis_input.currentText()
@@ -266,92 +576,93 @@ class LabResultsApp(QWidget):
             self.set_default_image()
             QMessageBox.warning(self, "No Test Selected", "Please select a test to analyze.")
             return
-        self.refresh_chosen_table() # Display results for selected test
-        self.update_statistics() # Show stats for selected test
-        self.plot_data() # Plot history for selected test
-
-    def update_statistics(self):
-        """ Retrieve data and display statistics for selected test in "Analysis" section """
-        row_count = self.chosen_table.rowCount()
+        self.refresh_chosen_table() # Display results, stats and plot for selected test once they are fetched
+        self.set_canvas() # Import plotting libraries while the results are being fetched
+
+    def open_diagnostics(self):
+        """ Show timings of database calls and UI handlers (hidden dialog, Ctrl+Shift+D) """
+        from diagnostics import DiagnosticsDialog
+        if self.diagnostics is None:
+            self.diagnostics = DiagnosticsDialog(self)
+        self.diagnostics.show()
+        self.diagnostics.raise_()
+        self.diagnostics.activateWindow()
+
+    def open_dashboard(self):
+        """ Show charts of a whole panel of tests (e.g. CBC) in a separate window """
+        from dashboard import DashboardDialog
+        if self.render_executor is None:
+            # Spawned (not forked) workers - forking a process running Qt and worker threads is not safe
+            self.render_executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+        dashboard = DashboardDialog(self.db, self.worker, self.render_executor, self.dashboard_images, self)
+        dashboard.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dashboard.show()
+
+    @timed("ui")
+    def update_statistics(self, statistics):
+        """ Display statistics for selected test in "Analysis" section (read from the per-test summary) """
+        summary = describe(statistics)
         # If no data is avaiable (when app is launched and no test for analysis is selected)
-        if row_count == 0:
-            self.min_label.setText("Min: N/A")
-            self.max_label.setText("Max: N/A")
-            self.avg_label.setText("Avg: N/A")
-            self.std_label.setText("Std Dev: N/A")
-            return
-        
-        # Extract test results numerical values (from the first column)
-        values = []
-        for row in range(row_count):
-            item = self.chosen_table.item(row, 0)  
-            if item:
-                try:
-                    values.append(float(item.text()))  # Convert to float
-                except ValueError:
-                    continue  # Skip invalid entries
-
-        # Compute statistics for selected test 
-        if values:
-            self.min_label.setText(f"MIN: {np.min(values):.2f}")
-            self.max_label.setText(f"MAX: {np.max(values):.2f}")
-            self.avg_label.setText(f"AVG: {np.mean(values):.2f} ± {np.std(values):.2f}")
-        else:
+        if summary is None:
             self.min_label.setText("MIN: N/A")
             self.max_label.setText("MAX: N/A")
             self.avg_label.setText("AVG: N/A")
-        
-    def plot_data(self):
-        """ Plot and display results in time for selected test in "Analysis" section """
-        # Fetch data from the chosen test table into a pandas DataFrame
-        selected_test_name = self.test_analysis_input.currentText()
-        data = []
-        for row in range(self.chosen_table.rowCount()):
-            result_value = float(self.chosen_table.item(row, 0).text())
-            unit = self.chosen_table.item(row, 1).text()
-            test_date = self.chosen_table.item(row, 2).text()
-            data.append((result_value, unit, test_date))
-        df = pd.DataFrame(data, columns=["Value", "Unit", "Date"])
-
-        # Check if all units are the same (could happen because there's no restriction while entering data)
-        unique_units = df["Unit"].unique()
-        if len(unique_units) > 1:
-            QMessageBox.warning(
-                self, 
-                "Inconsistent Units", 
-                f"Selected test has multiple units: {', '.join(unique_units)}. Cannot plot data.")
             return
-
-        # Convert the Date column to datetime and sort
-        df["Date"] = pd.to_datetime(df["Date"])
-        df.sort_values("Date", inplace=True)
+        self.min_label.setText(f"MIN: {summary['min']:.2f}")
+        self.max_label.setText(f"MAX: {summary['max']:.2f}")
+        self.avg_label.setText(f"AVG: {summary['mean']:.2f} ± {summary['std']:.2f}")
         
-        # Plot
-        self.figure.clear() # Clear previous figure to avoid overlapping
-        self.figure.set_facecolor("#dcdadb")
-        font = self.set_plot_font()
-        ax = self.figure.add_subplot(111) 
-        ax.plot(df["Date"], df["Value"], marker="$X$", markerfacecolor="#9e2a47", markeredgecolor="#9e2a47", color="#2b5eb0")
-        ax.set_title(f"{selected_test_name} Results Over Time", font=font, fontsize=14)
-        ax.set_xlabel("Date", font=font, fontsize=14)
-        ax.set_ylabel(f"Value ({unique_units[0]})", font=font, fontsize=14)
-        ax.grid(True, alpha=0.5)
-
-        # Update the canvas
-        self.canvas.draw()  
+    @timed("ui", rows=lambda args, result: len(args[2]))
+    def plot_data(self, test_name, dates, values, unit, data_version):
+        """ Plot and display results in time for selected test in "Analysis" section (values are in one unit) """
+        # Results are already ordered by date in the query
+        band = None
+        if self.reference_ranges is not None and dates:
+            band = self.reference_ranges.band(test_name, unit, dates[-1]) # Range valid at the latest result
+        self.set_canvas()
+        self.plot_stack.setCurrentIndex(1)
+        self.trend_plot.show_series(test_name, data_version, dates, values, unit, band)
 
     def set_canvas(self):
-        """ Prepare a blank plotting area for later use """    
+        """ Prepare plotting area next to the default image (only once, on first analysis action) """
+        if self.trend_plot is not None:
+            return
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_qtagg import (FigureCanvasQTAgg as FigureCanvas, NavigationToolbar2QT as NavigationToolbar)
+        from plotting import TrendPlot
         self.figure = Figure()
         self.canvas = FigureCanvas(self.figure) # Makes it compatible with PyQt widgets
+        self.trend_plot = TrendPlot(self.figure, self.canvas, self.set_plot_font()) # Keeps axes and artists between plots
+
+        canvas_page = QWidget()
+        canvas_layout = QVBoxLayout()
+        canvas_layout.setContentsMargins(0, 0, 0, 0)
+        canvas_layout.addWidget(NavigationToolbar(self.canvas, canvas_page)) # Zoom/pan, plotted points follow the visible range
+        canvas_layout.addWidget(self.canvas)
+        canvas_page.setLayout(canvas_layout)
+        self.plot_stack.addWidget(canvas_page)
+
+    def set_image_page(self):
+        """ Default image shown until a test is picked """
+        image_page = QWidget()
+        image_layout = QVBoxLayout()
+        title = QLabel("Your blood test history will be plotted here - pick one above to analyze")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        title.setFont(QFont("Roboto Regular", 14))
+        title.setStyleSheet("background-color: transparent; color: black;")
+        image_layout.addWidget(title)
+        image_layout.addWidget(ScaledImageLabel(assets.pixmap("images/axolotl.webp")), 1)
+        image_page.setLayout(image_layout)
+        return image_page
 
     def init_ui(self):
         """ Manage the GUI """
-        self.set_canvas()
         self.set_font()
         self.setStyleSheet("color: white;")
         self.setPalette(self.set_background())
         self.set_geometry()
+        self.diagnostics_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        self.diagnostics_shortcut.activated.connect(self.open_diagnostics) # Hidden - not shown anywhere in the window
 
         main_layout = QHBoxLayout() # Will be divided in left and right panels
     
@@ -369,8 +680,7 @@ class LabResultsApp(QWidget):
         data_entry_layout = QVBoxLayout()
         data_entry_section.setLayout(data_entry_layout)
         data_entry_section.setObjectName("dataEntrySection")
-        data_entry_stylesheet_file = os.path.join(self.current_dir, f"resources/styles/data_entry_section.qss")
-        data_entry_section_style = self.load_stylesheet(data_entry_stylesheet_file)
+        data_entry_section_style = self.load_stylesheet("data_entry_section.qss")
         data_entry_section.setStyleSheet(data_entry_section_style)
 
         self.test_name_input = QComboBox()
@@ -388,7 +698,7 @@ class LabResultsApp(QWidget):
         self.unit_input.setFont(QFont("Roboto Regular", 12))
         data_entry_layout.addWidget(self.unit_input)
    
-        self.result_date_input = CustomCalendarWidget()
+        self.result_date_input = CustomCalendarWidget(self.request_result_days)
         data_entry_layout.addWidget(self.result_date_input)
 
         add_button = QPushButton("Add/Update Result")
@@ -396,30 +706,58 @@ class LabResultsApp(QWidget):
         add_button.setStyleSheet("background-color: #35a854; color: white; border-radius: 5px; padding: 10px; font-family: Roboto Regular; font-size: 16px;")  # Styling for button
         data_entry_layout.addWidget(add_button)
 
+        panel_button = QPushButton("Enter Panel...")
+        panel_button.clicked.connect(self.open_panel_entry) # Whole lab report (e.g. CBC) saved at once
+        panel_button.setStyleSheet("background-color: #2b5eb0; color: white; border-radius: 5px; padding: 10px; font-family: Roboto Regular; font-size: 16px;")
+        data_entry_layout.addWidget(panel_button)
+
         left_panel.addWidget(data_entry_section)
         
         # DATA DISPLAY
-        label_results = QLabel("Entries History")
-        label_results.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        label_results.setFont(QFont("Roboto Regular", 18, QFont.Weight.Bold))
-        left_panel.addWidget(label_results)
-
-        self.results_table = QTableWidget()
-        results_table_stylesheet_file = os.path.join(self.current_dir, f"resources/styles/results_table.qss")
-        results_table_style = self.load_stylesheet(results_table_stylesheet_file)
+        self.label_results = QLabel("Entries History")
+        self.label_results.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.label_results.setFont(QFont("Roboto Regular", 18, QFont.Weight.Bold))
+        left_panel.addWidget(self.label_results)
+
+        search_layout = QHBoxLayout() # Filters of "Entries History", applied while typing
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search test name")
+        self.search_input.setClearButtonEnabled(True)
+        self.search_input.textChanged.connect(lambda: self.apply_search())
+        search_layout.addWidget(self.search_input, 3)
+        self.period_input = QComboBox()
+        for text, days in PERIODS:
+            self.period_input.addItem(text, days)
+        self.period_input.currentIndexChanged.connect(lambda: self.apply_search())
+        search_layout.addWidget(self.period_input, 2)
+        self.value_min_input = QLineEdit()
+        self.value_min_input.setPlaceholderText("Min")
+        self.value_max_input = QLineEdit()
+        self.value_max_input.setPlaceholderText("Max")
+        for value_input in (self.value_min_input, self.value_max_input):
+            value_input.textChanged.connect(lambda: self.apply_search())
+            search_layout.addWidget(value_input, 1)
+        for widget in (self.search_input, self.period_input, self.value_min_input, self.value_max_input):
+            widget.setFont(QFont("Roboto Regular", 12))
+            widget.setStyleSheet("background-color: white; color: black;")
+        left_panel.addLayout(search_layout)
+
+        self.results_model = ResultsTableModel(self.request_results_page)
+        self.results_table = QTableView()
+        self.results_table.setModel(self.results_model)
+        results_table_style = self.load_stylesheet("results_table.qss")
         self.results_table.setStyleSheet(results_table_style)
         self.results_table.setFont(QFont("Roboto Regular", 12))
         self.results_table.horizontalHeader().setFont(QFont("Roboto Regular", 12))
         self.results_table.verticalHeader().setFont(QFont("Roboto Regular", 11))
-        self.results_table.setColumnCount(4)
-        self.results_table.setHorizontalHeaderLabels(["Test Name", "Result Value", "Unit", "Test Date"])
         self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.results_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers) # Stop from double-click editing
         self.results_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection) # Enable row selection mode
+        self.results_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
         self.results_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)  # Add context menu for delete/update right-click
         self.results_table.customContextMenuRequested.connect(self.show_context_menu) 
-        left_panel.addWidget(self.results_table)
-        self.refresh_results_table() # Populate and refresh the results table
+        self.results_table.setItemDelegateForColumn(1, FlagDelegate(ResultsTableModel.FLAG_ROLE, self.results_table)) # Out-of-range arrows
+        left_panel.addWidget(self.results_table) # Populated once the window is on screen
 
         # RIGHT PANEL - TEST SELECTION AND DATA ANALYSIS (STATISTICS AND PLOT)
         right_panel = QVBoxLayout()
@@ -434,20 +772,23 @@ class LabResultsApp(QWidget):
         analysis_layout = QVBoxLayout()
         analysis_section.setLayout(analysis_layout)
         analysis_section.setObjectName("analysisSection") 
-        stylesheet_file = os.path.join(self.current_dir, f"resources/styles/selected_section.qss")
-        selected_section_style = self.load_stylesheet(stylesheet_file)
+        selected_section_style = self.load_stylesheet("selected_section.qss")
         analysis_section.setStyleSheet(selected_section_style)
 
         self.test_analysis_input = QComboBox()
-        self.test_analysis_input.addItems(self.get_accessible_values())
         self.test_analysis_input.setFont(QFont("Roboto Regular", 12))
         analysis_layout.addWidget(self.test_analysis_input)
 
         choose_button = QPushButton("Choose Test/Refresh")
-        choose_button.clicked.connect(self.choose_test) # Triggering method to retrieve data from the database
+        choose_button.clicked.connect(lambda: self.choose_test()) # Triggering method to retrieve data from the database
         choose_button.setStyleSheet("background-color: #35a854; color: white; border-radius: 5px; padding: 10px; font-family: Roboto Regular; font-size: 16px;")  # Styling for button
         analysis_layout.addWidget(choose_button)
 
+        dashboard_button = QPushButton("Dashboard")
+        dashboard_button.clicked.connect(self.open_dashboard) # Small multiples of a whole panel of tests
+        dashboard_button.setStyleSheet("background-color: #2b5eb0; color: white; border-radius: 5px; padding: 10px; font-family: Roboto Regular; font-size: 16px;")
+        analysis_layout.addWidget(dashboard_button)
+
         self.chosen_table = QTableWidget()
         self.chosen_table.setStyleSheet(selected_section_style)
         self.chosen_table.setFont(QFont("Roboto Regular", 12))
@@ -458,6 +799,7 @@ class LabResultsApp(QWidget):
         self.chosen_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
         self.chosen_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers) # Stop from double-click editing
         self.chosen_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection) # Enable row selection mode
+        self.chosen_table.setItemDelegateForColumn(0, FlagDelegate(ResultsTableModel.FLAG_ROLE, self.chosen_table))
         analysis_layout.addWidget(self.chosen_table)
 
         # DATA ANALYSIS
@@ -499,7 +841,9 @@ class LabResultsApp(QWidget):
         self.plot_widget.setStyleSheet(selected_section_style)
 
         plot_layout = QVBoxLayout()
-        plot_layout.addWidget(self.canvas)  
+        self.plot_stack = QStackedWidget() # Default image first, plotting canvas is added on first analysis action
+        self.plot_stack.addWidget(self.set_image_page())
+        plot_layout.addWidget(self.plot_stack)  
         self.plot_widget.setLayout(plot_layout)  
         analysis_layout.addWidget(self.plot_widget)  
 
@@ -1,14 +1,48 @@
-import sys 
-from interface import LabResultsApp
+import sys
+import json
+import argparse
+from startup import profiler
+from metrics import metrics
 from PyQt6.QtWidgets import QApplication
 from PyQt6.QtCore import QLocale
 
+def parse_args(argv):
+    """ Options of the app itself (arguments for Qt, like -platform, are left for QApplication) """
+    parser = argparse.ArgumentParser(description="Blood Test Tracker")
+    parser.add_argument("--startup-profile", action="store_true", help="print how long each startup phase took")
+    parser.add_argument("--exit-after-paint", action="store_true",
+                        help="print startup phases as JSON and quit once the window was painted (used by benchmark.py)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record timings of database calls and UI handlers from the start (shown by Ctrl+Shift+D)")
+    parser.add_argument("--metrics-file", help="save recorded timings when the app quits (.prom/.txt = Prometheus text, JSON otherwise)")
+    return parser.parse_known_args(argv[1:])
+
 if __name__ == "__main__":
+    args, qt_args = parse_args(sys.argv)
+    if args.startup_profile or args.exit_after_paint:
+        profiler.enable()
+    if args.metrics or args.metrics_file:
+        metrics.enable()
     try:
-        app = QApplication(sys.argv)
+        import assets
+        from interface import LabResultsApp
+        profiler.mark("imports")
+        app = QApplication(sys.argv[:1] + qt_args)
         QLocale.setDefault(QLocale(QLocale.Language.English, QLocale.Country.UnitedStates)) # Set the language to ENG
+        profiler.mark("application")
+        assets.preload() # One bundle, images decoded and font registered once for the whole session
+        profiler.mark("assets")
         ex = LabResultsApp()
-        sys.exit(app.exec())
+        if args.exit_after_paint:
+            def report_and_quit():
+                print(json.dumps(profiler.as_dict()))
+                ex.close()
+                app.quit()
+            ex.first_painted.connect(report_and_quit)
+        status = app.exec()
+        if args.metrics_file:
+            metrics.write(args.metrics_file)
+        sys.exit(status)
     except Exception as e:
         print(f"An error occurred: {e}")
         sys.exit(1)
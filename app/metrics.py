@@ -0,0 +1,213 @@
+import json
+import time
+import functools
+import threading
+
+BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000) # Upper bounds, the last bucket is open
+
+class Series():
+    """ Calls of one instrumented operation: count, failures, rows and latency histogram """
+    def __init__(self):
+        """ Initialize Series instance """
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, milliseconds, rows, failed):
+        """ Record one call """
+        self.count += 1
+        self.errors += failed
+        self.rows += rows or 0
+        self.total_ms += milliseconds
+        self.max_ms = max(self.max_ms, milliseconds)
+        bucket = 0
+        while bucket < len(BUCKETS_MS) and milliseconds > BUCKETS_MS[bucket]:
+            bucket += 1
+        self.buckets[bucket] += 1
+
+    def quantile(self, q):
+        """ Latency under which q of the calls finished, estimated as upper bound of the bucket (max for the open one) """
+        if not self.count:
+            return 0.0
+        cumulative = 0
+        for bucket, calls in enumerate(self.buckets):
+            cumulative += calls
+            if cumulative >= q * self.count:
+                return min(BUCKETS_MS[bucket], self.max_ms) if bucket < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+def row_count(result):
+    """ Number of rows in a call's result: lists and dicts by length, (rows, ...) tuples by their first item """
+    if isinstance(result, (list, dict)):
+        return len(result)
+    if isinstance(result, tuple) and result and isinstance(result[0], list):
+        return len(result[0])
+    return None
+
+class Metrics():
+    """ Counts, latency histograms and row counts of storage calls, their phases (waiting for a worker thread, connecting,
+        executing, fetching) and main UI handlers. Disabled by default - instrumented calls then cost one attribute check.
+        Calls are recorded from any thread, series are keyed by (kind, name, phase) """
+    def __init__(self):
+        """ Initialize Metrics instance """
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.series = {}
+        self.local = threading.local() # Storage call running on the thread - phases are attributed to it
+        self.started = time.time()
+
+    def enable(self, enabled=True):
+        """ Start (or stop) recording """
+        self.enabled = enabled
+
+    def reset(self):
+        """ Forget everything recorded so far """
+        with self.lock:
+            self.series = {}
+            self.started = time.time()
+
+    def record(self, kind, name, milliseconds, rows=None, failed=False, phase="total"):
+        """ Record one finished call """
+        with self.lock:
+            series = self.series.get((kind, name, phase))
+            if series is None:
+                series = self.series[(kind, name, phase)] = Series()
+            series.add(milliseconds, rows, failed)
+
+    def call(self, kind, name, function, args, kwargs, rows=None):
+        """ Run function and record it (generators are recorded once exhausted, with the number of yielded rows) """
+        previous = self.enter(name) if kind == "storage" else None
+        started = time.perf_counter()
+        try:
+            result = function(*args, **kwargs)
+        except BaseException:
+            self.record(kind, name, (time.perf_counter() - started) * 1000, failed=True)
+            raise
+        finally:
+            if kind == "storage":
+                self.leave(previous)
+        if hasattr(result, "__next__"):
+            return self.timed_iteration(kind, name, result, started)
+        self.record(kind, name, (time.perf_counter() - started) * 1000, rows(args, result) if rows else row_count(result))
+        return result
+
+    def timed_iteration(self, kind, name, iterator, started):
+        """ Pass items of a streaming call through, recording it when the stream ends (time includes the consumer's) """
+        count = 0
+        failed = True
+        try:
+            while True:
+                previous = self.enter(name)
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    failed = False
+                    return
+                finally:
+                    self.leave(previous)
+                count += 1
+                yield item
+        finally:
+            self.record(kind, name, (time.perf_counter() - started) * 1000, count, failed)
+
+    def enter(self, name):
+        """ Mark storage call as running on this thread, return the one it interrupted """
+        previous = getattr(self.local, "call", None)
+        self.local.call = name
+        return previous
+
+    def leave(self, previous):
+        """ Restore storage call which was running before """
+        self.local.call = previous
+
+    def phase(self, phase, function, *args, rows=False):
+        """ Run function as a phase of the storage call running on this thread (connect, execute, fetch) """
+        started = time.perf_counter()
+        failed = True
+        result = None
+        try:
+            result = function(*args)
+            failed = False
+            return result
+        finally:
+            self.record("storage", getattr(self.local, "call", None) or "other", (time.perf_counter() - started) * 1000,
+                        row_count(result) if rows else None, failed, phase)
+
+    def snapshot(self):
+        """ Recorded series as dicts ordered by total time spent (largest first) """
+        with self.lock:
+            items = [(key, series, list(series.buckets)) for key, series in self.series.items()]
+        snapshot = []
+        for (kind, name, phase), series, buckets in items:
+            snapshot.append({
+                "kind": kind, "name": name, "phase": phase, "count": series.count, "errors": series.errors,
+                "rows": series.rows, "total_ms": round(series.total_ms, 3),
+                "mean_ms": round(series.total_ms / series.count, 3) if series.count else 0.0,
+                "p50_ms": series.quantile(0.5), "p95_ms": series.quantile(0.95), "max_ms": round(series.max_ms, 3),
+                "buckets": {str(bound): calls for bound, calls in zip(list(BUCKETS_MS) + ["+Inf"], buckets)}})
+        snapshot.sort(key=lambda entry: entry["total_ms"], reverse=True)
+        return snapshot
+
+    def to_json(self):
+        """ Recorded series as JSON document """
+        return json.dumps({"started": self.started, "enabled": self.enabled, "series": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        """ Recorded series in Prometheus text exposition format (latency histogram in seconds, rows and errors as counters) """
+        lines = [
+            "# HELP tracker_call_duration_seconds Latency of instrumented calls and their phases",
+            "# TYPE tracker_call_duration_seconds histogram"]
+        counters = {"rows": [], "errors": []}
+        for entry in sorted(self.snapshot(), key=lambda entry: (entry["kind"], entry["name"], entry["phase"])):
+            labels = ",".join(f'{label}="{escape_label(entry[label])}"' for label in ("kind", "name", "phase"))
+            cumulative = 0
+            for bound, calls in entry["buckets"].items():
+                cumulative += calls
+                le = bound if bound == "+Inf" else repr(float(bound) / 1000)
+                lines.append(f'tracker_call_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"tracker_call_duration_seconds_sum{{{labels}}} {entry['total_ms'] / 1000!r}")
+            lines.append(f"tracker_call_duration_seconds_count{{{labels}}} {entry['count']}")
+            counters["rows"].append(f"tracker_call_rows_total{{{labels}}} {entry['rows']}")
+            counters["errors"].append(f"tracker_call_errors_total{{{labels}}} {entry['errors']}")
+        lines += ["# HELP tracker_call_rows_total Rows returned or written by instrumented calls",
+                  "# TYPE tracker_call_rows_total counter"] + counters["rows"]
+        lines += ["# HELP tracker_call_errors_total Instrumented calls which raised",
+                  "# TYPE tracker_call_errors_total counter"] + counters["errors"]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, prometheus=None):
+        """ Save recorded series to file - Prometheus text or JSON (guessed from extension by default: .prom/.txt) """
+        if prometheus is None:
+            prometheus = path.lower().endswith((".prom", ".txt"))
+        text = self.to_prometheus() if prometheus else self.to_json()
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+def escape_label(value):
+    """ Escape label value for Prometheus text format """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+metrics = Metrics() # Shared by all modules of the app
+
+def timed(kind, name=None, rows=None):
+    """ Decorator recording calls of function under kind and name (its qualified name by default).
+        rows(args, result) counts rows of a call, otherwise they are counted from the result """
+    def decorate(function):
+        label = name or function.__qualname__
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            return metrics.call(kind, label, function, args, kwargs, rows)
+        return wrapper
+    return decorate
+
+def instrument(cls, names, kind="storage"):
+    """ Record calls of the given methods defined by class cls (methods inherited from elsewhere are left alone) """
+    for name in names:
+        function = cls.__dict__.get(name)
+        if callable(function) and not hasattr(function, "__wrapped__"):
+            setattr(cls, name, timed(kind, name)(function))
@@ -0,0 +1,368 @@
+import sys
+import time
+import argparse
+from storage import open_storage
+from catalog import load_unit_conversions
+
+SCHEMA = "results_schema"
+VERSION_TABLE = f"{SCHEMA}.schema_version"
+NUMERIC_PATTERN = r"^\s*[-+]?([0-9]+([.,][0-9]*)?|[.,][0-9]+)([eE][-+]?[0-9]+)?\s*$" # Decimal comma is accepted too
+
+def ensure_version_table(db):
+    """ Create table recording applied schema versions """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VERSION_TABLE} (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+        """)
+
+def current_version(db):
+    """ Latest applied schema version (0 for a database never migrated) """
+    with db.cursor() as cur:
+        cur.execute(f"SELECT COALESCE(MAX(version), 0) FROM {VERSION_TABLE};")
+        return cur.fetchone()[0]
+
+def column_type(db, table, column):
+    """ Data type of table column (None if the column does not exist) """
+    with db.cursor() as cur:
+        cur.execute("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = %s AND table_name = %s AND column_name = %s;
+        """, (SCHEMA, table, column))
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def numeric_result_values(db, batch_size, pause, report):
+    """ Convert results.result_value from VARCHAR to DOUBLE PRECISION without locking the table for the whole run.
+        New column is backfilled in batches while a trigger keeps concurrent writes in sync,
+        non-numeric legacy values are moved to results_schema.invalid_result_values and reported """
+    if column_type(db, "results", "result_value") == "double precision":
+        return # Fresh databases are created with numeric column already
+
+    with db.cursor() as cur:
+        cur.execute(f"""
+        ALTER TABLE {SCHEMA}.results ADD COLUMN IF NOT EXISTS result_value_num DOUBLE PRECISION;
+
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.invalid_result_values (
+            id INTEGER PRIMARY KEY,
+            test_name VARCHAR(255) NOT NULL,
+            result_value VARCHAR(255) NOT NULL,
+            unit VARCHAR(50),
+            test_date DATE NOT NULL,
+            found_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+
+        -- Keep rows written during the backfill converted
+        CREATE OR REPLACE FUNCTION {SCHEMA}.sync_result_value_num() RETURNS trigger AS $$
+        BEGIN
+            IF NEW.result_value ~ '{NUMERIC_PATTERN}' THEN
+                NEW.result_value_num := replace(NEW.result_value, ',', '.')::double precision;
+            ELSE
+                NEW.result_value_num := NULL;
+            END IF;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS sync_result_value_num ON {SCHEMA}.results;
+        CREATE TRIGGER sync_result_value_num
+            BEFORE INSERT OR UPDATE OF result_value ON {SCHEMA}.results
+            FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.sync_result_value_num();
+        """)
+        cur.execute(f"SELECT COALESCE(MAX(id), 0) FROM {SCHEMA}.results;")
+        max_id = cur.fetchone()[0]
+
+    # Backfill in short transactions (each batch commits on its own)
+    converted = 0
+    for start in range(0, max_id, batch_size):
+        with db.bulk_cursor() as cur: # Listening apps get one reload notification per batch, not one per row
+            cur.execute(f"""
+            UPDATE {SCHEMA}.results
+            SET result_value_num = replace(result_value, ',', '.')::double precision
+            WHERE id > %s AND id <= %s AND result_value_num IS NULL AND result_value ~ %s;
+            """, (start, start + batch_size, NUMERIC_PATTERN))
+            converted += cur.rowcount
+        report(f"Converted values of rows up to ID {min(start + batch_size, max_id)} of {max_id}")
+        if pause:
+            time.sleep(pause) # Let other clients work between batches
+
+    # Swap columns in one short transaction
+    with db.bulk_cursor() as cur:
+        cur.execute(f"LOCK TABLE {SCHEMA}.results IN SHARE ROW EXCLUSIVE MODE;")
+        cur.execute(f"""
+        INSERT INTO {SCHEMA}.invalid_result_values (id, test_name, result_value, unit, test_date)
+        SELECT id, test_name, result_value, unit, test_date FROM {SCHEMA}.results WHERE result_value_num IS NULL
+        ON CONFLICT (id) DO NOTHING
+        RETURNING id, test_name, result_value, unit, test_date;
+        """)
+        invalid = cur.fetchall()
+        cur.execute(f"""
+        DELETE FROM {SCHEMA}.results WHERE result_value_num IS NULL;
+        DROP TRIGGER sync_result_value_num ON {SCHEMA}.results;
+        DROP FUNCTION {SCHEMA}.sync_result_value_num();
+        ALTER TABLE {SCHEMA}.results DROP COLUMN result_value;
+        ALTER TABLE {SCHEMA}.results RENAME COLUMN result_value_num TO result_value;
+        ALTER TABLE {SCHEMA}.results ALTER COLUMN result_value SET NOT NULL;
+        """)
+    report(f"Converted {converted} values to numbers.")
+    for result_id, test_name, result_value, unit, test_date in invalid:
+        report(f"Non-numeric value moved to {SCHEMA}.invalid_result_values: ID {result_id}, {test_name} = '{result_value}' {unit or ''} ({test_date})")
+
+def test_statistics(db, batch_size, pause, report):
+    """ Per-test summary (count, sum, sum of squares, min, max, first and last date) kept up to date by
+        statement-level triggers, which aggregate all rows changed by one statement at once (bulk loads included) """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.test_statistics (
+            test_name VARCHAR(255) PRIMARY KEY,
+            result_count BIGINT NOT NULL,
+            value_sum DOUBLE PRECISION NOT NULL,
+            value_sum_sq DOUBLE PRECISION NOT NULL,
+            min_value DOUBLE PRECISION NOT NULL,
+            max_value DOUBLE PRECISION NOT NULL,
+            first_date DATE NOT NULL,
+            last_date DATE NOT NULL
+        );
+
+        -- Extremes of removed rows are recomputed from the remaining rows of affected tests only
+        CREATE INDEX IF NOT EXISTS results_test_name_value_idx ON {SCHEMA}.results (test_name, result_value);
+
+        CREATE OR REPLACE FUNCTION {SCHEMA}.maintain_test_statistics() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE {SCHEMA}.test_statistics AS s
+                SET result_count = s.result_count - o.result_count,
+                    value_sum = s.value_sum - o.value_sum,
+                    value_sum_sq = s.value_sum_sq - o.value_sum_sq
+                FROM (SELECT test_name, count(*) AS result_count, sum(result_value) AS value_sum,
+                             sum(result_value * result_value) AS value_sum_sq
+                      FROM old_rows GROUP BY test_name) AS o
+                WHERE s.test_name = o.test_name;
+
+                DELETE FROM {SCHEMA}.test_statistics WHERE result_count <= 0;
+
+                UPDATE {SCHEMA}.test_statistics AS s
+                SET min_value = r.min_value, max_value = r.max_value, first_date = r.first_date, last_date = r.last_date
+                FROM (SELECT test_name, min(result_value) AS min_value, max(result_value) AS max_value,
+                             min(test_date) AS first_date, max(test_date) AS last_date
+                      FROM {SCHEMA}.results
+                      WHERE test_name IN (
+                          SELECT o.test_name FROM old_rows AS o JOIN {SCHEMA}.test_statistics AS t USING (test_name)
+                          WHERE o.result_value <= t.min_value OR o.result_value >= t.max_value
+                             OR o.test_date <= t.first_date OR o.test_date >= t.last_date)
+                      GROUP BY test_name) AS r
+                WHERE s.test_name = r.test_name;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {SCHEMA}.test_statistics AS s
+                    (test_name, result_count, value_sum, value_sum_sq, min_value, max_value, first_date, last_date)
+                SELECT test_name, count(*), sum(result_value), sum(result_value * result_value),
+                       min(result_value), max(result_value), min(test_date), max(test_date)
+                FROM new_rows GROUP BY test_name
+                ON CONFLICT (test_name) DO UPDATE SET
+                    result_count = s.result_count + EXCLUDED.result_count,
+                    value_sum = s.value_sum + EXCLUDED.value_sum,
+                    value_sum_sq = s.value_sum_sq + EXCLUDED.value_sum_sq,
+                    min_value = LEAST(s.min_value, EXCLUDED.min_value),
+                    max_value = GREATEST(s.max_value, EXCLUDED.max_value),
+                    first_date = LEAST(s.first_date, EXCLUDED.first_date),
+                    last_date = GREATEST(s.last_date, EXCLUDED.last_date);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        DROP TRIGGER IF EXISTS test_statistics_insert ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_insert AFTER INSERT ON {SCHEMA}.results
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.maintain_test_statistics();
+        DROP TRIGGER IF EXISTS test_statistics_update ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_update AFTER UPDATE ON {SCHEMA}.results
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.maintain_test_statistics();
+        DROP TRIGGER IF EXISTS test_statistics_delete ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_delete AFTER DELETE ON {SCHEMA}.results
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.maintain_test_statistics();
+        """)
+        # Fill the summary from existing rows - the lock keeps writes out until the triggers take over
+        cur.execute(f"LOCK TABLE {SCHEMA}.results IN SHARE ROW EXCLUSIVE MODE;")
+        cur.execute(f"""
+        TRUNCATE {SCHEMA}.test_statistics;
+        INSERT INTO {SCHEMA}.test_statistics
+            (test_name, result_count, value_sum, value_sum_sq, min_value, max_value, first_date, last_date)
+        SELECT test_name, count(*), sum(result_value), sum(result_value * result_value),
+               min(result_value), max(result_value), min(test_date), max(test_date)
+        FROM {SCHEMA}.results GROUP BY test_name;
+        """)
+        report(f"Statistics computed for {cur.rowcount} tests.")
+
+def statistics_data_version(db, batch_size, pause, report):
+    """ Version stamp of each test's data, changed by every write touching the test
+        (drawn from a sequence, so a version is never reused even if a test is removed and added again) """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE SEQUENCE IF NOT EXISTS {SCHEMA}.data_version_seq;
+        ALTER TABLE {SCHEMA}.test_statistics
+            ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT nextval('{SCHEMA}.data_version_seq');
+
+        CREATE OR REPLACE FUNCTION {SCHEMA}.bump_data_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('DELETE', 'UPDATE') THEN
+                UPDATE {SCHEMA}.test_statistics SET data_version = nextval('{SCHEMA}.data_version_seq')
+                WHERE test_name IN (SELECT test_name FROM old_rows);
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE {SCHEMA}.test_statistics SET data_version = nextval('{SCHEMA}.data_version_seq')
+                WHERE test_name IN (SELECT test_name FROM new_rows);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+
+        -- Triggers fire in name order, so versions are bumped after test_statistics_* triggers updated the summary
+        DROP TRIGGER IF EXISTS test_statistics_version_insert ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_version_insert AFTER INSERT ON {SCHEMA}.results
+            REFERENCING NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.bump_data_version();
+        DROP TRIGGER IF EXISTS test_statistics_version_update ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_version_update AFTER UPDATE ON {SCHEMA}.results
+            REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.bump_data_version();
+        DROP TRIGGER IF EXISTS test_statistics_version_delete ON {SCHEMA}.results;
+        CREATE TRIGGER test_statistics_version_delete AFTER DELETE ON {SCHEMA}.results
+            REFERENCING OLD TABLE AS old_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION {SCHEMA}.bump_data_version();
+        """)
+
+def unit_conversions(db, batch_size, pause, report):
+    """ Per-test unit conversion table and canonical_results view, which reads every result converted to its test's
+        canonical unit (rows are filled from resources/textfiles/unit_conversions.txt after migrations) """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.unit_conversions (
+            test_name VARCHAR(255) NOT NULL,
+            unit VARCHAR(50) NOT NULL,
+            canonical_unit VARCHAR(50) NOT NULL,
+            factor DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (test_name, unit)
+        );
+
+        CREATE OR REPLACE VIEW {SCHEMA}.canonical_results AS
+        SELECT r.id, r.test_name, r.result_value * COALESCE(c.factor, 1) AS result_value,
+               COALESCE(c.canonical_unit, r.unit) AS unit, r.test_date
+        FROM {SCHEMA}.results AS r
+        LEFT JOIN {SCHEMA}.unit_conversions AS c ON c.test_name = r.test_name AND c.unit = r.unit;
+        """)
+
+def reference_range_index(db, batch_size, pause, report):
+    """ Index covering the out-of-range query: results of one test and unit are compared with their reference range
+        without reading the table (index-only scan) """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS results_reference_idx
+            ON {SCHEMA}.results (test_name, unit, result_value) INCLUDE (test_date);
+        """)
+
+def keyset_indexes(db, batch_size, pause, report):
+    """ Indexes ending with id serve keyset pages ordered by (test_date, id) - with or without a test name filter -
+        as one range scan. They replace the (test_date) and (test_name, test_date) indexes, which are their prefixes """
+    with db.cursor() as cur:
+        cur.execute(f"""
+        CREATE INDEX IF NOT EXISTS results_date_id_idx ON {SCHEMA}.results (test_date, id);
+        CREATE INDEX IF NOT EXISTS results_test_name_date_id_idx ON {SCHEMA}.results (test_name, test_date, id);
+        DROP INDEX IF EXISTS {SCHEMA}.results_test_date_idx;
+        DROP INDEX IF EXISTS {SCHEMA}.results_test_name_date_idx;
+        """)
+
+def change_notifications(db, batch_size, pause, report):
+    """ Trigger notifying listening apps about every change of results (payload: "<operation>:<id>").
+        Bulk loads set tracker.bulk_load and send a single "RELOAD:0" notification instead.
+        Databases set up by older versions may already have it, created by the superuser - it is left as it is """
+    with db.cursor() as cur:
+        cur.execute("""
+        SELECT to_regprocedure(%s) IS NOT NULL,
+               EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'results_changed' AND tgrelid = to_regclass(%s));
+        """, (f"{SCHEMA}.notify_results_change()", f"{SCHEMA}.results"))
+        has_function, has_trigger = cur.fetchone()
+        if not has_function:
+            cur.execute(f"""
+            CREATE FUNCTION {SCHEMA}.notify_results_change() RETURNS trigger AS $$
+            BEGIN
+                IF current_setting('tracker.bulk_load', true) = 'on' THEN
+                    RETURN NULL;
+                END IF;
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM pg_notify('results_changed', TG_OP || ':' || OLD.id);
+                ELSE
+                    PERFORM pg_notify('results_changed', TG_OP || ':' || NEW.id);
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """)
+        if not has_trigger:
+            cur.execute(f"""
+            CREATE TRIGGER results_changed
+                AFTER INSERT OR UPDATE OR DELETE ON {SCHEMA}.results
+                FOR EACH ROW EXECUTE FUNCTION {SCHEMA}.notify_results_change();
+            """)
+
+MIGRATIONS = [
+    (1, "Numeric result values", numeric_result_values),
+    (2, "Per-test statistics", test_statistics),
+    (3, "Data version of test statistics", statistics_data_version),
+    (4, "Unit conversions", unit_conversions),
+    (5, "Reference range index", reference_range_index),
+    (6, "Keyset pagination indexes", keyset_indexes),
+    (7, "Change notifications", change_notifications),
+]
+
+def pending_migrations(db):
+    """ Descriptions of migrations not applied yet """
+    if db.backend != "postgres":
+        return [] # Embedded SQLite database is always created with the current schema
+    with db.cursor() as cur:
+        cur.execute("SELECT to_regclass(%s) IS NOT NULL;", (VERSION_TABLE,))
+        has_version_table = cur.fetchone()[0]
+    version = current_version(db) if has_version_table else 0
+    return [description for step_version, description, _ in MIGRATIONS if step_version > version]
+
+def migrate(db=None, batch_size=10000, pause=0.0, report=print):
+    """ Apply all pending migrations in order (every step is safe to run again if it was interrupted) """
+    db = db or open_storage()
+    if db.backend == "postgres":
+        ensure_version_table(db)
+        version = current_version(db)
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            report(f"Applying migration {step_version}: {description}")
+            step(db, batch_size, pause, report)
+            with db.cursor() as cur:
+                cur.execute(f"INSERT INTO {VERSION_TABLE} (version, description) VALUES (%s, %s);", (step_version, description))
+        report(f"Database schema is up to date (version {max(version, MIGRATIONS[-1][0])}).")
+    else:
+        report(f"Schema migrations apply to PostgreSQL only, {db.backend} database is created with the current schema.")
+    # Stored conversions follow the text file - refreshed on every run, so edits to the file reach SQL queries too
+    conversions = load_unit_conversions()
+    db.store_unit_conversions(conversions)
+    report(f"Unit conversions of {len(conversions)} tests stored.")
+
+def main():
+    """ Command line entry point: python3 app/migrations.py """
+    parser = argparse.ArgumentParser(description="Upgrade database schema of Blood Test Tracker")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows converted per transaction")
+    parser.add_argument("--pause", type=float, default=0.0, help="seconds to wait between batches")
+    args = parser.parse_args()
+    try:
+        migrate(batch_size=args.batch_size, pause=args.pause)
+    except Exception as e:
+        print(f"Migration failed: {e}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import datetime
+from array import array
+from PyQt6.QtCore import (Qt, QAbstractTableModel, QModelIndex)
+from storage import (row_matches, filters_narrow)
+from metrics import timed
+
+class ResultsTableModel(QAbstractTableModel):
+    """ Model of "Entries History" table. Rows are kept in compact column arrays ordered by (test_date, id)
+        and paged in from the database (keyset pages, optionally filtered on the server) while the user scrolls down """
+    HEADERS = ["Test Name", "Result Value", "Unit", "Test Date"]
+    FLAG_ROLE = Qt.ItemDataRole.UserRole + 1 # -1 below reference range, 1 above, 0 within or unknown
+
+    def __init__(self, request_page, page_size=500):
+        """ Initialize model with function requesting rows asynchronously: request_page(filters, after, limit, on_result, on_error),
+            where after is (test_date, id) of the last loaded row (None for the first page), on_result receives
+            [(id, test_name, value, unit, date)] ordered by (test_date, id) and on_error the message of a failed page """
+        super().__init__()
+        self.request_page = request_page
+        self.page_size = page_size
+        self.filters = {} # Filters of shown rows (see FILTERS in storage.py)
+        self.flag_rows = None # Vectorized flagging of rows (ReferenceRanges.flags), set once reference ranges are loaded
+        self.clear_storage()
+        self.exhausted = True # Nothing is fetched before the first reload()
+
+    def clear_storage(self):
+        """ Drop all loaded rows """
+        self.ids = array("q")
+        self.name_codes = array("H") # Test names and units are stored once and referenced by their position
+        self.unit_codes = array("H")
+        self.values = array("d")
+        self.dates = array("l") # Date ordinals, formatted only when displayed
+        self.flags = array("b") # Out-of-range flags, computed per batch of rows - painting only reads them
+        self.rows_by_id = {} # Result ID -> row, rebuilt on demand (None) after rows were inserted or removed in the middle
+        self.names = []
+        self.name_positions = {}
+        self.units = []
+        self.unit_positions = {}
+        self.exhausted = False # True when the last page was already fetched
+        self.fetching = False # True while a page is being fetched
+
+    def code(self, text, texts, positions):
+        """ Return position of text in lookup list (adding it if it is new) """
+        position = positions.get(text)
+        if position is None:
+            position = positions[text] = len(texts)
+            texts.append(text)
+        return position
+
+    def rowCount(self, parent=QModelIndex()):
+        """ Number of loaded rows """
+        return 0 if parent.isValid() else len(self.ids)
+
+    def columnCount(self, parent=QModelIndex()):
+        """ Number of columns """
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        """ Format the cell only when the view asks for it """
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return self.names[self.name_codes[row]]
+            if column == 1:
+                return str(self.values[row])
+            if column == 2:
+                return self.units[self.unit_codes[row]]
+            if column == 3:
+                return datetime.date.fromordinal(self.dates[row]).isoformat()
+        if role == Qt.ItemDataRole.UserRole:
+            return self.ids[row]
+        if role == self.FLAG_ROLE:
+            return self.flags[row]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        """ Column names and row numbers """
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return section + 1
+
+    def canFetchMore(self, parent=QModelIndex()):
+        """ More rows can be fetched until a page shorter than page_size is returned """
+        return not parent.isValid() and not self.exhausted and not self.fetching
+
+    def fetchMore(self, parent=QModelIndex()):
+        """ Request next page of rows (called by the view when scrolled near the end) """
+        if parent.isValid() or self.exhausted or self.fetching:
+            return
+        self.fetching = True
+        after = (datetime.date.fromordinal(self.dates[-1]), self.ids[-1]) if self.ids else None
+        self.request_page(self.filters, after, self.page_size, self.append_page, self.page_failed)
+
+    def page_failed(self, message):
+        """ Let the view request the failed page again when scrolled (reporting the error is left to request_page) """
+        self.fetching = False
+
+    def row_key(self, row):
+        """ Sort key of loaded row: (date ordinal, id) """
+        return (self.dates[row], self.ids[row])
+
+    def insert_position(self, key):
+        """ Row where (date ordinal, id) key belongs (bisection over loaded rows) """
+        low, high = 0, len(self.ids)
+        while low < high:
+            middle = (low + high) // 2
+            if self.row_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    @timed("ui", rows=lambda args, result: len(args[1]))
+    def append_page(self, rows):
+        """ Append fetched page of rows """
+        self.fetching = False
+        if len(rows) < self.page_size:
+            self.exhausted = True
+        if rows and self.ids:
+            last_key = self.row_key(len(self.ids) - 1)
+            rows = [row for row in rows if (row[4].toordinal(), row[0]) > last_key] # Already added by change notification
+        if rows:
+            first = len(self.ids)
+            self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+            for row in rows:
+                self.store_row(len(self.ids), row)
+            self.update_flags(first, len(self.ids))
+            self.endInsertRows()
+
+    def store_row(self, position, result_row):
+        """ Insert row into storage at given position (without notifying views) """
+        result_id, test_name, result_value, unit, test_date = result_row
+        if position == len(self.ids):
+            if self.rows_by_id is not None:
+                self.rows_by_id[result_id] = position
+        else:
+            self.rows_by_id = None # Rows after position moved
+        self.ids.insert(position, result_id)
+        self.name_codes.insert(position, self.code(test_name, self.names, self.name_positions))
+        self.values.insert(position, float(result_value))
+        self.unit_codes.insert(position, self.code(unit or "", self.units, self.unit_positions))
+        self.dates.insert(position, test_date.toordinal())
+        self.flags.insert(position, 0)
+
+    def update_flags(self, start, end):
+        """ Flag rows start..end-1 in one vectorized pass (without notifying views) """
+        if self.flag_rows is None or start >= end:
+            return
+        flags = self.flag_rows(
+            self.names, memoryview(self.name_codes)[start:end], memoryview(self.values)[start:end],
+            self.units, memoryview(self.unit_codes)[start:end], memoryview(self.dates)[start:end])
+        self.flags[start:end] = array("b", flags.tobytes())
+
+    def set_flag_rows(self, flag_rows):
+        """ Start flagging out-of-range results - all loaded rows are flagged at once """
+        self.flag_rows = flag_rows
+        if self.ids:
+            self.update_flags(0, len(self.ids))
+            self.dataChanged.emit(self.index(0, 0), self.index(len(self.ids) - 1, len(self.HEADERS) - 1), [self.FLAG_ROLE])
+
+    def reload(self):
+        """ Forget loaded rows and fetch the first page again """
+        self.beginResetModel()
+        self.clear_storage()
+        self.endResetModel()
+        self.fetchMore()
+
+    def set_filters(self, filters):
+        """ Show only rows passing filters - filtered in memory when all rows of wider filters are loaded
+            (e.g. while typing more of a test name), otherwise fetched from the first page again """
+        filters = {key: value for key, value in filters.items() if value is not None and value != ""}
+        narrowed = self.exhausted and not self.fetching and filters_narrow(self.filters, filters)
+        self.filters = filters
+        if narrowed:
+            self.keep_matching()
+        else:
+            self.reload()
+
+    def keep_matching(self):
+        """ Drop loaded rows not passing filters in one pass over column arrays (no database round trip) """
+        test_name, test_names = self.filters.get("test_name"), self.filters.get("test_names")
+        names = {code for code, name in enumerate(self.names)
+                 if (not test_name or name == test_name) and (test_names is None or name in test_names)}
+        units = {code for code, unit in enumerate(self.units) if not self.filters.get("unit") or unit == self.filters["unit"]}
+        date_from = self.filters["date_from"].toordinal() if self.filters.get("date_from") else None
+        date_to = self.filters["date_to"].toordinal() if self.filters.get("date_to") else None
+        value_min, value_max = self.filters.get("value_min"), self.filters.get("value_max")
+        kept = [row for row, (name_code, unit_code, date, value)
+                in enumerate(zip(self.name_codes, self.unit_codes, self.dates, self.values))
+                if name_code in names and unit_code in units
+                and (date_from is None or date >= date_from) and (date_to is None or date <= date_to)
+                and (value_min is None or value >= value_min) and (value_max is None or value <= value_max)]
+        if len(kept) == len(self.ids):
+            return
+        self.beginResetModel()
+        for attribute in ("ids", "name_codes", "values", "unit_codes", "dates", "flags"):
+            column = getattr(self, attribute)
+            setattr(self, attribute, array(column.typecode, [column[row] for row in kept]))
+        self.rows_by_id = None
+        self.endResetModel()
+
+    def find_row(self, result_id):
+        """ Return row number of loaded result ID (or None) """
+        if self.rows_by_id is None:
+            self.rows_by_id = {loaded_id: row for row, loaded_id in enumerate(self.ids)}
+        return self.rows_by_id.get(result_id)
+
+    def result_id(self, row):
+        """ Database ID of result displayed in row """
+        return self.ids[row]
+
+    def row_data(self, row):
+        """ Return (test_name, result_value, unit, test_date) of row as displayed """
+        return tuple(self.data(self.index(row, column)) for column in range(len(self.HEADERS)))
+
+    def fits(self, row, key):
+        """ Check if loaded row can take (date ordinal, id) key without moving """
+        if row > 0 and self.row_key(row - 1) >= key:
+            return False
+        if row + 1 < len(self.ids):
+            return key < self.row_key(row + 1)
+        # Last loaded row may not move past rows which are not fetched yet
+        return self.exhausted or key <= self.row_key(row)
+
+    def upsert_rows(self, rows):
+        """ Apply inserted/updated rows fetched after change notification """
+        for result_row in rows:
+            row = self.find_row(result_row[0])
+            key = (result_row[4].toordinal(), result_row[0])
+            matches = row_matches(self.filters, result_row)
+            if row is not None and matches and self.fits(row, key):
+                _, test_name, result_value, unit, test_date = result_row
+                self.name_codes[row] = self.code(test_name, self.names, self.name_positions)
+                self.values[row] = float(result_value)
+                self.unit_codes[row] = self.code(unit or "", self.units, self.unit_positions)
+                self.dates[row] = test_date.toordinal()
+                self.update_flags(row, row + 1)
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.HEADERS) - 1))
+                continue
+            if row is not None:
+                self.remove_row(row) # Moved to another date or no longer passes filters
+            position = self.insert_position(key)
+            if matches and (position < len(self.ids) or self.exhausted):
+                # Rows past the loaded end are left to fetchMore
+                self.beginInsertRows(QModelIndex(), position, position)
+                self.store_row(position, result_row)
+                self.update_flags(position, position + 1)
+                self.endInsertRows()
+
+    def sync_tests(self, test_names, rows):
+        """ Bring loaded rows of test_names in line with their current rows (fetched up to the last loaded date):
+            rows no longer there are removed, new and changed ones applied and unchanged ones left alone,
+            so selection and scroll position stay """
+        fetched_ids = {row[0] for row in rows}
+        codes = {self.name_positions[test_name] for test_name in test_names if test_name in self.name_positions}
+        self.remove_ids([result_id for result_id, code in zip(self.ids, self.name_codes) if code in codes and result_id not in fetched_ids])
+        self.upsert_rows([row for row in rows if not self.is_loaded_as(row)])
+
+    def is_loaded_as(self, result_row):
+        """ Check if (id, test_name, result_value, unit, test_date) row is loaded with exactly these values """
+        row = self.find_row(result_row[0])
+        if row is None:
+            return False
+        _, test_name, result_value, unit, test_date = result_row
+        return (self.names[self.name_codes[row]] == test_name and self.values[row] == float(result_value)
+                and self.units[self.unit_codes[row]] == (unit or "") and self.dates[row] == test_date.toordinal())
+
+    def remove_row(self, row):
+        """ Remove one loaded row """
+        self.beginRemoveRows(QModelIndex(), row, row)
+        for column in (self.ids, self.name_codes, self.values, self.unit_codes, self.dates, self.flags):
+            del column[row]
+        self.rows_by_id = None
+        self.endRemoveRows()
+
+    def remove_ids(self, result_ids):
+        """ Remove deleted results from the model """
+        rows = sorted((row for row in map(self.find_row, result_ids) if row is not None), reverse=True)
+        for row in rows:
+            self.remove_row(row)
@@ -0,0 +1,140 @@
+import math
+import assets
+from PyQt6.QtWidgets import (
+    QDialog, QVBoxLayout, QHBoxLayout, QComboBox, QDateEdit, QTableWidget, QTableWidgetItem, QHeaderView, QPushButton,
+    QMessageBox, QLabel)
+from PyQt6.QtCore import (Qt, QDate, pyqtSignal)
+from PyQt6.QtGui import (QFont, QColor)
+from catalog import load_panels
+
+class PanelEntryDialog(QDialog):
+    """ Grid for entering a whole lab report at once - all tests of one panel (e.g. CBC) from one date.
+        Filled in results are saved in one multi-row transaction, empty rows are skipped """
+    saved = pyqtSignal(object, object) # IDs of inserted results, names of their tests
+
+    def __init__(self, db, worker, unit_names, parent=None):
+        """ Initialize PanelEntryDialog instance """
+        super().__init__(parent)
+        self.db = db
+        self.worker = worker
+        self.unit_names = unit_names
+        self.panels = load_panels()
+        self.generation = 0 # Increased with every panel switch - late units of previous panel are not applied
+
+        self.setWindowTitle("Enter Panel")
+        self.setStyleSheet("background-color: #dcdadb; color: black;")
+        layout = QVBoxLayout()
+
+        header = QHBoxLayout()
+        self.panel_input = QComboBox()
+        self.panel_input.setFont(QFont("Roboto Regular", 12))
+        self.panel_input.setStyleSheet("background-color: #9e2a47; color: #dcdadb; padding: 5px;")
+        self.panel_input.addItems(list(self.panels))
+        self.panel_input.currentTextChanged.connect(self.show_panel)
+        header.addWidget(self.panel_input, 1)
+        header.addWidget(QLabel("Test Date:"))
+        self.date_input = QDateEdit(QDate.currentDate())
+        self.date_input.setCalendarPopup(True)
+        self.date_input.setDisplayFormat("yyyy-MM-dd")
+        self.date_input.setMaximumDate(QDate.currentDate()) # Disable selecting date set in the future
+        self.date_input.setFont(QFont("Roboto Regular", 12))
+        header.addWidget(self.date_input)
+        layout.addLayout(header)
+
+        self.table = QTableWidget(0, 3)
+        self.table.setHorizontalHeaderLabels(["Test Name", "Result Value", "Unit"])
+        self.table.setStyleSheet(assets.stylesheet("results_table.qss"))
+        self.table.setFont(QFont("Roboto Regular", 12))
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        layout.addWidget(self.table)
+
+        save_button = QPushButton("Save Panel")
+        save_button.clicked.connect(self.save)
+        save_button.setStyleSheet("background-color: #35a854; color: white; border-radius: 5px; padding: 10px; font-family: Roboto Regular; font-size: 16px;")
+        layout.addWidget(save_button)
+        self.save_button = save_button
+
+        self.setLayout(layout)
+        self.resize(700, 800)
+        self.show_panel(self.panel_input.currentText())
+
+    def show_panel(self, panel_name):
+        """ One row per test of the panel, units preset to the ones used last time (fetched on worker thread) """
+        self.generation += 1
+        test_names = self.panels.get(panel_name, [])
+        self.table.setRowCount(len(test_names))
+        for row, test_name in enumerate(test_names):
+            name_item = QTableWidgetItem(test_name)
+            name_item.setFlags(name_item.flags() & ~Qt.ItemFlag.ItemIsEditable)
+            self.table.setItem(row, 0, name_item)
+            self.table.setItem(row, 1, QTableWidgetItem(""))
+            unit_input = QComboBox()
+            unit_input.addItems(self.unit_names)
+            self.table.setCellWidget(row, 2, unit_input)
+        generation = self.generation
+        self.worker.submit(
+            self.db.select_latest_units, test_names,
+            on_result=lambda units: self.set_units(generation, units),
+            key=("panel_units", id(self))) # Per dialog - another open panel must not replace this lookup
+
+    def set_units(self, generation, units):
+        """ Preset unit of every test to the one of its latest result """
+        if generation != self.generation:
+            return
+        for row in range(self.table.rowCount()):
+            unit = units.get(self.table.item(row, 0).text())
+            if unit in self.unit_names:
+                self.table.cellWidget(row, 2).setCurrentText(unit)
+
+    def collect_rows(self):
+        """ Return (test_name, result_value, unit, test_date) of filled in rows, raise ValueError naming invalid ones """
+        test_date = self.date_input.date().toString("yyyy-MM-dd")
+        rows, invalid = [], []
+        for row in range(self.table.rowCount()):
+            item = self.table.item(row, 1)
+            text = item.text().strip()
+            item.setBackground(QColor("#dcdadb"))
+            if not text:
+                continue
+            test_name = self.table.item(row, 0).text()
+            try:
+                result_value = float(text)
+                if not math.isfinite(result_value):
+                    raise ValueError(text) # float() accepts nan and inf
+            except ValueError:
+                item.setBackground(QColor("#e8a0a0"))
+                invalid.append(test_name)
+                continue
+            rows.append((test_name, result_value, self.table.cellWidget(row, 2).currentText(), test_date))
+        if invalid:
+            raise ValueError("Please enter valid numbers (with decimal point) for: " + ", ".join(invalid))
+        return rows
+
+    def save(self):
+        """ Insert all filled in results in one transaction (on worker thread) """
+        try:
+            rows = self.collect_rows()
+        except ValueError as e:
+            QMessageBox.critical(self, "Input Error", str(e))
+            return
+        if not rows:
+            QMessageBox.warning(self, "Nothing to Save", "Please enter at least one result value.")
+            return
+        self.save_button.setEnabled(False) # Until this panel is saved
+        self.worker.submit(
+            self.db.insert_many, rows,
+            on_result=lambda ids: self.on_saved(ids, sorted({row[0] for row in rows})),
+            on_error=self.on_failed)
+
+    def on_saved(self, ids, test_names):
+        """ Clear entered values and let the main window update its views once """
+        self.save_button.setEnabled(True)
+        for row in range(self.table.rowCount()):
+            self.table.item(row, 1).setText("")
+        self.saved.emit(ids, test_names)
+        QMessageBox.information(self, "Success", f"{len(ids)} results saved successfully!")
+
+    def on_failed(self, message):
+        """ Nothing was saved - entered values are kept so the user can try again """
+        self.save_button.setEnabled(True)
+        QMessageBox.critical(self, "Error", message)
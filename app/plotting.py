@@ -0,0 +1,145 @@
+from collections import OrderedDict
+import numpy as np
+from matplotlib import dates as mdates
+
+def lttb(x, y, threshold):
+    """ Largest-Triangle-Three-Buckets downsampling: pick threshold points of (x, y) series (x ascending)
+        that keep its visual shape - peaks and dips survive, unlike in plain decimation """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return x, y
+    bucket_size = (length - 2) / (threshold - 2)
+    indexes = np.empty(threshold, dtype=np.int64)
+    indexes[0] = 0
+    indexes[-1] = length - 1
+    a = 0 # Point picked in previous bucket
+    for bucket in range(threshold - 2):
+        start = int(bucket * bucket_size) + 1
+        end = int((bucket + 1) * bucket_size) + 1
+        # Average of the next bucket is the third vertex of the triangle
+        next_end = min(int((bucket + 2) * bucket_size) + 1, length)
+        if end >= next_end:
+            avg_x, avg_y = x[-1], y[-1]
+        else:
+            avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        indexes[bucket + 1] = a
+    return x[indexes], y[indexes]
+
+class TrendPlot():
+    """ Analysis canvas keeping its axes and artists alive between tests. Switching test only updates artists' data,
+        and already rendered (test_name, data_version) views are restored from cached pixels and blitted.
+        Long series are downsampled to the canvas width, again after every zoom/pan, so drawing cost does not grow with history """
+    BACKGROUND_COLOR = "#dcdadb"
+    MARKER = "$X$"
+    MARKER_LIMIT = 200 # Markers are drawn only when that many points or less are visible
+
+    def __init__(self, figure, canvas, font, cache_size=20):
+        """ Initialize TrendPlot instance """
+        self.figure = figure
+        self.canvas = canvas
+        self.font = font
+        self.cache_size = cache_size
+        self.cache = OrderedDict() # (test_name, data_version, band) -> rendered pixels of the whole figure
+        self.cache_canvas_size = None
+        self.figure.set_facecolor(self.BACKGROUND_COLOR)
+
+        # Trend of picked test (default image is shown by the app outside of the canvas)
+        self.plot_axes = self.figure.add_subplot(111)
+        self.plot_axes.grid(True, alpha=0.5)
+        self.plot_axes.set_xlabel("Date", font=font, fontsize=14)
+        self.line, = self.plot_axes.plot(
+            [], [], marker=self.MARKER, markerfacecolor="#9e2a47", markeredgecolor="#9e2a47", color="#2b5eb0")
+        self.plot_axes.xaxis_date() # X data are matplotlib date numbers
+        self.band = None # Shaded reference range of shown test
+        self.current_key = None
+
+        # Full series of shown test, level of detail is recomputed from it when the visible range changes
+        self.full_x = np.empty(0)
+        self.full_y = np.empty(0)
+        self.updating = False
+        self.plot_axes.callbacks.connect("xlim_changed", self.on_xlim_changed)
+
+        # Cached pixels depend on canvas size
+        self.canvas.mpl_connect("resize_event", lambda event: self.cache.clear())
+
+    def show_series(self, test_name, data_version, dates, values, unit, band=None):
+        """ Show history of one test with its reference range band (low, high) shaded -
+            restore cached rendering if this version of data was already drawn """
+        key = (test_name, data_version, band)
+        if key == self.current_key:
+            # Already on screen - only zoom or pan left from the previous look at it is undone
+            limits = (self.plot_axes.get_xlim(), self.plot_axes.get_ylim())
+            self.home_view()
+            if (self.plot_axes.get_xlim(), self.plot_axes.get_ylim()) != limits:
+                self.paint(key)
+            return
+
+        # Artists always reflect shown data (full redraws, e.g. after window expose, draw them)
+        self.full_x = np.asarray(mdates.date2num(dates), dtype=float) if len(dates) else np.empty(0)
+        self.full_y = np.asarray(values, dtype=float)
+        self.set_band(band)
+        self.plot_axes.set_title(f"{test_name} Results Over Time", font=self.font, fontsize=14)
+        self.plot_axes.set_ylabel(f"Value ({unit})", font=self.font, fontsize=14)
+        self.home_view()
+        self.current_key = key
+        self.paint(key)
+
+    def home_view(self):
+        """ Show the whole series: level of detail for the full range and autoscaled limits """
+        self.updating = True # Autoscaling below changes limits - level of detail is already set for the full range
+        self.apply_level_of_detail()
+        self.plot_axes.set_autoscale_on(True) # Zooming with the toolbar sets limits, which turns autoscaling off
+        self.plot_axes.relim()
+        self.plot_axes.autoscale_view()
+        self.updating = False
+
+    def paint(self, key):
+        """ Put the whole view of shown series on screen - restored from cached rendering when there is one """
+        size = self.canvas.get_width_height()
+        if size != self.cache_canvas_size:
+            self.cache.clear()
+            self.cache_canvas_size = size
+        pixels = self.cache.get(key)
+        if pixels is not None:
+            self.cache.move_to_end(key)
+            self.canvas.restore_region(pixels)
+            self.canvas.blit(self.figure.bbox)
+            return
+        self.canvas.draw()
+        self.cache[key] = self.canvas.copy_from_bbox(self.figure.bbox)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False) # Drop least recently shown test
+
+    def set_band(self, band):
+        """ Shade reference range behind the line (an open side reaches the most extreme value of the series) """
+        if self.band is not None:
+            self.band.remove()
+            self.band = None
+        if band is None or band == (None, None) or not len(self.full_y):
+            return
+        low, high = band
+        low = min(self.full_y.min(), high) if low is None else low
+        high = max(self.full_y.max(), low) if high is None else high
+        self.band = self.plot_axes.axhspan(low, high, color="#35a854", alpha=0.15, zorder=0, linewidth=0)
+
+    def apply_level_of_detail(self, x_min=None, x_max=None):
+        """ Put downsampled part of the series between x_min and x_max (whole series by default) into the line """
+        x, y = self.full_x, self.full_y
+        if x_min is not None and len(x):
+            # Keep one point beyond each edge, so the line reaches the sides of the axes
+            start = max(int(np.searchsorted(x, x_min, side="left")) - 1, 0)
+            end = min(int(np.searchsorted(x, x_max, side="right")) + 1, len(x))
+            x, y = x[start:end], y[start:end]
+        width = self.canvas.get_width_height()[0]
+        x, y = lttb(x, y, max(width, 100)) # About one point per pixel column
+        self.line.set_data(x, y)
+        self.line.set_marker(self.MARKER if len(x) <= self.MARKER_LIMIT else "None")
+
+    def on_xlim_changed(self, axes):
+        """ Recompute level of detail for the new visible range (zoom/pan with navigation toolbar) """
+        if self.updating or self.current_key is None:
+            return
+        self.apply_level_of_detail(*axes.get_xlim())
+        self.canvas.draw_idle()
@@ -0,0 +1,117 @@
+import os
+import datetime
+import numpy as np
+from catalog import (load_reference_ranges, load_unit_conversions)
+
+ADULT_AGE = 18 # Age assumed for age-limited ranges when birth date is not set
+
+def years_after(birth_date, years):
+    """ Date of birthday at given age (February 29 birthdays fall on March 1 in common years) """
+    try:
+        return birth_date.replace(year=birth_date.year + years)
+    except ValueError:
+        return datetime.date(birth_date.year + years, 3, 1)
+
+class ReferenceRanges():
+    """ Normal ranges of tests (resources/textfiles/reference_ranges.txt) resolved once for the patient (PATIENT_SEX and
+        PATIENT_BIRTH_DATE in .env) and indexed by test. Every test gets a list of bounds
+        (unit, low, high, date from, date to): age limits become date windows and ranges are also expressed in every unit
+        the test can be converted from. Ranges of one test are expected not to overlap for the same patient """
+
+    def __init__(self, sex=None, birth_date=None, ranges=None, conversions=None):
+        """ Initialize ReferenceRanges instance (profile read from .env, catalogs from resources/textfiles by default) """
+        sex = (sex or os.getenv("PATIENT_SEX") or "").strip().upper()[:1] or None
+        birth_date = birth_date or os.getenv("PATIENT_BIRTH_DATE") or None
+        if isinstance(birth_date, str):
+            birth_date = datetime.date.fromisoformat(birth_date.strip())
+        self.sex = sex
+        self.birth_date = birth_date
+        ranges = load_reference_ranges() if ranges is None else ranges
+        conversions = load_unit_conversions() if conversions is None else conversions
+        self.by_test = {test_name: self.resolve(test_ranges, conversions.get(test_name, (None, {}))[1])
+                        for test_name, test_ranges in ranges.items()}
+
+    def applicable(self, test_ranges):
+        """ Ranges matching patient's sex - without known sex, ranges of both sexes are merged into the widest one """
+        if self.sex is not None:
+            return [test_range for test_range in test_ranges if test_range[3] in (None, self.sex)]
+        merged = {}
+        for unit, low, high, sex, age_from, age_to in test_ranges:
+            key = (unit, age_from, age_to)
+            if sex is None or key not in merged:
+                merged[key] = (low, high)
+            else:
+                other_low, other_high = merged[key]
+                merged[key] = (None if low is None or other_low is None else min(low, other_low),
+                               None if high is None or other_high is None else max(high, other_high))
+        return [(unit, low, high, None, age_from, age_to) for (unit, age_from, age_to), (low, high) in merged.items()]
+
+    def resolve(self, test_ranges, factors):
+        """ Bounds (unit, low, high, date from, date to) of one test, general ones first """
+        bounds = []
+        for unit, low, high, sex, age_from, age_to in sorted(
+                self.applicable(test_ranges), key=lambda test_range: (test_range[3] is not None, test_range[4:] != (None, None))):
+            if self.birth_date is not None:
+                date_from = years_after(self.birth_date, age_from) if age_from is not None else None
+                date_to = years_after(self.birth_date, age_to) if age_to is not None else None
+            elif (age_from or 0) <= ADULT_AGE < (age_to or ADULT_AGE + 1):
+                date_from = date_to = None
+            else:
+                continue
+            bounds.append((unit, low, high, date_from, date_to))
+            if unit in factors:
+                # The same range for results entered in other units of the test
+                for other_unit, factor in factors.items():
+                    if other_unit != unit:
+                        scale = factors[unit] / factor
+                        bounds.append((other_unit, None if low is None else low * scale,
+                                       None if high is None else high * scale, date_from, date_to))
+        return bounds
+
+    def band(self, test_name, unit, date=None):
+        """ (low, high) of the test in given unit on given date (today by default), None if no range is known """
+        date = date or datetime.date.today()
+        band = None
+        for bound_unit, low, high, date_from, date_to in self.by_test.get(test_name, []):
+            if bound_unit == unit and (date_from is None or date >= date_from) and (date_to is None or date < date_to):
+                band = (low, high)
+        return band
+
+    def flags(self, names, name_codes, values, units, unit_codes, ordinals):
+        """ Flag results in one vectorized pass: -1 below range, 1 above, 0 within or unknown. Rows are given as columns
+            (NumPy arrays or buffers, e.g. array.array) of codes into names/units lists, values and date ordinals """
+        name_codes = np.asarray(name_codes)
+        values = np.asarray(values, dtype=float)
+        unit_codes = np.asarray(unit_codes)
+        ordinals = np.asarray(ordinals)
+        low = np.full(len(values), -np.inf)
+        high = np.full(len(values), np.inf)
+        unit_positions = {unit: code for code, unit in enumerate(units)}
+        for code, test_name in enumerate(names):
+            bounds = self.by_test.get(test_name)
+            if not bounds:
+                continue
+            of_test = name_codes == code
+            if not of_test.any():
+                continue
+            for unit, bound_low, bound_high, date_from, date_to in bounds:
+                if unit not in unit_positions:
+                    continue
+                rows = of_test & (unit_codes == unit_positions[unit])
+                if date_from is not None:
+                    rows &= ordinals >= date_from.toordinal()
+                if date_to is not None:
+                    rows &= ordinals < date_to.toordinal()
+                low[rows] = -np.inf if bound_low is None else bound_low
+                high[rows] = np.inf if bound_high is None else bound_high
+        return (values > high).astype(np.int8) - (values < low).astype(np.int8)
+
+    def flag_history(self, test_name, values, units, dates):
+        """ Flags of one test's history (values, units and datetime.date dates given as sequences) """
+        units, unit_codes = np.unique(np.asarray([unit or "" for unit in units], dtype=str), return_inverse=True)
+        ordinals = np.fromiter((date.toordinal() for date in dates), dtype=np.int64, count=len(dates))
+        return self.flags([test_name], np.zeros(len(ordinals), dtype=np.int64), values, list(units), unit_codes, ordinals)
+
+    def bound_rows(self):
+        """ All bounds as (test_name, unit, low, high, date from, date to) rows for the out-of-range query """
+        return [(test_name,) + bound for test_name, bounds in self.by_test.items() for bound in bounds]
@@ -0,0 +1,42 @@
+import io
+import itertools
+import numpy as np
+from matplotlib import dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from plotting import lttb
+from assets import matplotlib_font
+
+UNIT_SEPARATOR = " / " # Joins units of tests whose results were entered in more than one unit
+
+def group_series(rows, versions):
+    """ Split rows of many tests (ordered by test and date) into {test_name: (x, values, unit, data_version)} """
+    series = {}
+    for test_name, group in itertools.groupby(rows, key=lambda row: row[0]):
+        group = list(group)
+        values = np.fromiter((row[1] for row in group), dtype=float, count=len(group))
+        x = np.asarray(mdates.date2num([row[3] for row in group]), dtype=float)
+        unit = UNIT_SEPARATOR.join(sorted({row[2] or "" for row in group}))
+        series[test_name] = (x, values, unit, versions.get(test_name))
+    return series
+
+def render_trend(test_name, x, values, unit, width_px=360, height_px=240, dpi=100, file_format="png"):
+    """ Render small trend chart offscreen with the Agg backend and return encoded image bytes.
+        Uses no GUI and no global pyplot state, so it can run in worker processes (x = matplotlib date numbers) """
+    font = matplotlib_font() # Registered once per worker process
+    figure = Figure(figsize=(width_px / dpi, height_px / dpi), dpi=dpi, facecolor="#dcdadb")
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot(111)
+    x, values = lttb(np.asarray(x, dtype=float), np.asarray(values, dtype=float), max(width_px, 100))
+    ax.plot(x, values, marker="$X$" if len(x) <= 50 else "None",
+            markerfacecolor="#9e2a47", markeredgecolor="#9e2a47", color="#2b5eb0")
+    ax.xaxis_date()
+    ax.set_title(test_name, font=font, fontsize=9)
+    ax.set_ylabel(unit, font=font, fontsize=8)
+    ax.tick_params(labelsize=7)
+    ax.grid(True, alpha=0.5)
+    figure.autofmt_xdate()
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format=file_format, dpi=dpi, facecolor=figure.get_facecolor())
+    return buffer.getvalue()
@@ -0,0 +1,111 @@
+import os
+import re
+import csv
+import sys
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import (ProcessPoolExecutor, as_completed)
+from storage import open_storage
+from analysis import (describe, summarize)
+from catalog import load_panels
+
+FORMATS = ("png", "pdf")
+SUMMARY_COLUMNS = ("test_name", "unit", "count", "min", "max", "mean", "std", "first_date", "last_date", "charts", "note")
+
+def file_stem(test_name):
+    """ Test name turned into a safe file name, e.g. "Erythrocytes (RBC)" -> "Erythrocytes_RBC" """
+    return re.sub(r"[^\w.-]+", "_", test_name).strip("_") or "test"
+
+def fetch_histories(db, test_names=None, date_from=None, date_to=None):
+    """ Fetch histories of all tests (or of the given ones) with one batched query: {test_name: (x, values, unit, data_version)}.
+        Values are converted to canonical units in SQL, so only tests with units missing in the conversion table stay mixed """
+    from render import group_series # Imports matplotlib
+    if test_names is None:
+        test_names = db.select_chosen_column("test_name")
+    rows, versions = db.select_many(test_names, date_from, date_to, canonical=True)
+    return group_series(rows, versions)
+
+def render_report(output_dir, test_name, x, values, unit, formats, width_px, height_px, dpi):
+    """ Write trend chart of one test in every format, return written file names (runs in worker processes) """
+    from render import render_trend
+    file_names = []
+    for file_format in formats:
+        file_name = f"{file_stem(test_name)}.{file_format}"
+        image = render_trend(test_name, x, values, unit, width_px, height_px, dpi, file_format)
+        with open(os.path.join(output_dir, file_name), "wb") as file:
+            file.write(image)
+        file_names.append(file_name)
+    return file_names
+
+def summary_row(test_name, x, values, unit):
+    """ Statistics of one test in the same form as "Analysis" section shows them """
+    from matplotlib import dates as mdates
+    from render import UNIT_SEPARATOR
+    row = {"test_name": test_name, "unit": unit, "count": len(values), "charts": "", "note": ""}
+    if UNIT_SEPARATOR in unit:
+        row["note"] = "multiple units without known conversion - not summarized" # Same rule as the in-app chart
+        return row
+    summary = describe(summarize(values))
+    row.update({key: f"{summary[key]:.2f}" for key in ("min", "max", "mean", "std")})
+    row["first_date"] = mdates.num2date(x[0]).date().isoformat()
+    row["last_date"] = mdates.num2date(x[-1]).date().isoformat()
+    return row
+
+def generate_reports(output_dir, db=None, test_names=None, date_from=None, date_to=None, formats=("png",),
+                     workers=None, width_px=900, height_px=500, dpi=100, report=print):
+    """ Render trend chart of every test (or of the given ones) and write summary.csv into output_dir.
+        Histories are fetched once, charts are rendered in a process pool (one process per core by default).
+        Return summary rows """
+    db = db or open_storage()
+    os.makedirs(output_dir, exist_ok=True)
+    series = fetch_histories(db, test_names, date_from, date_to)
+    rows = {test_name: summary_row(test_name, x, values, unit) for test_name, (x, values, unit, _) in series.items()}
+    # Spawned (not forked) workers - the same pool setup as the dashboard's, safe even when called from the app
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {
+            executor.submit(render_report, output_dir, test_name, x, values, unit, formats, width_px, height_px, dpi): test_name
+            for test_name, (x, values, unit, _) in series.items() if not rows[test_name]["note"]}
+        for future in as_completed(futures):
+            test_name = futures[future]
+            try:
+                rows[test_name]["charts"] = " ".join(future.result())
+                report(f"  {test_name}")
+            except Exception as e:
+                rows[test_name]["note"] = f"rendering failed: {e}"
+                report(f"  {test_name}: rendering failed: {e}")
+    summary = [rows[test_name] for test_name in sorted(rows)]
+    with open(os.path.join(output_dir, "summary.csv"), "w", encoding="utf-8", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS, lineterminator="\n")
+        writer.writeheader()
+        writer.writerows(summary)
+    return summary
+
+def main():
+    """ Command line entry point: python3 app/reports.py reports/ --from 2024-01-01 --format png pdf """
+    parser = argparse.ArgumentParser(description="Render trend reports and a summary table of blood test results (no GUI)")
+    parser.add_argument("output_dir", help="directory for charts and summary.csv (created if missing)")
+    parser.add_argument("--test", dest="test_names", action="append", help="report only this test (can be repeated)")
+    parser.add_argument("--panel", help="report only tests of this panel from panels.txt")
+    parser.add_argument("--from", dest="date_from", type=datetime.date.fromisoformat, help="first test date (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", type=datetime.date.fromisoformat, help="last test date (YYYY-MM-DD)")
+    parser.add_argument("--format", dest="formats", nargs="+", choices=FORMATS, default=["png"], help="chart file formats")
+    parser.add_argument("--workers", type=int, help="rendering processes (number of cores by default)")
+    parser.add_argument("--size", nargs=2, type=int, default=[900, 500], metavar=("WIDTH", "HEIGHT"), help="chart size in pixels")
+    args = parser.parse_args()
+    test_names = args.test_names
+    try:
+        if args.panel:
+            panels = load_panels()
+            if args.panel not in panels:
+                raise ValueError(f"Unknown panel '{args.panel}' (use one of: {', '.join(panels)})")
+            test_names = (test_names or []) + panels[args.panel]
+        summary = generate_reports(args.output_dir, test_names=test_names, date_from=args.date_from, date_to=args.date_to,
+                                   formats=args.formats, workers=args.workers, width_px=args.size[0], height_px=args.size[1])
+    except Exception as e:
+        print(f"Report failed: {e}")
+        sys.exit(1)
+    print(f"Reports of {len(summary)} tests written to {args.output_dir}")
+
+if __name__ == "__main__":
+    main()
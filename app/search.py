@@ -0,0 +1,72 @@
+import re
+
+PERIODS = (("All time", None), ("Last 30 days", 30), ("Last year", 365), ("Last 5 years", 5 * 365 + 1)) # Quick date filters (days back)
+
+def trigrams(text):
+    """ Set of 3-letter pieces of lowercased text padded with spaces (so word starts weigh more) """
+    text = f"  {text.lower()} "
+    return {text[position:position + 3] for position in range(len(text) - 2)}
+
+class NameIndex():
+    """ In-memory trigram index of test names for "Entries History" search. Names matching typed text are resolved
+        here (microseconds for any number of results) and rows are then fetched by their names (test_names filter),
+        which is served by (test_name, test_date, id) index """
+    FUZZY_SIMILARITY = 0.45 # Share of text's trigrams a name has to contain to match despite a typo
+
+    def __init__(self, names=()):
+        """ Initialize NameIndex instance """
+        self.names = []
+        self.positions = {} # Name -> its position in names
+        self.lowered = []
+        self.postings = {} # Trigram -> positions of names containing it
+        for name in names:
+            self.add(name)
+
+    def add(self, name):
+        """ Index one more name (ignored if already indexed) """
+        if name in self.positions:
+            return
+        position = self.positions[name] = len(self.names)
+        self.names.append(name)
+        self.lowered.append(name.lower())
+        for trigram in trigrams(name):
+            self.postings.setdefault(trigram, set()).add(position)
+
+    def match(self, text):
+        """ Names matching text, best first: names starting with it, containing it at a word start, containing it
+            anywhere, all its words (e.g. "vit d"), then names similar enough to tolerate typos (e.g. "hemoglbin") """
+        text = " ".join(text.lower().split())
+        if not text:
+            return list(self.names)
+        words = text.split()
+        ranked = []
+        for position, name in enumerate(self.lowered):
+            found = name.find(text)
+            if found == 0:
+                rank = 0
+            elif found > 0:
+                rank = 1 if not name[found - 1].isalnum() else 2
+            elif all(word in name for word in words):
+                rank = 3
+            else:
+                continue
+            ranked.append((rank, name, position))
+        matched = {position for _, _, position in ranked}
+        if len(text) >= 3:
+            wanted = trigrams(text)
+            shared = {}
+            for trigram in wanted:
+                for position in self.postings.get(trigram, ()):
+                    shared[position] = shared.get(position, 0) + 1
+            for position, count in shared.items():
+                if position not in matched and count >= self.FUZZY_SIMILARITY * len(wanted):
+                    ranked.append((4 + 1 - count / len(wanted), self.lowered[position], position))
+        ranked.sort()
+        return [self.names[position] for _, _, position in ranked]
+
+def parse_number(text):
+    """ Number typed into a filter field (decimal comma accepted), None when empty or not a number yet """
+    text = text.strip().replace(",", ".")
+    if not re.fullmatch(r"-?\d+(\.\d*)?|-?\.\d+", text):
+        return None
+    return float(text)
@@ -1,6 +1,7 @@
 import os
 import subprocess
 import getpass
+import sys
 
 ENV_TEMPLATE_FILE = ".env.template"
 ENV_FILE = ".env"
@@ -18,22 +19,34 @@ def setup_env():
         print(".env.template file is missing. Please make sure it is included in the app package.")
         return
     
-    db_user = input("Enter your database username: ").strip()
-    db_password = input("Enter your database password: ").strip()
-    db_name = input("Enter your database name: ").strip()
+    backend = input("Choose database - postgres (server) or sqlite (single file, no server needed) [postgres]: ").strip().lower() or "postgres"
+    if backend not in ("postgres", "sqlite"):
+        print(f"Unknown database '{backend}', use postgres or sqlite.")
+        return
+    if backend == "postgres":
+        db_user = input("Enter your database username: ").strip()
+        db_password = input("Enter your database password: ").strip()
+        db_name = input("Enter your database name: ").strip()
 
     with open(ENV_TEMPLATE_FILE, "r") as template_file:
         content = template_file.read()
-    content = content.replace("DB_USER=", f"DB_USER={db_user}")
-    content = content.replace("DB_PASSWORD=", f"DB_PASSWORD={db_password}")
-    content = content.replace("DB_NAME=", f"DB_NAME={db_name}")
+    content = content.replace("DB_BACKEND=postgres", f"DB_BACKEND={backend}")
+    if backend == "postgres":
+        content = content.replace("DB_USER=", f"DB_USER={db_user}")
+        content = content.replace("DB_PASSWORD=", f"DB_PASSWORD={db_password}")
+        content = content.replace("DB_NAME=", f"DB_NAME={db_name}")
 
     with open(ENV_FILE, "w") as env_file:
         env_file.write(content)
 
     print(".env file has been created!\n")
-    setup_postgres(db_user, db_password, db_name)
+    if backend == "postgres":
+        setup_postgres(db_user, db_password, db_name)
+    else:
+        print("Using embedded SQLite database - it is created on first start of the app.\n")
     install_requirements()
+    build_assets()
+    run_migrations()
 
 def install_requirements():
     """ Install missing python libraries in virtual environment """
@@ -44,6 +57,24 @@ def install_requirements():
     else:
         print("requirements.txt not found. Please make sure it is included in the app package. Installation was skipped.")
 
+def build_assets():
+    """ Pack styles, text files, images and fonts into one Qt resource bundle (see assets.py) """
+    print("Building asset bundle")
+    assets_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets.py")
+    try:
+        subprocess.run([sys.executable, assets_script], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error building asset bundle, the app will read loose files instead: {e}")
+
+def run_migrations():
+    """ Bring database schema to the latest version (see migrations.py) """
+    print("Applying database migrations")
+    migrations_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations.py")
+    try:
+        subprocess.run([sys.executable, migrations_script], check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error applying database migrations: {e}")
+
 def install_postgres():
     """ Install PostgreSQL """
     print("Installing PostgreSQL")
@@ -103,7 +134,8 @@ def setup_postgres(db_user, db_password, db_name):
     initialize_database(db_name, db_user)
 
 def initialize_database(db_name, db_user):
-    """ Create schema, table, grant privileges """
+    """ Create schema, table, grant privileges (safe to run again on existing database).
+        The change notification trigger and later schema changes are applied by migrations run afterwards """
     print("Initializing database schema")
     
     sql_commands = f"""
@@ -114,11 +146,19 @@ def initialize_database(db_name, db_user):
     CREATE TABLE IF NOT EXISTS results_schema.results (
         id SERIAL PRIMARY KEY,
         test_name VARCHAR(255) NOT NULL,
-        result_value VARCHAR(255) NOT NULL,
+        result_value DOUBLE PRECISION NOT NULL,
         unit VARCHAR(50),
         test_date DATE NOT NULL
     );
 
+    -- Indexes for analysis queries and keyset pages (one test's history ordered by date, date ranges)
+    CREATE INDEX IF NOT EXISTS results_test_name_date_id_idx ON results_schema.results (test_name, test_date, id);
+    CREATE INDEX IF NOT EXISTS results_date_id_idx ON results_schema.results (test_date, id);
+
+    -- Make the user owner of the schema and table, so schema migrations can run with user's credentials
+    ALTER SCHEMA results_schema OWNER TO {db_user};
+    ALTER TABLE results_schema.results OWNER TO {db_user};
+
     -- Grant all privileges to the user on the schema
     GRANT ALL PRIVILEGES ON SCHEMA results_schema TO {db_user};
 
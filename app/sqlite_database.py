@@ -0,0 +1,493 @@
+import os
+import json
+import sqlite3
+import datetime
+import threading
+from contextlib import contextmanager
+from storage import (StorageBackend, batched, conversion_rows, checked_column, merge_test_pages)
+from metrics import metrics
+
+REPOSITORY_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dates are stored as ISO text and returned as datetime.date (columns declared as DATE)
+sqlite3.register_adapter(datetime.date, lambda date: date.isoformat())
+sqlite3.register_converter("DATE", lambda value: datetime.date.fromisoformat(value.decode()))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_name TEXT NOT NULL,
+    result_value REAL NOT NULL,
+    unit TEXT,
+    test_date DATE NOT NULL
+);
+-- Secondary indexes end with the rowid (id), so they also serve keyset pages ordered by (test_date, id)
+CREATE INDEX IF NOT EXISTS results_test_name_date_idx ON results (test_name, test_date);
+CREATE INDEX IF NOT EXISTS results_test_date_idx ON results (test_date);
+-- Extremes of removed rows are recomputed from the remaining rows of the affected test only
+CREATE INDEX IF NOT EXISTS results_test_name_value_idx ON results (test_name, result_value);
+-- Covers the out-of-range query - results of one test and unit are checked without reading the table
+CREATE INDEX IF NOT EXISTS results_reference_idx ON results (test_name, unit, result_value, test_date);
+
+CREATE TABLE IF NOT EXISTS test_statistics (
+    test_name TEXT PRIMARY KEY,
+    result_count INTEGER NOT NULL,
+    value_sum REAL NOT NULL,
+    value_sum_sq REAL NOT NULL,
+    min_value REAL NOT NULL,
+    max_value REAL NOT NULL,
+    first_date DATE NOT NULL,
+    last_date DATE NOT NULL,
+    data_version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO data_version (id, value) VALUES (1, 0);
+
+-- Value in unit multiplied by factor gives value in the test's canonical unit (filled from unit_conversions.txt)
+CREATE TABLE IF NOT EXISTS unit_conversions (
+    test_name TEXT NOT NULL,
+    unit TEXT NOT NULL,
+    canonical_unit TEXT NOT NULL,
+    factor REAL NOT NULL,
+    PRIMARY KEY (test_name, unit)
+);
+CREATE VIEW IF NOT EXISTS canonical_results AS
+SELECT r.id AS id, r.test_name AS test_name, r.result_value * COALESCE(c.factor, 1) AS result_value,
+       COALESCE(c.canonical_unit, r.unit) AS unit, r.test_date AS test_date
+FROM results AS r LEFT JOIN unit_conversions AS c ON c.test_name = r.test_name AND c.unit = r.unit;
+
+-- Summary of a test is adjusted in place by inserted and removed values (as the PostgreSQL triggers in migrations.py do).
+-- Extremes are looked up again only when a removed row held one of them - each is one (test_name, ...) index probe.
+-- Triggers are replaced in one transaction, so databases created by older versions get the current ones
+BEGIN IMMEDIATE;
+DROP TRIGGER IF EXISTS test_statistics_insert;
+DROP TRIGGER IF EXISTS test_statistics_delete;
+DROP TRIGGER IF EXISTS test_statistics_update;
+CREATE TRIGGER test_statistics_insert AFTER INSERT ON results FOR EACH ROW BEGIN
+    UPDATE data_version SET value = value + 1;
+    INSERT INTO test_statistics
+    VALUES (NEW.test_name, 1, NEW.result_value, NEW.result_value * NEW.result_value, NEW.result_value, NEW.result_value,
+            NEW.test_date, NEW.test_date, (SELECT value FROM data_version))
+    ON CONFLICT (test_name) DO UPDATE SET
+        result_count = result_count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_sum_sq = value_sum_sq + excluded.value_sum_sq,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        first_date = MIN(first_date, excluded.first_date),
+        last_date = MAX(last_date, excluded.last_date),
+        data_version = excluded.data_version;
+END;
+CREATE TRIGGER test_statistics_delete AFTER DELETE ON results FOR EACH ROW BEGIN
+    UPDATE data_version SET value = value + 1;
+    UPDATE test_statistics SET
+        result_count = result_count - 1,
+        value_sum = value_sum - OLD.result_value,
+        value_sum_sq = value_sum_sq - OLD.result_value * OLD.result_value,
+        data_version = (SELECT value FROM data_version)
+    WHERE test_name = OLD.test_name;
+    DELETE FROM test_statistics WHERE test_name = OLD.test_name AND result_count <= 0;
+    UPDATE test_statistics SET
+        min_value = (SELECT MIN(result_value) FROM results WHERE test_name = OLD.test_name),
+        max_value = (SELECT MAX(result_value) FROM results WHERE test_name = OLD.test_name),
+        first_date = (SELECT MIN(test_date) FROM results WHERE test_name = OLD.test_name),
+        last_date = (SELECT MAX(test_date) FROM results WHERE test_name = OLD.test_name)
+    WHERE test_name = OLD.test_name
+      AND (OLD.result_value <= min_value OR OLD.result_value >= max_value OR OLD.test_date <= first_date OR OLD.test_date >= last_date);
+END;
+-- Update = removal of the old row, then insertion of the new one (extremes are looked up after the row changed)
+CREATE TRIGGER test_statistics_update AFTER UPDATE ON results FOR EACH ROW BEGIN
+    UPDATE data_version SET value = value + 1;
+    UPDATE test_statistics SET
+        result_count = result_count - 1,
+        value_sum = value_sum - OLD.result_value,
+        value_sum_sq = value_sum_sq - OLD.result_value * OLD.result_value,
+        data_version = (SELECT value FROM data_version)
+    WHERE test_name = OLD.test_name;
+    DELETE FROM test_statistics WHERE test_name = OLD.test_name AND result_count <= 0;
+    UPDATE test_statistics SET
+        min_value = (SELECT MIN(result_value) FROM results WHERE test_name = OLD.test_name),
+        max_value = (SELECT MAX(result_value) FROM results WHERE test_name = OLD.test_name),
+        first_date = (SELECT MIN(test_date) FROM results WHERE test_name = OLD.test_name),
+        last_date = (SELECT MAX(test_date) FROM results WHERE test_name = OLD.test_name)
+    WHERE test_name = OLD.test_name
+      AND (OLD.result_value <= min_value OR OLD.result_value >= max_value OR OLD.test_date <= first_date OR OLD.test_date >= last_date);
+    INSERT INTO test_statistics
+    VALUES (NEW.test_name, 1, NEW.result_value, NEW.result_value * NEW.result_value, NEW.result_value, NEW.result_value,
+            NEW.test_date, NEW.test_date, (SELECT value FROM data_version))
+    ON CONFLICT (test_name) DO UPDATE SET
+        result_count = result_count + 1,
+        value_sum = value_sum + excluded.value_sum,
+        value_sum_sq = value_sum_sq + excluded.value_sum_sq,
+        min_value = MIN(min_value, excluded.min_value),
+        max_value = MAX(max_value, excluded.max_value),
+        first_date = MIN(first_date, excluded.first_date),
+        last_date = MAX(last_date, excluded.last_date),
+        data_version = excluded.data_version;
+END;
+COMMIT;
+"""
+
+class TimedCursor(sqlite3.Cursor):
+    """ Cursor recording execute and fetch time of the running storage call when metrics are enabled (see metrics.py) """
+    def execute(self, sql, parameters=()):
+        """ Execute one statement """
+        if not metrics.enabled:
+            return super().execute(sql, parameters)
+        return metrics.phase("execute", super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        """ Execute statement for every set of parameters """
+        if not metrics.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return metrics.phase("execute", super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        """ Fetch next row """
+        if not metrics.enabled:
+            return super().fetchone()
+        return metrics.phase("fetch", super().fetchone)
+
+    def fetchmany(self, size=None):
+        """ Fetch next rows (cursor's arraysize by default) """
+        size = self.arraysize if size is None else size
+        if not metrics.enabled:
+            return super().fetchmany(size)
+        return metrics.phase("fetch", super().fetchmany, size, rows=True)
+
+    def fetchall(self):
+        """ Fetch remaining rows """
+        if not metrics.enabled:
+            return super().fetchall()
+        return metrics.phase("fetch", super().fetchall, rows=True)
+
+class SQLiteManager(StorageBackend):
+    """ Keeps blood test results in an embedded SQLite file - no server needed (single user installs, CI).
+        Every thread gets its own connection, the database runs in WAL mode, so reads do not wait for writes """
+    backend = "sqlite"
+    shared = False # Only this app writes into the file - own changes are applied right after they are made
+
+    def __init__(self, path=None):
+        """ Initialize SQLiteManager instance based on .env file content (DB_PATH, relative to the repository) """
+        path = path or os.getenv("DB_PATH") or "tracker.sqlite3"
+        self.path = os.path.join(REPOSITORY_DIR, path)
+        self.pool_max = int(os.getenv("DB_POOL_MAX", "4")) # Worker threads, each with its own connection
+        self.busy_timeout = int(float(os.getenv("DB_BUSY_TIMEOUT", "10")) * 1000) # Milliseconds to wait for another writer
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.schema_ready = False
+
+    def connection(self):
+        """ Connection of the calling thread (opened on first use, schema is created by the first one) """
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = metrics.phase("connect", self.open_connection) if metrics.enabled else self.open_connection()
+        return conn
+
+    def open_connection(self):
+        """ Open connection for the calling thread """
+        # Statements are prepared once per connection and reused from the driver's cache (keyed by SQL text)
+        conn = sqlite3.connect(
+            self.path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None, check_same_thread=False,
+            cached_statements=256)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout};")
+        conn.execute("PRAGMA journal_mode = WAL;") # Readers and the writer do not block each other
+        conn.execute("PRAGMA synchronous = NORMAL;") # Durable at checkpoints, safe against corruption in WAL mode
+        conn.execute("PRAGMA analysis_limit = 1000;") # ANALYZE samples indexes - milliseconds even for millions of rows
+        with self.lock:
+            if not self.schema_ready:
+                conn.executescript(SCHEMA)
+                # Without statistics the planner may pick (test_name, result_value) index and sort all rows of a test
+                # for one filtered page - refreshed once per session and after bulk loads
+                conn.execute("ANALYZE;")
+                self.schema_ready = True
+            self.connections.append(conn)
+        self.local.conn = conn
+        return conn
+
+    @contextmanager
+    def cursor(self, write=False):
+        """ Context manager running a transaction on the thread's connection. Write transactions take the write lock
+            up front (waiting for other writers up to busy timeout). Commits on success, rolls back on error """
+        conn = self.connection()
+        cur = conn.cursor(TimedCursor)
+        cur.execute("BEGIN IMMEDIATE;" if write else "BEGIN;")
+        try:
+            yield cur
+            cur.execute("COMMIT;")
+        except BaseException:
+            cur.execute("ROLLBACK;") # Also when a streaming generator is closed before it was exhausted
+            raise
+        finally:
+            cur.close()
+
+    def listen_changes(self):
+        """ Embedded database is used only by this app - there are no changes of other clients to listen for """
+        return None
+
+    def close(self):
+        """ Close connections of all threads (when the app is being closed) """
+        with self.lock:
+            for conn in self.connections:
+                conn.execute("PRAGMA optimize;")
+                conn.close()
+            self.connections = []
+        self.local = threading.local()
+
+    def insert(self, test_name, result_value, unit, result_date):
+        """ Insert data into the results table in the database """
+        with self.cursor(write=True) as cur:
+            cur.execute(
+                "INSERT INTO results (test_name, result_value, unit, test_date) VALUES (?, ?, ?, ?);",
+                (test_name, result_value, unit, result_date))
+
+    def insert_many(self, rows, page_size=1000, bulk=False):
+        """ Insert (test_name, result_value, unit, test_date) rows in one transaction.
+            Return IDs of inserted rows (or only their number for bulk loads) """
+        sql = "INSERT INTO results (test_name, result_value, unit, test_date) VALUES (?, ?, ?, ?)"
+        count = 0
+        ids = []
+        with self.cursor(write=True) as cur:
+            for batch in batched(rows, page_size):
+                if bulk:
+                    cur.executemany(sql, batch)
+                    count += len(batch)
+                else:
+                    for row in batch:
+                        ids.append(cur.execute(sql + " RETURNING id;", row).fetchone()[0])
+            if bulk:
+                cur.execute("ANALYZE;") # Statistics of the grown table
+        return count if bulk else ids
+
+    def delete(self, result_id):
+        """ Delete data from the results table by ID, return True if the row existed """
+        with self.cursor(write=True) as cur:
+            cur.execute("DELETE FROM results WHERE id = ?;", (result_id,))
+            return cur.rowcount > 0
+
+    def update(self, result_id, test_name, result_value, unit, result_date):
+        """ Update data in the results table """
+        with self.cursor(write=True) as cur:
+            cur.execute(
+                "UPDATE results SET test_name = ?, result_value = ?, unit = ?, test_date = ? WHERE id = ?;",
+                (test_name, result_value, unit, result_date, result_id))
+
+    def select_page(self, after_id, limit):
+        """ Select next page of results (ordered by ID), starting after given ID """
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT id, test_name, result_value, unit, test_date FROM results WHERE id > ? ORDER BY id LIMIT ?;",
+                (after_id, limit))
+            return cur.fetchall()
+
+    def select_by_ids(self, result_ids):
+        """ Select rows with given IDs (the list is passed as one JSON parameter, not one placeholder per ID) """
+        with self.cursor() as cur:
+            cur.execute(
+                "SELECT id, test_name, result_value, unit, test_date FROM results "
+                "WHERE id IN (SELECT value FROM json_each(?)) ORDER BY id;", (json.dumps(list(result_ids)),))
+            return cur.fetchall()
+
+    def results_filter(self, test_name=None, date_from=None, date_to=None, unit=None, value_min=None, value_max=None, after=None,
+                       test_names=None, by_date=False, by_name=False):
+        """ Build WHERE clause and its parameters for optional filters (see FILTERS in storage.py)
+            and keyset position after (test_date, id). by_date keeps the planner on (test_date) index for test_names,
+            by_name on covering (test_name, unit, result_value, test_date) index when test names are filtered """
+        conditions, params = [], []
+        # Unary + disables the index of a column - values cluster around reference ranges, so a value bound
+        # rarely narrows much and reading table rows found by (test_name, result_value) is slower than a covering scan
+        unindexed = "+" if by_name and (test_name or test_names is not None) else ""
+        if test_name:
+            conditions.append("test_name = ?")
+            params.append(test_name)
+        if test_names is not None and len(test_names) == 1:
+            conditions.append("test_name = ?") # Keeps (test_name, test_date) index order for pages
+            params.append(test_names[0])
+        elif test_names is not None:
+            conditions.append(f"{'+' if by_date else ''}test_name IN (SELECT value FROM json_each(?))") # Unary + disables the index
+            params.append(json.dumps(test_names))
+        if unit:
+            conditions.append("unit = ?")
+            params.append(unit)
+        if date_from:
+            conditions.append(f"{unindexed}test_date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append(f"{unindexed}test_date <= ?")
+            params.append(date_to)
+        if value_min is not None:
+            conditions.append(f"{unindexed}result_value >= ?")
+            params.append(value_min)
+        if value_max is not None:
+            conditions.append(f"{unindexed}result_value <= ?")
+            params.append(value_max)
+        if after is not None:
+            conditions.append("(test_date, id) > (?, ?)") # Row value - a range scan of indexes ending with test_date (+ rowid)
+            params.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def iter_results(self, test_name=None, date_from=None, date_to=None, itersize=10000, canonical=False):
+        """ Stream (id, test_name, result_value, unit, test_date) rows, fetching itersize rows at a time """
+        where, params = self.results_filter(test_name, date_from, date_to)
+        source = "canonical_results" if canonical else "results"
+        with self.cursor() as cur:
+            cur.execute(f"SELECT id, test_name, result_value, unit, test_date FROM {source} {where} ORDER BY id;", params)
+            while True:
+                rows = cur.fetchmany(itersize)
+                if not rows:
+                    break
+                yield from rows
+
+    def select_results(self, filters=None, after=None, limit=500, canonical=False):
+        """ Select next page of filtered results ordered by (test_date, id) - indexes on (test_date) and
+            (test_name, test_date) end with the rowid, so every page is an index range scan """
+        source = "canonical_results" if canonical else "results"
+        test_names = (filters or {}).get("test_names")
+        with self.cursor() as cur:
+            if test_names and len(test_names) > 1 and not filters.get("test_name") and merge_test_pages(test_names, *self.count_tests(cur, test_names)):
+                # Page of every (rare) test is read in index order and the pages are merged - their rows are never sorted
+                parts, params = [], []
+                for test_name in test_names:
+                    where, name_params = self.results_filter(after=after, **dict(filters, test_names=None, test_name=test_name))
+                    parts.append(f"SELECT * FROM (SELECT id, test_name, result_value, unit, test_date FROM {source} {where} ORDER BY test_date, id LIMIT ?)")
+                    params += name_params + [limit]
+                sql = " UNION ALL ".join(parts)
+            else:
+                where, params = self.results_filter(after=after, by_date=True, **(filters or {}))
+                sql = f"SELECT id, test_name, result_value, unit, test_date FROM {source} {where}"
+            cur.execute(f"{sql} ORDER BY test_date, id LIMIT ?;", params + [limit])
+            return cur.fetchall()
+
+    def count_tests(self, cur, test_names):
+        """ Number of results of test_names and of all tests: (matching, total) """
+        cur.execute("""
+            SELECT COALESCE(SUM(CASE WHEN test_name IN (SELECT value FROM json_each(?)) THEN result_count END), 0),
+                COALESCE(SUM(result_count), 0)
+            FROM test_statistics;
+            """, (json.dumps(test_names),))
+        return cur.fetchone()
+
+    def count_results(self, filters=None, canonical=False):
+        """ Number of filtered results - read from test_statistics when only test names are filtered,
+            counted with a covering index scan otherwise """
+        filters = {key: value for key, value in (filters or {}).items() if value is not None and value != ""}
+        where, params = self.results_filter(**filters, by_name=True)
+        with self.cursor() as cur:
+            if set(filters) <= {"test_name", "test_names"}:
+                cur.execute(f"SELECT COALESCE(SUM(result_count), 0) FROM test_statistics {where};", params)
+            else:
+                source = "canonical_results" if canonical else "results"
+                cur.execute(f"SELECT COUNT(*) FROM {source} {where};", params)
+            return cur.fetchone()[0]
+
+    def select_chosen_all(self, test_name):
+        """ Select all avaiable data for one specified test_name of results table """
+        with self.cursor() as cur:
+            cur.execute("SELECT result_value, unit, test_date FROM results WHERE test_name = ? ORDER BY test_date;", (test_name,))
+            return cur.fetchall()
+
+    def select_statistics(self, test_name):
+        """ Select summary of one test: (count, sum, sum of squares, min, max, first date, last date, data version) or None """
+        with self.cursor() as cur:
+            cur.execute("""
+            SELECT result_count, value_sum, value_sum_sq, min_value, max_value, first_date, last_date, data_version
+            FROM test_statistics WHERE test_name = ?;
+            """, (test_name,))
+            return cur.fetchone()
+
+    def select_test_history(self, test_name):
+        """ Select all results of one test together with its summary (in one read transaction) """
+        with self.cursor() as cur:
+            cur.execute("SELECT result_value, unit, test_date FROM results WHERE test_name = ? ORDER BY test_date;", (test_name,))
+            results = cur.fetchall()
+            cur.execute("""
+            SELECT result_count, value_sum, value_sum_sq, min_value, max_value, first_date, last_date, data_version
+            FROM test_statistics WHERE test_name = ?;
+            """, (test_name,))
+            statistics = cur.fetchone()
+        return results, statistics
+
+    def select_many(self, test_names, date_from=None, date_to=None, canonical=False):
+        """ Select histories of several tests in one query: rows (test_name, result_value, unit, test_date)
+            ordered by test and date, plus {test_name: data_version} """
+        where, params = self.results_filter(date_from=date_from, date_to=date_to)
+        names = json.dumps(list(test_names))
+        condition = "test_name IN (SELECT value FROM json_each(?))"
+        where = f"{where} AND {condition}" if where else f"WHERE {condition}"
+        source = "canonical_results" if canonical else "results"
+        with self.cursor() as cur:
+            cur.execute(f"SELECT test_name, result_value, unit, test_date FROM {source} {where} ORDER BY test_name, test_date;", params + [names])
+            results = cur.fetchall()
+            cur.execute(f"SELECT test_name, data_version FROM test_statistics WHERE {condition};", (names,))
+            versions = dict(cur.fetchall())
+        return results, versions
+
+    def select_data_versions(self):
+        """ Data version of every test with results: {test_name: data_version} """
+        with self.cursor() as cur:
+            cur.execute("SELECT test_name, data_version FROM test_statistics;")
+            return dict(cur.fetchall())
+
+    def store_unit_conversions(self, conversions):
+        """ Replace stored unit conversions of the given tests (read by canonical_results view) """
+        with self.cursor(write=True) as cur:
+            cur.execute("DELETE FROM unit_conversions WHERE test_name IN (SELECT value FROM json_each(?));", (json.dumps(list(conversions)),))
+            cur.executemany("INSERT INTO unit_conversions VALUES (?, ?, ?, ?);", conversion_rows(conversions))
+
+    def select_latest_units(self, test_names):
+        """ Unit of the most recent result of each test: {test_name: unit} (tests without results are left out) """
+        with self.cursor() as cur:
+            # Latest row of each test by (test_date, id) like PostgreSQL's DISTINCT ON - one descending probe
+            # of (test_name, test_date) index per test (rowid breaks ties of results from the same day)
+            cur.execute("""
+            SELECT r.test_name, r.unit FROM json_each(?) AS n
+            JOIN results AS r ON r.id = (
+                SELECT id FROM results WHERE test_name = n.value ORDER BY test_date DESC, id DESC LIMIT 1);
+            """, (json.dumps(list(test_names)),))
+            return dict(cur.fetchall())
+
+    def select_out_of_range(self, bounds, after=None, limit=1000):
+        """ Next page of results outside their reference range - bounds are passed as JSON,
+            each bound is looked up through the (test_name, result_value) index """
+        bounds = json.dumps([
+            [test_name, unit, low, high, date_from and date_from.isoformat(), date_to and date_to.isoformat()]
+            for test_name, unit, low, high, date_from, date_to in bounds])
+        keyset = "AND (r.test_date, r.id) > (?, ?)" if after is not None else ""
+        with self.cursor() as cur:
+            cur.execute(f"""
+            WITH b AS MATERIALIZED (
+                SELECT json_extract(value, '$[0]') AS test_name, json_extract(value, '$[1]') AS unit,
+                       json_extract(value, '$[2]') AS low, json_extract(value, '$[3]') AS high,
+                       json_extract(value, '$[4]') AS date_from, json_extract(value, '$[5]') AS date_to
+                FROM json_each(?)
+            )
+            SELECT r.id, r.test_name, r.result_value, r.unit, r.test_date
+            FROM b JOIN results AS r ON r.test_name = b.test_name AND r.unit = b.unit
+            WHERE (r.result_value < b.low OR r.result_value > b.high) {keyset}
+              AND (b.date_from IS NULL OR r.test_date >= b.date_from) AND (b.date_to IS NULL OR r.test_date < b.date_to)
+            GROUP BY r.id ORDER BY r.test_date, r.id LIMIT ?;
+            """, [bounds] + list(after or []) + [limit])
+            return cur.fetchall()
+
+    def select_result_days(self, year, month):
+        """ Count results per day of one month in a single aggregate query: {day of month: number of results} """
+        first_day = datetime.date(year, month, 1)
+        next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+        with self.cursor() as cur:
+            cur.execute("""
+            SELECT CAST(strftime('%d', test_date) AS INTEGER), COUNT(*) FROM results
+            WHERE test_date >= ? AND test_date < ? GROUP BY 1;
+            """, (first_day, next_month))
+            return dict(cur.fetchall())
+
+    def select_chosen_column(self, column_name):
+        """ Select only values from specified column of results table (only known columns, see checked_column) """
+        column_name = checked_column(column_name)
+        with self.cursor() as cur:
+            cur.execute(f"SELECT {column_name} FROM results")
+            return sorted(set(row[0] for row in cur))
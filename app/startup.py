@@ -0,0 +1,56 @@
+import sys
+import time
+from PyQt6.QtCore import (QObject, QEvent)
+
+class StartupProfiler():
+    """ Records how long each startup phase took. Disabled by default - marks then cost one attribute check """
+    def __init__(self):
+        """ Initialize StartupProfiler instance (the clock starts when this module is imported) """
+        self.enabled = False
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = [] # (phase, milliseconds since previous phase, milliseconds since start)
+        self.file = sys.stderr
+
+    def enable(self, file=sys.stderr):
+        """ Start recording and printing phases """
+        self.enabled = True
+        self.file = file
+
+    def mark(self, phase):
+        """ Close a startup phase (each phase is recorded only once, repeated marks are ignored) """
+        if not self.enabled or any(name == phase for name, _, _ in self.phases):
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self.last) * 1000, (now - self.started) * 1000))
+        self.last = now
+        print(f"startup: {phase:<24} {self.phases[-1][1]:8.1f} ms  (total {self.phases[-1][2]:8.1f} ms)", file=self.file)
+
+    def elapsed(self, phase):
+        """ Milliseconds from start until the phase ended (None if it was not reached yet) """
+        for name, _, total in self.phases:
+            if name == phase:
+                return total
+        return None
+
+    def as_dict(self):
+        """ Recorded phases as {phase: {"ms": duration, "total_ms": since start}} """
+        return {name: {"ms": round(duration, 3), "total_ms": round(total, 3)} for name, duration, total in self.phases}
+
+profiler = StartupProfiler() # Shared by all modules of the app
+
+class FirstPaintWatcher(QObject):
+    """ Event filter calling callback once, right after the watched widget was painted for the first time """
+    def __init__(self, widget, callback):
+        """ Initialize FirstPaintWatcher instance and start watching widget """
+        super().__init__(widget)
+        self.widget = widget
+        self.callback = callback
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+        """ Wait for the first paint event, then stop watching """
+        if watched is self.widget and event.type() == QEvent.Type.Paint:
+            self.widget.removeEventFilter(self)
+            self.callback()
+        return False # Painting itself goes on as usual
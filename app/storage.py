@@ -0,0 +1,231 @@
+import os
+import csv
+from dotenv import load_dotenv
+from metrics import instrument
+
+load_dotenv()
+
+BACKENDS = ("postgres", "sqlite")
+COLUMNS = ("id", "test_name", "result_value", "unit", "test_date")
+FILTERS = ("test_name", "test_names", "unit", "date_from", "date_to", "value_min", "value_max") # Keys of filters dicts, all optional
+
+def batched(rows, size):
+    """ Split iterator of rows into lists of given size """
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def conversion_rows(conversions):
+    """ Flatten {test_name: (canonical unit, {unit: factor})} into (test_name, unit, canonical unit, factor) rows """
+    return [(test_name, unit, canonical_unit, factor)
+            for test_name, (canonical_unit, factors) in conversions.items() for unit, factor in factors.items()]
+
+def checked_column(column_name):
+    """ Return column name if it is a column of results table - names are put into SQL text, so nothing else may pass """
+    if column_name not in COLUMNS:
+        raise ValueError(f"Unknown column '{column_name}' (use one of: {', '.join(COLUMNS)})")
+    return column_name
+
+def row_matches(filters, row):
+    """ Check if (id, test_name, result_value, unit, test_date) row passes filters the same way as select_results
+        (used for rows arriving in change notifications) """
+    if not filters:
+        return True
+    _, test_name, result_value, unit, test_date = row
+    return ((not filters.get("test_name") or test_name == filters["test_name"])
+            and (filters.get("test_names") is None or test_name in filters["test_names"])
+            and (not filters.get("unit") or unit == filters["unit"])
+            and (not filters.get("date_from") or test_date >= filters["date_from"])
+            and (not filters.get("date_to") or test_date <= filters["date_to"])
+            and (filters.get("value_min") is None or result_value >= filters["value_min"])
+            and (filters.get("value_max") is None or result_value <= filters["value_max"]))
+
+def filters_narrow(filters, narrower):
+    """ Check if every row passing narrower filters passes filters as well (rows loaded for filters
+        can then be filtered in memory instead of fetched again) """
+    for key, value in filters.items():
+        new_value = narrower.get(key)
+        if new_value is None:
+            return False
+        if key in ("date_from", "value_min") and new_value < value:
+            return False
+        if key in ("date_to", "value_max") and new_value > value:
+            return False
+        if key in ("test_name", "unit") and new_value != value:
+            return False
+        if key == "test_names" and not set(new_value) <= set(value):
+            return False
+    return True
+
+def merge_test_pages(test_names, matching, total):
+    """ Check if a page filtered by test_names is read faster by merging a page of every test read in (test_name, test_date)
+        index order than by scanning (test_date) index and skipping other tests. Merging reads len(test_names) pages,
+        the scan reads total / matching rows per returned row (matching = results of test_names, from test_statistics) """
+    return matching * len(test_names) * 2 < total
+
+def result_key(row):
+    """ Keyset position of (id, test_name, result_value, unit, test_date) row: (test_date, id) """
+    return (row[4], row[0])
+
+class StorageBackend():
+    """ Storage of blood test results as used by the app, importer, exporter and dashboard. Implemented by
+        DatabaseManager (PostgreSQL server, database.py) and SQLiteManager (embedded SQLite file, sqlite_database.py).
+        Rows are (id, test_name, result_value, unit, test_date) with float values and datetime.date dates.
+        Queries taking canonical=True read values converted to each test's canonical unit (canonical_results view).
+        filters are dicts with any of FILTERS keys (missing or None = not filtered, date and value ranges are inclusive,
+        test_names is a list of accepted test names - an empty one matches nothing).
+        Methods raise on errors and are safe to call from worker threads - reporting is left to the caller """
+    backend = None # Name used for DB_BACKEND in .env
+    pool_max = 1 # How many calls may run at the same time
+    shared = True # Other clients may write into the storage - their changes are listened for (or polled)
+
+    def __init_subclass__(cls, **kwargs):
+        """ Record calls of the storage methods implemented by backends when metrics are enabled (see metrics.py) """
+        super().__init_subclass__(**kwargs)
+        instrument(cls, STORAGE_CALLS)
+
+    def listen_changes(self):
+        """ Start listening for changes made by other clients - return object with fileno(), poll() and close(),
+            or None if changes cannot be listened for (they are polled in shared storage) """
+        raise NotImplementedError
+
+    def close(self):
+        """ Close all connections (when the app is being closed) """
+        raise NotImplementedError
+
+    def insert(self, test_name, result_value, unit, result_date):
+        """ Insert one result """
+        raise NotImplementedError
+
+    def insert_many(self, rows, page_size=1000, bulk=False):
+        """ Insert (test_name, result_value, unit, test_date) rows in one transaction.
+            Return IDs of inserted rows (or only their number for bulk loads) """
+        raise NotImplementedError
+
+    def copy_results(self, rows):
+        """ Load (test_name, result_value, unit, test_date) rows as fast as the backend can, return their number """
+        return self.insert_many(rows, page_size=5000, bulk=True)
+
+    def delete(self, result_id):
+        """ Delete result by ID, return True if the row existed """
+        raise NotImplementedError
+
+    def update(self, result_id, test_name, result_value, unit, result_date):
+        """ Update one result """
+        raise NotImplementedError
+
+    def select_all(self):
+        """ Select all results (ordered by ID) """
+        return list(self.iter_results())
+
+    def select_page(self, after_id, limit):
+        """ Select next page of results (ordered by ID), starting after given ID """
+        raise NotImplementedError
+
+    def select_by_ids(self, result_ids):
+        """ Select rows with given IDs (ordered by ID) """
+        raise NotImplementedError
+
+    def select_results(self, filters=None, after=None, limit=500, canonical=False):
+        """ Select next page of filtered results ordered by (test_date, id), starting after given (test_date, id) key
+            (first page for None). Every page is one indexed range scan - its cost does not depend on how deep it is """
+        raise NotImplementedError
+
+    def count_results(self, filters=None, canonical=False):
+        """ Number of filtered results (read from per-test statistics when only test name is filtered) """
+        raise NotImplementedError
+
+    def iter_pages(self, filters=None, page_size=10000, canonical=False):
+        """ Stream filtered rows ordered by (test_date, id), one select_results page per round trip.
+            No transaction or cursor is held open between pages, rows changed meanwhile are seen as of their page """
+        after = None
+        while True:
+            rows = self.select_results(filters, after, page_size, canonical)
+            yield from rows
+            if len(rows) < page_size:
+                break
+            after = result_key(rows[-1])
+
+    def iter_results(self, test_name=None, date_from=None, date_to=None, itersize=10000, canonical=False):
+        """ Stream filtered rows (ordered by ID), itersize rows are held in memory at a time """
+        raise NotImplementedError
+
+    def copy_results_out(self, file, filters=None, canonical=False):
+        """ Write filtered results ordered by (test_date, id) as CSV (with header) to file """
+        writer = csv.writer(file, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for row in self.iter_pages(filters, canonical=canonical):
+            writer.writerow(row[:4] + (row[4].isoformat(),))
+
+    def select_chosen_all(self, test_name):
+        """ Select (result_value, unit, test_date) of one test ordered by date """
+        raise NotImplementedError
+
+    def select_statistics(self, test_name):
+        """ Select summary of one test: (count, sum, sum of squares, min, max, first date, last date, data version) or None """
+        raise NotImplementedError
+
+    def select_test_history(self, test_name):
+        """ Select all results of one test together with its summary (consistent with each other) """
+        raise NotImplementedError
+
+    def select_many(self, test_names, date_from=None, date_to=None, canonical=False):
+        """ Select histories of several tests at once: rows (test_name, result_value, unit, test_date)
+            ordered by test and date, plus {test_name: data_version} """
+        raise NotImplementedError
+
+    def select_data_versions(self):
+        """ Data version of every test with results: {test_name: data_version} - a test whose version changed
+            (or which appeared or disappeared) was written since the previous call """
+        raise NotImplementedError
+
+    def store_unit_conversions(self, conversions):
+        """ Replace stored unit conversions of the given tests: {test_name: (canonical unit, {unit: factor})},
+            a test mapped to (None, {}) loses its conversions """
+        raise NotImplementedError
+
+    def select_latest_units(self, test_names):
+        """ Unit of the most recent result of each test: {test_name: unit} (tests without results are left out) """
+        raise NotImplementedError
+
+    def select_out_of_range(self, bounds, after=None, limit=1000):
+        """ Next page of results outside their reference range, ordered by (test_date, id) and starting after given
+            (test_date, id) key like select_results. bounds are
+            (test_name, unit, low, high, date from, date to) rows - None for open sides and unlimited dates """
+        raise NotImplementedError
+
+    def select_result_days(self, year, month):
+        """ Count results per day of one month: {day of month: number of results} """
+        raise NotImplementedError
+
+    def select_chosen_column(self, column_name):
+        """ Sorted distinct values of one column of results table (ValueError for other names than COLUMNS) """
+        raise NotImplementedError
+
+STORAGE_CALLS = tuple(name for name, value in vars(StorageBackend).items() if callable(value) and not name.startswith("_"))
+instrument(StorageBackend, STORAGE_CALLS) # Methods implemented once for all backends (iter_pages, copy_results_out...)
+
+def open_storage(backend=None):
+    """ Create storage backend selected by DB_BACKEND in .env (PostgreSQL by default) """
+    backend = (backend or os.getenv("DB_BACKEND") or "postgres").strip().lower()
+    if backend == "postgres":
+        from database import DatabaseManager # psycopg2 is needed only for this backend
+        return DatabaseManager()
+    if backend == "sqlite":
+        from sqlite_database import SQLiteManager
+        return SQLiteManager()
+    raise ValueError(f"Unknown DB_BACKEND '{backend}' (use one of: {', '.join(BACKENDS)})")
+
+_shared_manager = None
+
+def get_database_manager():
+    """ Return the storage backend shared by the whole app session (created on first call) """
+    global _shared_manager
+    if _shared_manager is None:
+        _shared_manager = open_storage()
+    return _shared_manager
@@ -0,0 +1,91 @@
+import random
+import datetime
+from catalog import (load_test_names, load_unit_names, load_panels, load_unit_conversions, load_reference_ranges)
+
+START_DATE = datetime.date(1990, 1, 1)
+END_DATE = datetime.date(2025, 12, 31)
+OTHER_UNIT_SHARE = 0.05 # Results of convertible tests entered in another unit (as when a lab changes its reporting)
+SINGLE_TEST_SHARE = 0.15 # Visits ordering one test outside of any panel
+PATIENT_SEED = 2024 # Profiles of tests do not depend on the seed of a history - all histories belong to the same patient
+
+class TestProfile():
+    """ How results of one test look: unit, typical value and spread (from its reference range), other units it is entered in """
+    def __init__(self, test_name, unit, low, high, conversions, rng):
+        """ Initialize TestProfile instance - values are drawn around the reference range, or around an arbitrary
+            level when the test has none. Every test gets a personal offset, so the patient is not perfectly average """
+        self.test_name = test_name
+        self.unit = unit
+        if low is not None and high is not None:
+            self.mean, self.spread = (low + high) / 2, (high - low) / 4 # About 5% of results fall outside the range
+        elif high is not None:
+            self.mean, self.spread = high * 0.6, high * 0.2
+        elif low is not None:
+            self.mean, self.spread = low * 1.5, low * 0.25
+        else:
+            self.mean = rng.choice((1.0, 5.0, 10.0, 50.0, 100.0))
+            self.spread = self.mean * 0.15
+        self.mean += rng.gauss(0, self.spread / 2)
+        self.other_units = []
+        _, factors = conversions.get(test_name, (None, {}))
+        if unit in factors:
+            # Value in another unit = value in canonical unit / its factor
+            self.other_units = [(other, factors[unit] / factor) for other, factor in factors.items() if other != unit]
+
+    def draw(self, rng):
+        """ One (value, unit) result """
+        value = max(rng.gauss(self.mean, self.spread), 0.0)
+        if self.other_units and rng.random() < OTHER_UNIT_SHARE:
+            unit, factor = rng.choice(self.other_units)
+            return round(value * factor, 3), unit
+        return round(value, 2), self.unit
+
+def test_profiles():
+    """ Profiles of all tests which can be entered: {test name: TestProfile}. Units come from reference ranges,
+        then from unit conversions (canonical unit), any known unit is picked for the rest """
+    rng = random.Random(PATIENT_SEED)
+    ranges = load_reference_ranges()
+    conversions = load_unit_conversions()
+    unit_names = load_unit_names()
+    profiles = {}
+    for test_name in load_test_names():
+        if ranges.get(test_name):
+            unit, low, high = ranges[test_name][0][:3]
+        elif test_name in conversions:
+            unit, low, high = conversions[test_name][0], None, None
+        else:
+            unit, low, high = rng.choice(unit_names), None, None
+        profiles[test_name] = TestProfile(test_name, unit, low, high, conversions, rng)
+    return profiles
+
+def synthetic_results(rows, seed=0, start=START_DATE, end=END_DATE):
+    """ Yield rows (test_name, result_value, unit, test_date) of a made-up lab history: visits spread evenly between
+        start and end, each ordering a whole panel (complete blood count most often) or a single test. The same seed
+        gives the same history, so runs on different commits load identical data; histories of different seeds
+        can be loaded together """
+    rng = random.Random(seed)
+    profiles = test_profiles()
+    panels = [[test_name for test_name in tests if test_name in profiles] for tests in load_panels().values()]
+    panels = [tests for tests in panels if tests]
+    weights = [len(panels)] + [1] * (len(panels) - 1) # The first panel (CBC) is ordered as often as all others together
+    singles = list(profiles)
+    panel_size = sum(weight * len(tests) for weight, tests in zip(weights, panels)) / sum(weights)
+    visit_size = (1 - SINGLE_TEST_SHARE) * panel_size + SINGLE_TEST_SHARE # Expected number of results per visit
+    visits = max(1, int(rows / visit_size))
+    days = (end - start).days
+    produced = 0
+    visit = 0
+    while produced < rows:
+        test_date = start + datetime.timedelta(days=min(days, visit * days // visits))
+        if rng.random() < SINGLE_TEST_SHARE:
+            tests = [rng.choice(singles)]
+        else:
+            tests = rng.choices(panels, weights)[0]
+        for test_name in tests[:rows - produced]:
+            result_value, unit = profiles[test_name].draw(rng)
+            yield (test_name, result_value, unit, test_date)
+        produced += min(len(tests), rows - produced)
+        visit += 1
+
+def busiest_test():
+    """ Test with the most results in synthetic histories (first test of the most frequent panel) """
+    return next(iter(load_panels().values()))[0]
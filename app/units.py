@@ -0,0 +1,28 @@
+import numpy as np
+from catalog import load_unit_conversions
+
+class UnitConverter():
+    """ Converts histories entered in more than one unit into one canonical unit per test (resources/textfiles/unit_conversions.txt).
+        The same table is stored in the database, where the canonical_results view applies it in SQL """
+
+    def __init__(self, conversions=None):
+        """ Initialize UnitConverter instance ({test name: (canonical unit, {unit: factor})}, read from the file by default) """
+        self.conversions = load_unit_conversions() if conversions is None else conversions
+
+    def canonical_unit(self, test_name):
+        """ Unit results of the test are converted to (None if no conversions are known) """
+        return self.conversions.get(test_name, (None, {}))[0]
+
+    def convert(self, test_name, values, units):
+        """ Return (values as NumPy array, unit). Single-unit histories are returned as they are, mixed ones are converted
+            to the canonical unit with one multiplication per array - raise ValueError if some unit cannot be converted """
+        values = np.asarray(values, dtype=float)
+        unique_units, positions = np.unique(np.asarray([unit or "" for unit in units], dtype=str), return_inverse=True)
+        if len(unique_units) <= 1:
+            return values, str(unique_units[0]) if len(unique_units) else ""
+        canonical_unit, factors = self.conversions.get(test_name, (None, {}))
+        missing = [str(unit) for unit in unique_units if unit not in factors]
+        if missing:
+            raise ValueError(f"Selected test has multiple units: {', '.join(unique_units)}. "
+                             f"No conversion of {', '.join(missing)} is known for {test_name}")
+        return values * np.array([factors[unit] for unit in unique_units])[positions], canonical_unit
@@ -0,0 +1,111 @@
+import time
+from PyQt6.QtCore import (QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot)
+from metrics import metrics
+
+class TaskSignals(QObject):
+    """ Signals used by DatabaseTask to hand its outcome back to the GUI thread """
+    finished = pyqtSignal(object, object) # task, result
+    failed = pyqtSignal(object, str) # task, error message
+
+class DatabaseTask(QRunnable):
+    """ One database call executed on a worker thread """
+    def __init__(self, function, args, kwargs, on_result, on_error, key, generation):
+        """ Initialize DatabaseTask instance """
+        super().__init__()
+        self.setAutoDelete(False) # Python side keeps the reference until the result is delivered
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.on_result = on_result
+        self.on_error = on_error
+        self.key = key
+        self.generation = generation
+        self.signals = TaskSignals()
+        self.name = getattr(function, "__name__", "call")
+        self.submitted = time.perf_counter() if metrics.enabled else None # Waiting for a free thread is recorded as "queue"
+        self.finished = None
+
+    def run(self):
+        """ Execute the call and emit its result or error """
+        if self.submitted is not None:
+            metrics.record("worker", self.name, (time.perf_counter() - self.submitted) * 1000, phase="queue")
+        try:
+            result = self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(self, str(e))
+            return
+        finally:
+            self.finished = time.perf_counter() if metrics.enabled else None
+        self.signals.finished.emit(self, result)
+
+    def record_delivery(self):
+        """ Record how long the outcome waited for the GUI thread (busy GUI thread delays every result) """
+        if self.finished is not None and metrics.enabled:
+            metrics.record("worker", self.name, (time.perf_counter() - self.finished) * 1000, phase="deliver")
+
+class DatabaseWorker(QObject):
+    """ Runs database calls off the GUI thread and delivers results back to it through signals.
+        Requests submitted with the same key are coalesced - a newer one replaces a queued older one,
+        and results of superseded requests are dropped """
+    def __init__(self, max_threads, on_error=None, parent=None):
+        """ Initialize DatabaseWorker instance (on_error is the default error handler, called on GUI thread) """
+        super().__init__(parent)
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(max_threads)
+        self.on_error = on_error
+        self.generations = {} # Key -> generation of the latest request
+        self.queued = {} # Key -> task not started yet
+        self.tasks = set() # Tasks waiting for delivery
+
+    def submit(self, function, *args, on_result=None, on_error=None, key=None, **kwargs):
+        """ Run function(*args, **kwargs) on a worker thread and pass its return value to on_result """
+        generation = None
+        if key is not None:
+            generation = self.generations.get(key, 0) + 1
+            self.generations[key] = generation
+            stale = self.queued.pop(key, None)
+            if stale is not None and self.thread_pool.tryTake(stale):
+                self.tasks.discard(stale) # Never started - no need to run it at all
+        task = DatabaseTask(function, args, kwargs, on_result, on_error or self.on_error, key, generation)
+        task.signals.finished.connect(self.deliver_result)
+        task.signals.failed.connect(self.deliver_error)
+        self.tasks.add(task)
+        if key is not None:
+            self.queued[key] = task
+        self.thread_pool.start(task)
+        return task
+
+    def cancel(self, key):
+        """ Drop pending request with given key (its result will be ignored) """
+        self.generations[key] = self.generations.get(key, 0) + 1
+        stale = self.queued.pop(key, None)
+        if stale is not None and self.thread_pool.tryTake(stale):
+            self.tasks.discard(stale)
+
+    def is_current(self, task):
+        """ Check if task was not superseded by a newer request with the same key """
+        self.tasks.discard(task)
+        if task.key is None:
+            return True
+        if self.queued.get(task.key) is task:
+            del self.queued[task.key]
+        return task.generation == self.generations.get(task.key)
+
+    @pyqtSlot(object, object)
+    def deliver_result(self, task, result):
+        """ Pass result to its callback (executed on GUI thread) """
+        task.record_delivery()
+        if self.is_current(task) and task.on_result is not None:
+            task.on_result(result)
+
+    @pyqtSlot(object, str)
+    def deliver_error(self, task, message):
+        """ Pass error to its handler (executed on GUI thread) """
+        task.record_delivery()
+        if self.is_current(task) and task.on_error is not None:
+            task.on_error(message)
+
+    def wait_for_done(self, timeout_ms=5000):
+        """ Wait for running tasks (when the app is being closed) """
+        self.thread_pool.clear()
+        return self.thread_pool.waitForDone(timeout_ms)